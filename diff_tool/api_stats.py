@@ -1,12 +1,16 @@
+import asyncio
+
 import httpx
 
+# The breakdowns to show for each environment, as (works aggregation, name)
+AGGREGATIONS = [("workType", "formats"), ("availabilities", "availabilities")]
+
 
 def get_index_name(api_url):
     """
     Returns the name of the index used by this API.
     """
-    search_templates_resp = httpx.get(f"https://{api_url}/catalogue/v2/_elasticConfig")
-    return search_templates_resp.json()["worksIndex"]
+    return asyncio.run(_with_collector(lambda c: c.get_index_name(api_url)))
 
 
 def get_api_stats(*, api_url):
@@ -14,14 +18,88 @@ def get_api_stats(*, api_url):
     Returns some index stats about the API, including the index name and a breakdown
     of work types in the index.
     """
-    index_name = httpx.get(f"https://{api_url}/catalogue/v2/_elasticConfig").json()[
-        "worksIndex"
-    ]
+    return asyncio.run(_with_collector(lambda c: c.get_api_stats(api_url)))
+
+
+class StatsCollector:
+    """
+    Fetches index stats for any number of environments at once, on one
+    shared client.
+
+    Every request is made at most once per collector: the index name and the
+    stats both need ``_elasticConfig``, for example, but only the first to
+    ask for it fetches it, and the other waits for the same response.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._responses = {}
+
+    def _get_json(self, url, params=None):
+        key = (url, tuple(sorted((params or {}).items())))
+        if key not in self._responses:
+            self._responses[key] = asyncio.ensure_future(self._fetch(url, params))
+        return self._responses[key]
+
+    async def _fetch(self, url, params):
+        resp = await self.client.get(url, params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def get_index_name(self, api_url):
+        config = await self._get_json(f"https://{api_url}/catalogue/v2/_elasticConfig")
+        return config["worksIndex"]
+
+    async def get_api_stats(self, api_url):
+        """
+        The index name, a count of works of each type (Visible, Redirected,
+        etc.), the number of images, and how the visible works break down
+        by format and availability.
+        """
+        base = f"https://{api_url}/catalogue/v2"
+        index_name, work_types, images, works = await asyncio.gather(
+            self.get_index_name(api_url),
+            self._get_json(f"{base}/management/_workTypes"),
+            self._get_json(f"{base}/images", {"pageSize": 1}),
+            self._get_json(
+                f"{base}/works",
+                {
+                    "pageSize": 1,
+                    "aggregations": ",".join(agg for agg, _ in AGGREGATIONS),
+                },
+            ),
+        )
+
+        # Copy before adding the total, since the response is shared
+        work_types = dict(work_types, TOTAL=sum(work_types.values()))
+
+        stats = {
+            "index_name": index_name,
+            "work_types": work_types,
+            "images": images["totalResults"],
+        }
+        for agg, name in AGGREGATIONS:
+            stats[name] = {
+                bucket["data"]["label"]: bucket["count"]
+                for bucket in works["aggregations"][agg]["buckets"]
+            }
+        return stats
+
+    async def collect(self, environments):
+        """
+        Stats for every environment in ``environments`` ({label: API host}),
+        fetched concurrently.
+        """
+        all_stats = await asyncio.gather(
+            *(self.get_api_stats(api_url) for api_url in environments.values())
+        )
+        return dict(zip(environments, all_stats))
+
 
-    work_types = httpx.get(
-        f"https://{api_url}/catalogue/v2/management/_workTypes"
-    ).json()
+def make_stats_client():
+    return httpx.AsyncClient(http2=True, timeout=httpx.Timeout(30.0))
 
-    work_types["TOTAL"] = sum(work_types.values())
 
-    return {"index_name": index_name, "work_types": work_types}
+async def _with_collector(fn):
+    async with make_stats_client() as client:
+        return await fn(StatsCollector(client))
@@ -1,26 +1,41 @@
 #!/usr/bin/env python3
 
+import asyncio
+import collections
 import collections.abc
-import concurrent.futures
+import contextlib
 import datetime
-import difflib
 import json
 import os
+import random
+import statistics
 import sys
 import tempfile
+import time
 import urllib.parse
 
 import click
 import httpx
 import humanize
 from tabulate import tabulate
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 import api_stats
+from html_report import DEFAULT_PAGE_SIZE, HtmlReport
+import json_diff
+import ranking
+from response_cache import ResponseCache
 
 PROD_URL = "api.wellcomecollection.org"
 STAGING_URL = "api-stage.wellcomecollection.org"
 
+# Responses worth another try: rate limiting, and the load balancer failing
+# to reach (or wait for) a healthy task. A 500 is a real answer, so it's
+# reported as a diff rather than retried.
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_BACKOFF_SECS = 0.5
+
+TIMING_PERCENTILES = (50, 90, 99)
+
 
 class ApiDiffer:
     """Performs a diff against the same call to both prod and stage works API,
@@ -30,6 +45,8 @@ class ApiDiffer:
     def __init__(self, path=None, params=None, **kwargs):
         self.path = f"/catalogue/v2{path}"
         self.params = params or {}
+        self.ranking = None
+        self.statuses = None
 
     @staticmethod
     def normalise_absolute_urls(json):
@@ -59,7 +76,9 @@ class ApiDiffer:
         else:
             return self.path
 
-    def get_html_diff(self):
+    async def get_html_diff(
+        self, prod_client, stage_client, *, retries=3, prod_cache=None
+    ):
         """
         Fetches a URL from the prod/staging API, and returns a (status, HTML diff).
 
@@ -68,12 +87,23 @@ class ApiDiffer:
             * different status = as in HTTP status
             * match = same JSON
             * different result count = everything is the same except totalResults/totalPages
+            * reordered = the same results (and result counts), but in a different order
             * different JSON = something is different
 
+        For searches, this also sets ``self.ranking`` to how similar the two
+        rankings are (see ranking.py). ``self.statuses`` is set to the status
+        from each environment, as {"prod": ..., "stage": ...}.
+
+        If ``prod_cache`` is given (a ``CacheScope`` for prod's current index),
+        a cached prod response is used if there is one, and only stage is
+        fetched.
         """
 
-        (prod_status, prod_json) = self.call_api(PROD_URL)
-        (stage_status, stage_json) = self.call_api(STAGING_URL)
+        (prod_status, prod_json), (stage_status, stage_json) = await asyncio.gather(
+            self.call_api(prod_client, retries=retries, cache=prod_cache),
+            self.call_api(stage_client, retries=retries),
+        )
+        self.statuses = {"prod": prod_status, "stage": stage_status}
         prod_json = ApiDiffer.normalise_absolute_urls(prod_json)
         stage_json = ApiDiffer.normalise_absolute_urls(stage_json)
         if prod_status != stage_status:
@@ -87,149 +117,541 @@ class ApiDiffer:
                 f"{json.dumps(stage_json, indent=2)}",
             ]
             return ("different status", lines)
-        elif prod_json == stage_json:
+
+        if "query" in self.params:
+            self.ranking = ranking.compare_rankings(prod_json, stage_json)
+
+        if prod_json == stage_json:
             return ("match", "")
         else:
-            prod_pretty = json.dumps(prod_json, indent=2, sort_keys=True)
-            stage_pretty = json.dumps(stage_json, indent=2, sort_keys=True)
-
-            diff_lines = list(
-                difflib.unified_diff(
-                    prod_pretty.splitlines(),
-                    stage_pretty.splitlines(),
-                    fromfile="prod",
-                    tofile="stage",
-                )
-            )
+            changes = json_diff.diff(prod_json, stage_json)
+            diff_lines = [change.describe() for change in changes]
+
+            # Changes outside the result counts, by their top-level field
+            other_changes = [
+                change
+                for change in changes
+                if change.path.partition("/")[2].split("/")[0]
+                not in {"totalPages", "totalResults"}
+            ]
 
-            if prod_json.keys() == stage_json.keys() and all(
-                prod_json[k] == stage_json[k]
-                for k in prod_json
-                if k not in {"totalPages", "totalResults"}
-            ):
+            if not other_changes:
                 return ("different result count", diff_lines)
+            elif all(change.kind == json_diff.MOVED for change in other_changes):
+                return ("reordered", diff_lines)
             else:
                 return ("different JSON", diff_lines)
 
-    def call_api(self, api_base):
-        url = f"https://{api_base}{self.path}"
-        response = httpx.get(url, params=self.params, follow_redirects=True)
+    async def call_api(self, client, *, retries=3, cache=None):
+        """
+        Fetches this route with ``client``, retrying connection errors and
+        transient error statuses with jittered exponential backoff.
+
+        If ``cache`` is given, a response from it is used instead of making
+        the request, and new responses are saved to it (except server errors
+        and responses that would have been retried, like a 429, which say
+        nothing about the route).
+        """
+        if cache is not None:
+            cached = cache.get(self.path, self.params)
+            if cached is not None:
+                return cached
+
+        status, body = await self._fetch(client, retries=retries)
+
+        if cache is not None and status < 500 and status not in RETRY_STATUSES:
+            cache.put(self.path, self.params, status, body)
+        return status, body
+
+    async def _fetch(self, client, *, retries):
+        for attempt in range(retries + 1):
+            try:
+                response = await client.get(self.path, params=self.params)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    break
+            except httpx.TransportError:
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(
+                RETRY_BACKOFF_SECS * 2**attempt * random.uniform(0.5, 1.5)
+            )
+
         try:
             return (response.status_code, response.json())
         except json.JSONDecodeError:
             print(
-                f"Non-JSON response received from {url}:\n---\n{response.text}\n---\n",
+                f"Non-JSON response received from {response.url}:\n---\n{response.text}\n---\n",
                 file=sys.stderr,
             )
             sys.exit(1)
 
+    async def time_request(self, client, expected_status):
+        """
+        How long one request for this route takes, in ms, including reading
+        the body; or None if it couldn't connect, or got a different status
+        to ``expected_status`` (e.g. a quick 429 rather than the real answer).
+        """
+        start = time.perf_counter()
+        try:
+            response = await client.get(self.path, params=self.params)
+        except httpx.TransportError:
+            return None
+        if response.status_code != expected_status:
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    async def get_timings(self, prod_client, stage_client, *, repeat, warmup):
+        """
+        Requests this route ``warmup`` times from each environment, then
+        ``repeat`` more times to time it, and returns latency percentiles for
+        each environment and how much slower stage is at the median.
+
+        Requests alternate between prod and stage, one at a time, so both
+        see the same conditions and neither competes with the other. Only
+        responses with the status each environment gave when this route was
+        diffed are timed, so this must come after ``get_html_diff``.
+        """
+        latencies = {"prod": [], "stage": []}
+        for i in range(warmup + repeat):
+            for env, client in (("prod", prod_client), ("stage", stage_client)):
+                ms = await self.time_request(client, self.statuses[env])
+                if i >= warmup and ms is not None:
+                    latencies[env].append(ms)
+
+        if not latencies["prod"] or not latencies["stage"]:
+            return None
+
+        timings = {
+            env: _latency_percentiles(values) for env, values in latencies.items()
+        }
+        timings["slower_by"] = (timings["stage"][50] / timings["prod"][50] - 1) * 100
+        return timings
+
+
+def _latency_percentiles(values):
+    if len(values) < 2:
+        return {p: values[0] for p in TIMING_PERCENTILES}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {p: cuts[p - 1] for p in TIMING_PERCENTILES}
+
+
+def _display_strata(diffs, echo):
+    """A table of how many routes in each stratum got each status."""
+    counts = collections.Counter(
+        (d["route"].get("stratum", "-"), d["status"]) for d in diffs
+    )
+    strata = sorted({stratum for stratum, _ in counts})
+    statuses = sorted({status for _, status in counts})
+    echo(
+        tabulate(
+            [
+                [stratum] + [counts[(stratum, status)] for status in statuses]
+                for stratum in strata
+            ],
+            headers=["stratum"] + statuses,
+        )
+    )
+    echo()
+
+
+def _display_ranking(ranking_summary, diffs, echo):
+    """Rank similarity across all the searches, and the least similar ones."""
+    echo(click.style("Ranking similarity (searches)", underline=True))
+    echo()
+    echo(
+        tabulate(
+            [
+                [metric, s["routes"], s["mean"], s["median"], s["min"]]
+                for metric, s in ranking_summary.items()
+            ],
+            headers=["metric", "routes", "mean", "median", "min"],
+            floatfmt=".3f",
+        )
+    )
+    echo()
+
+    least_similar = sorted(
+        (d for d in diffs if d["ranking"] and d["ranking"]["rbo"] < 1),
+        key=lambda d: d["ranking"]["rbo"],
+    )[:10]
+    for d in least_similar:
+        echo(f"  rbo={d['ranking']['rbo']:.3f}  {d['display_url']}")
+    if least_similar:
+        echo()
+
+
+def _display_timings(diffs, echo):
+    """How stage's median latency compares to prod's, across all the routes."""
+    slower_by = [d["timings"]["slower_by"] for d in diffs if d.get("timings")]
+    if not slower_by:
+        return
+
+    echo(click.style("Latency (stage vs prod, p50)", underline=True))
+    echo()
+    echo(
+        f"  median {statistics.median(slower_by):+.1f}%, "
+        f"worst {max(slower_by):+.1f}% across {len(slower_by)} routes"
+    )
+    echo()
 
-def _display_in_console(stats, diffs, outfile=None):
-    def file_echo(*args, **kwargs):
-        click.echo(*args, file=outfile, **kwargs)
 
-    echo = file_echo if outfile else click.echo
+def _timing_column(diff_line):
+    timings = diff_line.get("timings")
+    if timings is None:
+        return ""
+    return f"{timings['slower_by']:>+7.1f}%  "
 
+
+def _display_header(echo):
     time_now = datetime.datetime.now().strftime("%A %-d %B %Y @ %H:%M:%S")
     echo()
     echo(click.style(f"API diff for {time_now}", fg="white", bold=True, underline=True))
     echo()
+    echo(click.style("API tests", underline=True))
+    echo()
+
+
+def _display_diff_line(diff_line, echo):
+    if "comment" in diff_line["route"]:
+        display_diff_line = diff_line["route"]["comment"]
+    else:
+        display_diff_line = diff_line["display_url"]
+
+    # With --timing, show how much slower stage is at the start of the line
+    if "timings" in diff_line:
+        display_diff_line = _timing_column(diff_line) + display_diff_line
+
+    if diff_line["status"] == "match":
+        echo(click.style(f"✓ {display_diff_line}", fg="green"))
+    elif diff_line["status"] == "different result count":
+        echo(click.style(f"! {display_diff_line} (result count differs)", fg="yellow"))
+    elif diff_line["status"] == "reordered":
+        echo(click.style(f"! {display_diff_line} (results reordered)", fg="yellow"))
+    else:
+        echo(click.style(f"✖ {display_diff_line}", fg="red"))
+
+
+def _display_summary(stats, diffs, ranking_summary, echo):
+    echo()
+
+    if any("stratum" in d["route"] for d in diffs):
+        _display_strata(diffs, echo)
+
     echo(click.style("Index statistics", underline=True))
     echo()
+    work_types = list(next(iter(stats.values()))["work_types"])
     echo(
         tabulate(
             [
-                ["Production"]
-                + [humanize.intcomma(v) for v in stats["prod"]["work_types"].values()],
-                ["Staging"]
-                + [
-                    humanize.intcomma(v)
-                    for v in stats["staging"]["work_types"].values()
-                ],
+                [f"{label} ({env_stats['index_name']})"]
+                + [humanize.intcomma(env_stats["work_types"][t]) for t in work_types]
+                + [humanize.intcomma(env_stats["images"])]
+                for label, env_stats in stats.items()
             ],
-            headers=stats["prod"]["work_types"].keys(),
-            colalign=("left", "right", "right", "right", "right", "right"),
+            headers=work_types + ["Images"],
+            colalign=("left",) + ("right",) * (len(work_types) + 1),
         )
     )
-
-    echo()
-    echo(click.style("API tests", underline=True))
     echo()
 
-    for diff_line in diffs:
-        if "comment" in diff_line["route"]:
-            display_diff_line = diff_line["route"]["comment"]
-        else:
-            display_diff_line = diff_line["display_url"]
-
-        if diff_line["status"] == "match":
-            echo(click.style(f"✓ {display_diff_line}", fg="green"))
-        elif diff_line["status"] == "different result count":
-            echo(
-                click.style(
-                    f"! {display_diff_line} (result count differs)", fg="yellow"
-                )
+    for _, name in api_stats.AGGREGATIONS:
+        values = sorted({v for env_stats in stats.values() for v in env_stats[name]})
+        echo(
+            tabulate(
+                [
+                    [value]
+                    + [
+                        humanize.intcomma(env_stats[name].get(value, 0))
+                        for env_stats in stats.values()
+                    ]
+                    for value in values
+                ],
+                headers=[name.capitalize()] + list(stats),
+                colalign=("left",) + ("right",) * len(stats),
             )
-        else:
-            echo(click.style(f"✖ {display_diff_line}", fg="red"))
+        )
+        echo()
 
-    echo()
+    if ranking_summary:
+        _display_ranking(ranking_summary, diffs, echo)
 
+    _display_timings(diffs, echo)
 
-@click.command()
-@click.option(
-    "--routes-file",
-    default="routes.json",
-    help="What routes file to use (default=routes.json)",
-)
-@click.option("--console", is_flag=True, help="Print results in console")
-@click.option("--outfile", default=None)
-def main(routes_file, console, outfile):
-    with open(routes_file) as f:
-        routes = json.load(f)
-
-    def get_diff(route):
-        differ = ApiDiffer(**route)
-        status, diff_lines = differ.get_html_diff()
-
-        return {
-            "route": route,
-            "display_url": differ.display_url,
-            "status": status,
-            "diff_lines": diff_lines,
-        }
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [executor.submit(get_diff, r) for r in routes]
-        concurrent.futures.wait(futures, return_when=concurrent.futures.ALL_COMPLETED)
+def make_client(api_base, *, concurrency):
+    """
+    A pooled HTTP/2 client for one API host. All routes share it, so each
+    host gets a handful of long-lived connections rather than a new TCP and
+    TLS handshake for every request.
+    """
+    return httpx.AsyncClient(
+        base_url=f"https://{api_base}",
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency
+        ),
+    )
 
-        diffs = [fut.result() for fut in futures]
 
-    stats = {
-        label: api_stats.get_api_stats(api_url=api_url)
-        for (label, api_url) in [("prod", PROD_URL), ("staging", STAGING_URL)]
-    }
+async def iter_diffs(routes, *, concurrency, retries, timing=None, prod_cache=None):
+    """
+    Diffs every route, with at most ``concurrency`` routes in flight at once,
+    yielding each result as soon as it's ready (so not necessarily in the
+    same order as ``routes``). ``routes`` can be any iterable, and is only
+    read as fast as the routes are diffed.
+
+    If ``timing`` is given, as {"repeat": N, "warmup": W}, each route is
+    also timed against both environments (see ``ApiDiffer.get_timings``).
+    The routes are timed one at a time, after every route has been diffed,
+    so the timings don't compete with the diffs or with each other; the
+    results are held back until then.
+
+    Prod responses are read from and saved to ``prod_cache``, if given.
+    """
+    prod_client = make_client(PROD_URL, concurrency=concurrency)
+    stage_client = make_client(STAGING_URL, concurrency=concurrency)
+    routes = iter(routes)
+    # Bounded, so the workers wait for the results to be written out rather
+    # than piling them up in memory
+    results = asyncio.Queue(maxsize=concurrency)
+
+    async with prod_client, stage_client:
+
+        async def diff_worker():
+            # The workers share one iterator, so each route is taken once
+            for route in routes:
+                differ = ApiDiffer(**route)
+                status, diff_lines = await differ.get_html_diff(
+                    prod_client, stage_client, retries=retries, prod_cache=prod_cache
+                )
+
+                result = {
+                    "route": route,
+                    "display_url": differ.display_url,
+                    "status": status,
+                    "diff_lines": diff_lines,
+                    "ranking": differ.ranking,
+                }
+                await results.put((differ, result))
+
+        async def run_workers():
+            try:
+                await asyncio.gather(*(diff_worker() for _ in range(concurrency)))
+            finally:
+                await results.put(None)
+
+        workers = asyncio.create_task(run_workers())
+        to_time = []
+        while (item := await results.get()) is not None:
+            if timing:
+                to_time.append(item)
+            else:
+                yield item[1]
+
+        # Raises if any of the workers failed
+        await workers
+
+        for differ, result in to_time:
+            result["timings"] = await differ.get_timings(
+                prod_client, stage_client, **timing
+            )
+            yield result
 
-    if console:
-        if outfile:
-            with open(outfile, "w") as outfile_obj:
-                _display_in_console(stats, diffs, outfile_obj)
-        _display_in_console(stats, diffs)
-    else:
-        env = Environment(
-            loader=FileSystemLoader("."), autoescape=select_autoescape(["html", "xml"])
-        )
 
-        env.filters["intcomma"] = humanize.intcomma
+def _summary_of(diff):
+    """Everything about a diff needed for the summary, without the diff itself."""
+    return {key: value for key, value in diff.items() if key != "diff_lines"}
 
-        template = env.get_template("template.html")
-        html = template.render(now=datetime.datetime.now(), diffs=diffs, stats=stats)
 
-        _, tmp_path = tempfile.mkstemp(suffix=".html")
-        with open(tmp_path, "w") as outfile:
-            outfile.write(html)
+def read_routes(routes_file):
+    """
+    Reads routes from a JSON list, like routes.json, or lazily from JSONL
+    (as written by route_generator.py), where ``-`` means stdin.
+    """
+    if routes_file == "-" or routes_file.endswith(".jsonl"):
+        with click.open_file(routes_file) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(routes_file) as f:
+            yield from json.load(f)
+
 
-        os.system(f"open {tmp_path}")
+@click.command()
+@click.option(
+    "--routes-file",
+    default="routes.json",
+    help="What routes file to use: JSON, or JSONL from route_generator.py, or - for JSONL on stdin (default=routes.json)",
+)
+@click.option("--console", is_flag=True, help="Print results in console")
+@click.option("--outfile", default=None)
+@click.option(
+    "--concurrency",
+    default=16,
+    show_default=True,
+    help="How many routes to diff at once",
+)
+@click.option(
+    "--retries",
+    default=3,
+    show_default=True,
+    help="How many times to retry a request that fails or gets a 429/502/503/504",
+)
+@click.option(
+    "--timing",
+    is_flag=True,
+    help="Also time each route against both environments, and compare their latency",
+)
+@click.option(
+    "--repeat",
+    default=10,
+    show_default=True,
+    help="With --timing, how many times to time each route in each environment",
+)
+@click.option(
+    "--warmup",
+    default=2,
+    show_default=True,
+    help="With --timing, how many untimed requests to send first",
+)
+@click.option(
+    "--cache-file",
+    default="diff_tool_cache.sqlite",
+    show_default=True,
+    help="Where to cache prod responses between runs",
+)
+@click.option(
+    "--no-cache", is_flag=True, help="Fetch every prod response, and don't cache them"
+)
+@click.option(
+    "--cache-max-age",
+    default=24.0,
+    show_default=True,
+    help="How long to keep cached responses, in hours",
+)
+@click.option(
+    "--cache-max-size",
+    default=500,
+    show_default=True,
+    help="How big the cache can get, in MB",
+)
+@click.option(
+    "--report-dir",
+    help="Where to write the HTML report (default: a new temporary directory)",
+)
+@click.option(
+    "--page-size",
+    default=DEFAULT_PAGE_SIZE,
+    show_default=True,
+    help="How many routes to show on each page of the HTML report",
+)
+@click.option(
+    "--stats-env",
+    multiple=True,
+    type=(str, str),
+    metavar="LABEL HOST",
+    help="Another environment to show index statistics for, e.g. dev api-dev.wellcomecollection.org",
+)
+def main(
+    routes_file,
+    console,
+    outfile,
+    concurrency,
+    retries,
+    timing,
+    repeat,
+    warmup,
+    cache_file,
+    no_cache,
+    cache_max_age,
+    cache_max_size,
+    report_dir,
+    page_size,
+    stats_env,
+):
+    with contextlib.ExitStack() as stack:
+        console_files = [None]
+        if console and outfile:
+            console_files.append(stack.enter_context(open(outfile, "w")))
+
+        def echo(*args, **kwargs):
+            for f in console_files:
+                click.echo(*args, file=f, **kwargs)
+
+        if console:
+            _display_header(echo)
+            html_report = None
+        else:
+            html_report = HtmlReport(
+                report_dir or tempfile.mkdtemp(), page_size=page_size
+            )
+            print(f"Writing the report to {html_report.directory}", file=sys.stderr)
+
+        environments = {"prod": PROD_URL, "staging": STAGING_URL, **dict(stats_env)}
+
+        async def run_diffs():
+            summaries = []
+            async with api_stats.make_stats_client() as stats_client:
+                collector = api_stats.StatsCollector(stats_client)
+                # Fetch the stats while the diffs run, rather than after
+                stats = asyncio.ensure_future(collector.collect(environments))
+                try:
+                    prod_cache = None
+                    if not no_cache:
+                        # Prod responses can be reused for as long as prod
+                        # serves the same index; stage is what's being
+                        # checked, so it's always refetched.
+                        prod_index = await collector.get_index_name(PROD_URL)
+                        cache = stack.enter_context(
+                            ResponseCache(
+                                cache_file,
+                                max_age_secs=cache_max_age * 60 * 60,
+                                max_bytes=cache_max_size * 1024 * 1024,
+                            )
+                        )
+                        prod_cache = cache.scope("prod", prod_index)
+
+                    async for diff in iter_diffs(
+                        read_routes(routes_file),
+                        concurrency=concurrency,
+                        retries=retries,
+                        timing={"repeat": repeat, "warmup": warmup} if timing else None,
+                        prod_cache=prod_cache,
+                    ):
+                        if html_report is None:
+                            _display_diff_line(diff, echo)
+                        else:
+                            html_report.add(diff)
+                        summaries.append(_summary_of(diff))
+
+                    if prod_cache is not None:
+                        print(
+                            f"Reused {cache.hits} cached prod responses for "
+                            f"{prod_index}, fetched {cache.misses}",
+                            file=sys.stderr,
+                        )
+
+                    return summaries, await stats
+                finally:
+                    # If the diffs failed, don't leave the stats running
+                    # against a client that's about to be closed
+                    if not stats.done():
+                        stats.cancel()
+                        with contextlib.suppress(asyncio.CancelledError):
+                            await stats
+
+        diffs, stats = asyncio.run(run_diffs())
+
+        ranking_summary = ranking.summarise([d["ranking"] for d in diffs])
+
+        if html_report is None:
+            _display_summary(stats, diffs, ranking_summary, echo)
+        else:
+            html_report.finish(stats=stats, ranking_summary=ranking_summary)
+            os.system(f"open {html_report.index_path}")
 
 
 if __name__ == "__main__":
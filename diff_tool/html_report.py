@@ -0,0 +1,150 @@
+"""
+Writes the HTML report as the diffs come in, rather than all at the end.
+
+The report is a directory:
+
+    index.html          the summary, written at the start and again at the end
+    page-0001.html ...  the diffs, up to ``page_size`` per page
+    diffs/0000001.txt   the full text of any diff too long to show inline
+
+Each diff is written to the current page as soon as it arrives, so the
+first results can be read while the rest are still running, and nothing
+but a small summary of each diff is kept in memory.
+"""
+
+import collections
+import datetime
+import os
+
+import humanize
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from api_stats import AGGREGATIONS
+
+DEFAULT_PAGE_SIZE = 250
+MAX_INLINE_DIFF_LINES = 200
+
+
+def page_filename(page_number):
+    return f"page-{page_number:04d}.html"
+
+
+def stats_tables(stats):
+    """
+    The index stats as a list of (title, rows) tables, where each row is
+    (label, [value in each environment]).
+    """
+    envs = list(stats.values())
+    work_types = list(envs[0]["work_types"])
+
+    tables = [
+        (
+            "Works",
+            [(t, [env["work_types"].get(t, 0) for env in envs]) for t in work_types]
+            + [("Images", [env["images"] for env in envs])],
+        )
+    ]
+    for _, name in AGGREGATIONS:
+        values = sorted({v for env in envs for v in env[name]})
+        tables.append(
+            (
+                name.capitalize(),
+                [(v, [env[name].get(v, 0) for env in envs]) for v in values],
+            )
+        )
+    return tables
+
+
+class HtmlReport:
+    def __init__(self, directory, *, page_size=DEFAULT_PAGE_SIZE):
+        self.directory = directory
+        self.page_size = page_size
+        self.now = datetime.datetime.now()
+
+        env = Environment(
+            loader=FileSystemLoader(os.path.dirname(os.path.abspath(__file__))),
+            autoescape=select_autoescape(["html", "xml"]),
+        )
+        env.filters["intcomma"] = humanize.intcomma
+        env.globals["page_filename"] = page_filename
+        self.index_template = env.get_template("template.html")
+        self.page_macros = env.get_template("page.html").module
+
+        self.page = None
+        self.page_number = 0
+        self.on_page = 0
+        self.count = 0
+        self.status_counts = collections.Counter()
+
+        os.makedirs(os.path.join(directory, "diffs"), exist_ok=True)
+        self._write_index(finished=False)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, "index.html")
+
+    def add(self, diff):
+        if self.page is None or self.on_page == self.page_size:
+            self._next_page()
+
+        self.count += 1
+        self.status_counts[diff["status"]] += 1
+
+        if len(diff["diff_lines"]) > MAX_INLINE_DIFF_LINES:
+            diff = self._spill(diff)
+
+        self.page.write(self.page_macros.diff(diff))
+        self.page.flush()
+        self.on_page += 1
+
+    def _spill(self, diff):
+        """Save a long diff to its own file, and only show the start of it."""
+        name = f"diffs/{self.count:07d}.txt"
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(f"{diff['display_url']}\n\n")
+            f.writelines(line.rstrip() + "\n" for line in diff["diff_lines"])
+
+        return dict(
+            diff,
+            diff_lines=diff["diff_lines"][:MAX_INLINE_DIFF_LINES],
+            total_diff_lines=len(diff["diff_lines"]),
+            spilled_to=name,
+        )
+
+    def _next_page(self):
+        if self.page is not None:
+            self._close_page(has_next=True)
+
+        self.page_number += 1
+        self.on_page = 0
+        self.page = open(
+            os.path.join(self.directory, page_filename(self.page_number)), "w"
+        )
+        self.page.write(self.page_macros.header(self.page_number, self.now))
+        self._write_index(finished=False)
+
+    def _close_page(self, *, has_next):
+        self.page.write(self.page_macros.footer(self.page_number, has_next))
+        self.page.close()
+        self.page = None
+
+    def _write_index(self, *, finished, stats=None, ranking_summary=None):
+        html = self.index_template.render(
+            now=self.now,
+            finished=finished,
+            pages=self.page_number,
+            status_counts=dict(self.status_counts.most_common()),
+            stats=stats,
+            stats_tables=stats_tables(stats) if stats else [],
+            ranking_summary=ranking_summary,
+        )
+        # Write it in one go, so a reload never sees half a page
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(html)
+        os.replace(tmp_path, self.index_path)
+
+    def finish(self, *, stats, ranking_summary):
+        if self.page is not None:
+            self._close_page(has_next=False)
+        self._write_index(finished=True, stats=stats, ranking_summary=ranking_summary)
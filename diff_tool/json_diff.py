@@ -0,0 +1,204 @@
+"""
+Structural diff of two JSON documents.
+
+Rather than pretty-printing both documents and diffing the lines, this walks
+both trees together and reports each difference at its JSON pointer path
+(RFC 6901), e.g. ``/results/3/title``.
+
+Every subtree is first given a digest, built bottom-up from its children's
+digests, so identical subtrees (the vast majority, usually) are skipped
+without being walked. Arrays whose elements all have an ``id`` (like
+``results``) are matched up by id, so a work that has only moved is
+reported as moved rather than as a run of changes at every index after it.
+"""
+
+import difflib
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+MOVED = "moved"
+
+MAX_VALUE_CHARS = 200
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    One difference between the documents. For an added value ``path`` is
+    its place in the new document; for anything else, in the old one.
+    A move records the old and new index in ``old`` and ``new``.
+    """
+
+    kind: str
+    path: str
+    old: Any = None
+    new: Any = None
+
+    def describe(self):
+        if self.kind == ADDED:
+            return f"+ {self.path}: {_show(self.new)}"
+        if self.kind == REMOVED:
+            return f"- {self.path}: {_show(self.old)}"
+        if self.kind == MOVED:
+            return f"↕ {self.path}: moved from position {self.old} to {self.new}"
+        return f"~ {self.path}: {_show(self.old)} → {_show(self.new)}"
+
+
+def _show(value):
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    if len(text) > MAX_VALUE_CHARS:
+        return text[: MAX_VALUE_CHARS - 1] + "…"
+    return text
+
+
+def _escape(token):
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+class _Digests:
+    """Merkle-style digests of every container in a document, by id()."""
+
+    def __init__(self):
+        # Only valid while both documents are alive, so that ids aren't reused
+        self.by_id = {}
+
+    def __call__(self, value):
+        if isinstance(value, (dict, list)):
+            cached = self.by_id.get(id(value))
+            if cached is not None:
+                return cached
+
+        h = hashlib.blake2b(digest_size=16)
+        if isinstance(value, dict):
+            h.update(b"{")
+            for key in sorted(value):
+                h.update(json.dumps(key).encode())
+                h.update(self(value[key]))
+        elif isinstance(value, list):
+            h.update(b"[")
+            for item in value:
+                h.update(self(item))
+        else:
+            h.update(json.dumps(value).encode())
+        digest = h.digest()
+
+        if isinstance(value, (dict, list)):
+            self.by_id[id(value)] = digest
+        return digest
+
+
+def _keyed_by_id(items):
+    if not items or not all(isinstance(item, dict) and "id" in item for item in items):
+        return None
+    ids = [item["id"] for item in items]
+    return ids if len(set(map(json.dumps, ids))) == len(ids) else None
+
+
+def _longest_increasing_run(positions):
+    """Indices into ``positions`` of a longest strictly increasing subsequence."""
+    tails, tail_index, previous = [], [], [None] * len(positions)
+    for i, p in enumerate(positions):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < p:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(p)
+            tail_index.append(i)
+        else:
+            tails[lo], tail_index[lo] = p, i
+        previous[i] = tail_index[lo - 1] if lo else None
+
+    keep = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+class _Differ:
+    def __init__(self):
+        self.digest = _Digests()
+        self.changes = []
+
+    def diff(self, old, new, path):
+        if type(old) is not type(new) or not isinstance(old, (dict, list)):
+            if old != new or type(old) is not type(new):
+                self.changes.append(Change(CHANGED, path, old, new))
+            return
+        if self.digest(old) == self.digest(new):
+            return
+
+        if isinstance(old, dict):
+            for key in old.keys() - new.keys():
+                self.changes.append(Change(REMOVED, f"{path}/{_escape(key)}", old[key]))
+            for key in new.keys() - old.keys():
+                self.changes.append(
+                    Change(ADDED, f"{path}/{_escape(key)}", new=new[key])
+                )
+            for key in old.keys() & new.keys():
+                self.diff(old[key], new[key], f"{path}/{_escape(key)}")
+            return
+
+        old_ids, new_ids = _keyed_by_id(old), _keyed_by_id(new)
+        if old_ids is not None and new_ids is not None:
+            self.diff_by_id(old, new, old_ids, new_ids, path)
+        else:
+            self.diff_by_position(old, new, path)
+
+    def diff_by_id(self, old, new, old_ids, new_ids, path):
+        new_index = {json.dumps(i): n for n, i in enumerate(new_ids)}
+        old_keys = [json.dumps(i) for i in old_ids]
+        old_index = {key: n for n, key in enumerate(old_keys)}
+
+        common = [
+            (o, new_index[key]) for o, key in enumerate(old_keys) if key in new_index
+        ]
+        # Everything outside the longest run that kept its relative order
+        # counts as moved; the rest only shifted because of those moves or
+        # of additions and removals around them.
+        in_order = _longest_increasing_run([n for _, n in common])
+
+        for o, key in enumerate(old_keys):
+            if key not in new_index:
+                self.changes.append(Change(REMOVED, f"{path}/{o}", old[o]))
+        for n, item in enumerate(new):
+            if json.dumps(new_ids[n]) not in old_index:
+                self.changes.append(Change(ADDED, f"{path}/{n}", new=item))
+        for k, (o, n) in enumerate(common):
+            if k not in in_order:
+                self.changes.append(Change(MOVED, f"{path}/{o}", o, n))
+            self.diff(old[o], new[n], f"{path}/{o}")
+
+    def diff_by_position(self, old, new, path):
+        matcher = difflib.SequenceMatcher(
+            a=[self.digest(v) for v in old],
+            b=[self.digest(v) for v in new],
+            autojunk=False,
+        )
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            if op == "equal":
+                continue
+            paired = min(i2 - i1, j2 - j1)
+            for k in range(paired):
+                self.diff(old[i1 + k], new[j1 + k], f"{path}/{i1 + k}")
+            for i in range(i1 + paired, i2):
+                self.changes.append(Change(REMOVED, f"{path}/{i}", old[i]))
+            for j in range(j1 + paired, j2):
+                self.changes.append(Change(ADDED, f"{path}/{j}", new=new[j]))
+
+
+def diff(old, new):
+    """Returns the list of Changes that turn ``old`` into ``new``."""
+    differ = _Differ()
+    differ.diff(old, new, "")
+    return differ.changes
@@ -0,0 +1,127 @@
+"""
+How similar prod and stage's rankings are for a search.
+
+A search that comes back "different JSON" might have swapped two results on
+page one, or returned something else entirely. These metrics compare the
+lists of result IDs, to say which:
+
+    jaccard@k     how many of the top k results are shared (1 = same set)
+    rbo           rank-biased overlap, a top-weighted similarity of the two
+                  rankings, where disagreements near the top count for more
+                  (1 = identical, 0 = nothing in common)
+    kendall_tau   how well the results both return are kept in order
+                  (1 = same order, -1 = reversed)
+
+RBO is the extrapolated form from Webber, Moffat and Zobel, "A Similarity
+Measure for Indefinite Rankings" (2010).
+"""
+
+import statistics
+
+RANK_DEPTH = 10
+
+# How top-heavy RBO is: with p = 0.9, the top 10 ranks carry about 86% of
+# the weight.
+RBO_PERSISTENCE = 0.9
+
+METRICS = ("jaccard", "rbo", "kendall_tau")
+
+
+def jaccard_at_k(a, b, k=RANK_DEPTH):
+    top_a, top_b = set(a[:k]), set(b[:k])
+    if not top_a and not top_b:
+        return 1.0
+    return len(top_a & top_b) / len(top_a | top_b)
+
+
+def rbo(a, b, p=RBO_PERSISTENCE):
+    if not a and not b:
+        return 1.0
+
+    depth = max(len(a), len(b))
+    seen_a, seen_b = set(), set()
+    overlap = 0
+    weighted_agreement = 0.0
+    agreement = 0.0
+
+    for d in range(1, depth + 1):
+        x = a[d - 1] if d <= len(a) else None
+        y = b[d - 1] if d <= len(b) else None
+
+        if x is not None and x == y:
+            overlap += 1
+        else:
+            if x is not None and x in seen_b:
+                overlap += 1
+            if y is not None and y in seen_a:
+                overlap += 1
+        seen_a.add(x)
+        seen_b.add(y)
+
+        agreement = overlap / d
+        weighted_agreement += p ** (d - 1) * agreement
+
+    return (1 - p) * weighted_agreement + p**depth * agreement
+
+
+def kendall_tau(a, b):
+    """
+    Kendall's tau over the results that are in both lists, or None if there
+    are fewer than two of them. IDs are unique, so there are no ties.
+    """
+    position_in_b = {x: i for i, x in enumerate(b)}
+    ranks = [position_in_b[x] for x in a if x in position_in_b]
+    n = len(ranks)
+    if n < 2:
+        return None
+
+    concordant = discordant = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if ranks[i] < ranks[j]:
+                concordant += 1
+            else:
+                discordant += 1
+    return (concordant - discordant) / (n * (n - 1) / 2)
+
+
+def result_ids(response):
+    """The IDs of the results in a ResultList response, or None."""
+    results = response.get("results") if isinstance(response, dict) else None
+    if not isinstance(results, list):
+        return None
+    return [r.get("id") for r in results if isinstance(r, dict)]
+
+
+def compare_rankings(prod_json, stage_json):
+    """
+    Rank similarity metrics for two search responses, or None if they aren't
+    both result lists.
+    """
+    prod_ids, stage_ids = result_ids(prod_json), result_ids(stage_json)
+    if prod_ids is None or stage_ids is None:
+        return None
+
+    return {
+        "jaccard": jaccard_at_k(prod_ids, stage_ids),
+        "rbo": rbo(prod_ids, stage_ids),
+        "kendall_tau": kendall_tau(prod_ids, stage_ids),
+    }
+
+
+def summarise(rankings):
+    """
+    {metric: {"routes", "mean", "median", "min"}} across a list of
+    ``compare_rankings`` results, skipping any that are None.
+    """
+    summary = {}
+    for metric in METRICS:
+        values = [r[metric] for r in rankings if r and r[metric] is not None]
+        if values:
+            summary[metric] = {
+                "routes": len(values),
+                "mean": statistics.fmean(values),
+                "median": statistics.median(values),
+                "min": min(values),
+            }
+    return summary
@@ -0,0 +1,171 @@
+"""
+An on-disk cache of API responses, so repeated runs don't refetch what
+can't have changed.
+
+Responses are keyed by environment, index name, path and params. Including
+the index name means a cached response is only used while the environment
+is still serving the same index: when prod moves to a new index, every key
+changes and everything is fetched again.
+
+Bodies are stored compressed, once per distinct body (by SHA-256), since
+many routes get the same response (e.g. a 404 for a missing work). Entries
+are evicted when older than ``max_age_secs``, and then least recently used
+first until the cache is under ``max_bytes``.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    env TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    body_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+
+def _cache_key(env, index_name, path, params):
+    params = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(
+        json.dumps([env, index_name, path, params]).encode()
+    ).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, *, max_age_secs, max_bytes):
+        self.max_age_secs = max_age_secs
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(path)
+        # Responses are saved one at a time as they arrive, so don't wait for
+        # a full sync on every one
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.executescript(SCHEMA)
+        self.evict()
+
+    def get(self, env, index_name, path, params):
+        """The cached (status, JSON) for this request, or None."""
+        key = _cache_key(env, index_name, path, params)
+        row = self.db.execute(
+            """
+            SELECT status, body FROM responses JOIN bodies ON body_hash = hash
+            WHERE key = ? AND fetched_at >= ?
+            """,
+            (key, time.time() - self.max_age_secs),
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        with self.db:
+            self.db.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+        status, body = row
+        return status, json.loads(zlib.decompress(body))
+
+    def put(self, env, index_name, path, params, status, body):
+        body_bytes = json.dumps(body, sort_keys=True).encode()
+        body_hash = hashlib.sha256(body_bytes).hexdigest()
+        now = time.time()
+
+        with self.db:
+            compressed = zlib.compress(body_bytes)
+            self.db.execute(
+                "INSERT OR IGNORE INTO bodies (hash, body, size) VALUES (?, ?, ?)",
+                (body_hash, compressed, len(compressed)),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _cache_key(env, index_name, path, params),
+                    env,
+                    index_name,
+                    path,
+                    json.dumps(params, sort_keys=True),
+                    status,
+                    body_hash,
+                    now,
+                    now,
+                ),
+            )
+
+    def scope(self, env, index_name):
+        """This cache, for the responses from one environment and index."""
+        return CacheScope(self, env, index_name)
+
+    def size(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[
+            0
+        ]
+
+    def evict(self):
+        """Drop expired entries, then the least recently used until it fits."""
+        with self.db:
+            self.db.execute(
+                "DELETE FROM responses WHERE fetched_at < ?",
+                (time.time() - self.max_age_secs,),
+            )
+            self._delete_unused_bodies()
+
+            while self.size() > self.max_bytes:
+                # Drop the least recently used tenth at a time, rather than
+                # one entry per query
+                deleted = self.db.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY used_at
+                        LIMIT MAX(1, (SELECT COUNT(*) FROM responses) / 10)
+                    )
+                    """).rowcount
+                self._delete_unused_bodies()
+                if not deleted:
+                    break
+
+    def _delete_unused_bodies(self):
+        self.db.execute(
+            "DELETE FROM bodies WHERE hash NOT IN (SELECT body_hash FROM responses)"
+        )
+
+    def close(self):
+        self.evict()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CacheScope:
+    def __init__(self, cache, env, index_name):
+        self.cache = cache
+        self.env = env
+        self.index_name = index_name
+
+    def get(self, path, params):
+        return self.cache.get(self.env, self.index_name, path, params)
+
+    def put(self, path, params, status, body):
+        self.cache.put(self.env, self.index_name, path, params, status, body)
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Generates routes for the diff tool by sampling a catalogue snapshot and a log
+of real requests, so a new index can be checked against thousands of URLs
+rather than only the hand-written ones in routes.json.
+
+    ./route_generator.py --snapshot works-2025-01-01.json.gz \\
+        --query-log requests.jsonl --count 20000 --outfile routes.jsonl
+    ./diff_tool.py --routes-file routes.jsonl --console
+
+Routes are written as JSONL, one {"path", "params", "stratum"} per line, and
+the diff tool reads JSONL routes lazily, so the two can also be piped
+together with ``--routes-file -``.
+
+Routes are split between these strata:
+
+    work          /works/{id}, sampled evenly across work types
+    image         /images/{id}
+    search        /works?query=..., from the query log (or work titles)
+    image-search  /images?query=...
+    filter        /works filtered on a value taken from a sampled work
+    aggregation   /works and /images searches with aggregations
+    logged        requests from the log, replayed as they were made
+
+The snapshot is the gzipped JSONL that snapshots/analysis downloads. It's
+read once, in a single pass, keeping a fixed-size uniform sample
+(a reservoir) of everything, so memory doesn't grow with its size.
+"""
+
+import gzip
+import json
+import math
+import random
+import sys
+import urllib.parse
+
+import click
+import tqdm
+
+STRATA = ("work", "image", "search", "image-search", "filter", "aggregation", "logged")
+
+DEFAULT_MIX = {
+    "work": 25,
+    "image": 10,
+    "search": 25,
+    "image-search": 5,
+    "filter": 20,
+    "aggregation": 10,
+    "logged": 5,
+}
+
+WORK_INCLUDES = [
+    None,
+    "items,holdings",
+    "identifiers,items,subjects,genres,contributors,production,languages,notes,images,succeededBy,precededBy,partOf,parts",
+]
+IMAGE_INCLUDES = [None, "source.contributors,source.languages,source.genres"]
+
+WORK_AGGREGATIONS = [
+    "workType",
+    "genres.label",
+    "production.dates",
+    "subjects.label",
+    "languages",
+    "contributors.agent.label",
+    "items.locations.license",
+    "availabilities",
+]
+IMAGE_AGGREGATIONS = [
+    "locations.license",
+    "source.contributors.agent.label",
+    "source.genres.label",
+    "source.subjects.label",
+]
+
+
+def _labels(values, key="label"):
+    return [v[key] for v in values or [] if isinstance(v, dict) and v.get(key)]
+
+
+# How to get the values a work could be found by for each /works filter
+WORK_FILTERS = {
+    "workType": lambda w: _labels([w.get("workType")], key="id"),
+    "languages": lambda w: _labels(w.get("languages"), key="id"),
+    "genres.label": lambda w: _labels(w.get("genres")),
+    "subjects.label": lambda w: _labels(w.get("subjects")),
+    "contributors.agent.label": lambda w: _labels(
+        [c.get("agent") for c in w.get("contributors") or []]
+    ),
+    "items.locations.license": lambda w: _labels(
+        [
+            loc.get("license")
+            for item in w.get("items") or []
+            for loc in item.get("locations") or []
+        ],
+        key="id",
+    ),
+    "availabilities": lambda w: _labels(w.get("availabilities"), key="id"),
+}
+
+
+class Reservoir:
+    """A uniform random sample of up to ``size`` of the values added to it."""
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.values = []
+
+    def add(self, value):
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            i = self.rng.randrange(self.seen)
+            if i < self.size:
+                self.values[i] = value
+
+
+class SnapshotSample:
+    """
+    Samples from one pass over a snapshot: work IDs (kept per work type, so
+    rare types aren't crowded out by common ones), image IDs, titles to use
+    as search terms, and values for each filter.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.works_by_type = {}
+        self.images = Reservoir(size, rng)
+        self.titles = Reservoir(size, rng)
+        self.filter_values = {name: Reservoir(size, rng) for name in WORK_FILTERS}
+
+    def add(self, work):
+        work_type = (work.get("workType") or {}).get("id", "none")
+        if work_type not in self.works_by_type:
+            self.works_by_type[work_type] = Reservoir(self.size, self.rng)
+        self.works_by_type[work_type].add(work["id"])
+
+        for image in work.get("images") or []:
+            self.images.add(image["id"])
+
+        if work.get("title"):
+            self.titles.add(work["title"])
+
+        for name, get_values in WORK_FILTERS.items():
+            for value in get_values(work):
+                self.filter_values[name].add(value)
+
+    def work_ids(self, count):
+        """Up to ``count`` work IDs, split as evenly as possible by work type."""
+        pools = [list(r.values) for r in self.works_by_type.values()]
+        for pool in pools:
+            self.rng.shuffle(pool)
+
+        # Round-robin across types, so each gets an equal share until the
+        # smaller ones run out.
+        ids = []
+        while len(ids) < count and any(pools):
+            for pool in pools:
+                if pool and len(ids) < count:
+                    ids.append(pool.pop())
+        return ids
+
+
+def read_snapshot(snapshot_filename, *, size, rng, max_works=None):
+    sample = SnapshotSample(size, rng)
+    with gzip.open(snapshot_filename) as f:
+        for i, line in enumerate(tqdm.tqdm(f, desc="Sampling snapshot", unit=" works")):
+            if max_works is not None and i >= max_works:
+                break
+            sample.add(json.loads(line))
+    return sample
+
+
+def read_query_log(log_path):
+    """
+    Reads requests from a log in the same formats as the load test's
+    ``replay``: JSONL with a ``path`` and ``params``, or a ``url``, per line;
+    or a plain list of queries, one per line.
+
+    Returns (queries by endpoint, logged routes), where the endpoint is
+    "works" or "images".
+    """
+    queries = {"works": [], "images": []}
+    routes = []
+
+    with open(log_path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    if not log_path.endswith(".jsonl"):
+        queries["works"] = lines
+        return queries, routes
+
+    for line in lines:
+        entry = json.loads(line)
+        if "url" in entry:
+            split = urllib.parse.urlsplit(entry["url"])
+            path = split.path
+            params = dict(urllib.parse.parse_qsl(split.query))
+        else:
+            path = entry["path"]
+            params = entry.get("params") or {}
+        path = path.removeprefix("/catalogue/v2")
+
+        endpoint = path.strip("/")
+        if endpoint in queries and params.get("query"):
+            queries[endpoint].append(params["query"])
+        routes.append({"path": path, "params": params})
+
+    return queries, routes
+
+
+def parse_mix(mix):
+    """Parse ``work=3,search=1`` into {stratum: weight}."""
+    weights = {}
+    for part in mix.split(","):
+        name, sep, weight = part.partition("=")
+        name = name.strip()
+        if name not in STRATA or not sep:
+            raise click.BadParameter(
+                f"expected STRATUM=WEIGHT with STRATUM one of {', '.join(STRATA)}, got {part!r}"
+            )
+        weights[name] = float(weight)
+    return weights
+
+
+def allocate(count, weights):
+    """
+    Split ``count`` between the strata in proportion to ``weights``, handing
+    out what's left after rounding down by the largest remainders.
+    """
+    total = sum(weights.values())
+    if total <= 0:
+        return {name: 0 for name in weights}
+
+    exact = {name: count * w / total for name, w in weights.items()}
+    counts = {name: math.floor(v) for name, v in exact.items()}
+    spare = count - sum(counts.values())
+    for name in sorted(exact, key=lambda n: counts[n] - exact[n])[:spare]:
+        counts[name] += 1
+    return counts
+
+
+class RouteGenerator:
+    def __init__(self, *, sample, queries, logged_routes, rng):
+        self.sample = sample
+        self.queries = queries
+        self.logged_routes = logged_routes
+        self.rng = rng
+
+    def available(self, stratum):
+        """Whether there's anything to build routes for ``stratum`` from."""
+        sample = self.sample
+        return {
+            "work": sample is not None and bool(sample.works_by_type),
+            "image": sample is not None and bool(sample.images.values),
+            "search": bool(self.queries["works"])
+            or (sample is not None and bool(sample.titles.values)),
+            "image-search": bool(self.queries["images"] or self.queries["works"]),
+            "filter": sample is not None
+            and any(r.values for r in sample.filter_values.values()),
+            "aggregation": True,
+            "logged": bool(self.logged_routes),
+        }[stratum]
+
+    def _include(self, params, includes):
+        include = self.rng.choice(includes)
+        if include:
+            params["include"] = include
+        return params
+
+    def _search_term(self):
+        if self.queries["works"]:
+            return self.rng.choice(self.queries["works"])
+        # Without a log, search for the start of a real title
+        words = self.rng.choice(self.sample.titles.values).split()
+        return " ".join(words[: self.rng.randint(1, 3)])
+
+    def work(self, count):
+        for work_id in self.sample.work_ids(count):
+            yield f"/works/{work_id}", self._include({}, WORK_INCLUDES)
+
+    def image(self, count):
+        for image_id in self.rng.sample(
+            self.sample.images.values, min(count, len(self.sample.images.values))
+        ):
+            yield f"/images/{image_id}", self._include({}, IMAGE_INCLUDES)
+
+    def search(self, count):
+        for _ in range(count):
+            yield "/works", {"query": self._search_term()}
+
+    def image_search(self, count):
+        terms = self.queries["images"] or self.queries["works"]
+        for _ in range(count):
+            yield "/images", {"query": self.rng.choice(terms)}
+
+    def filter(self, count):
+        filters = [
+            (name, r.values)
+            for name, r in self.sample.filter_values.items()
+            if r.values
+        ]
+        for i in range(count):
+            # Cycle through the filters, so each is tried about equally often
+            name, values = filters[i % len(filters)]
+            params = {name: self.rng.choice(values)}
+            if self.rng.random() < 0.5 and self.queries["works"]:
+                params["query"] = self._search_term()
+            yield "/works", params
+
+    def aggregation(self, count):
+        for _ in range(count):
+            if self.rng.random() < 0.8:
+                path, aggregations = "/works", WORK_AGGREGATIONS
+            else:
+                path, aggregations = "/images", IMAGE_AGGREGATIONS
+            chosen = self.rng.sample(aggregations, self.rng.randint(1, 3))
+            params = {"aggregations": ",".join(chosen)}
+            if self.rng.random() < 0.5 and self.available("search"):
+                params["query"] = self._search_term()
+            yield path, params
+
+    def logged(self, count):
+        chosen = self.rng.sample(
+            self.logged_routes, min(count, len(self.logged_routes))
+        )
+        for route in chosen:
+            yield route["path"], route["params"]
+
+    def routes(self, counts):
+        """
+        Yields up to ``counts[stratum]`` distinct routes for each stratum.
+        Strata that draw with replacement (like searches) may come up a
+        little short, rather than repeating a route.
+        """
+        seen = set()
+        for stratum, count in counts.items():
+            generate = getattr(self, stratum.replace("-", "_"))
+            for path, params in generate(count):
+                key = (path, tuple(sorted(params.items())))
+                if key in seen:
+                    continue
+                seen.add(key)
+                yield {"path": path, "params": params, "stratum": stratum}
+
+
+@click.command()
+@click.option("--snapshot", help="A gzipped JSONL works snapshot to sample from")
+@click.option(
+    "--query-log",
+    help="A request log (JSONL) or list of queries to take searches from",
+)
+@click.option(
+    "--count",
+    default=10000,
+    show_default=True,
+    help="Roughly how many routes to generate",
+)
+@click.option(
+    "--mix",
+    help="Relative weights for each stratum, e.g. work=3,search=2,filter=1 "
+    "(default: " + ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()) + ")",
+)
+@click.option(
+    "--max-works",
+    type=int,
+    help="Only read this many works from the snapshot (quicker, but less representative)",
+)
+@click.option("--seed", type=int, help="Seed for the random sampling, to repeat a run")
+@click.option(
+    "--outfile", default="-", help="Where to write the routes (default: stdout)"
+)
+def main(snapshot, query_log, count, mix, max_works, seed, outfile):
+    if snapshot is None and query_log is None:
+        raise click.UsageError("Pass at least one of --snapshot or --query-log")
+
+    rng = random.Random(seed)
+
+    queries, logged_routes = (
+        read_query_log(query_log) if query_log else ({"works": [], "images": []}, [])
+    )
+    sample = (
+        read_snapshot(snapshot, size=count, rng=rng, max_works=max_works)
+        if snapshot
+        else None
+    )
+
+    generator = RouteGenerator(
+        sample=sample, queries=queries, logged_routes=logged_routes, rng=rng
+    )
+
+    weights = parse_mix(mix) if mix else DEFAULT_MIX
+    skipped = [name for name in weights if not generator.available(name)]
+    for name in skipped:
+        print(f"Skipping {name} routes: nothing to sample them from", file=sys.stderr)
+    counts = allocate(
+        count, {name: w for name, w in weights.items() if name not in skipped}
+    )
+
+    written = 0
+    with click.open_file(outfile, "w") as out:
+        for route in generator.routes(counts):
+            out.write(json.dumps(route) + "\n")
+            written += 1
+
+    if outfile != "-":
+        print(f"Wrote {written} routes to {outfile}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 """
 loadtest — Load testing toolkit for comparing cluster backends vs default
-search on the Wellcome Collection catalogue API using Vegeta.
+search on the Wellcome Collection catalogue API using Vegeta (or the native
+asyncio engine in loadtest.native).
 """
 
 import argparse
-import json
+import asyncio
 import math
 import os
 import shutil
@@ -13,15 +14,58 @@ import subprocess
 import sys
 import tempfile
 import urllib.parse
+from collections import Counter
 from datetime import datetime
 
+from loadtest.distributed import (
+    DEFAULT_WORKER_HOST,
+    DEFAULT_WORKER_PORT,
+    TOKEN_ENV_VAR,
+    parse_address,
+    run_worker,
+    start_distributed_attacks,
+)
 from loadtest.live_graph import (
     parse_duration,
     run_fallback,
     run_plotext,
-    run_single_plotext,
     run_single_fallback,
+    run_single_plotext,
+)
+from loadtest.native import (
+    DEFAULT_BODY_SAMPLE_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    AttackThread,
+    attack,
+    start_native_attacks,
+)
+from loadtest.ramp import (
+    PROFILES,
+    max_sustainable_throughput,
+    run_ramp,
+    stage_rates,
 )
+from loadtest.regression import (
+    DEFAULT_BOOTSTRAP_SAMPLES,
+    DEFAULT_CONFIDENCE,
+    compare_rows,
+    print_mode_diff,
+)
+from loadtest.replay import (
+    endpoint,
+    read_request_log,
+    replay_duration,
+    replay_schedule,
+)
+from loadtest.report import (
+    generate_html_report,
+    print_latency_breakdown,
+    print_query_leaderboard,
+    print_text_histogram,
+    print_text_report,
+)
+from loadtest.store import ingest_run, load_run, mode_from_path
+from loadtest.variants import CLUSTERS, QUERY_TRANSFORMS, Variant, parse_variant
 
 OUTPUT_DIR = "results"
 
@@ -32,12 +76,18 @@ ENV_HOSTS = {
 }
 
 
-def env_to_base_url(env: str) -> str:
+def env_to_host_url(env: str) -> str:
+    if env.startswith(("http://", "https://")):
+        return env.rstrip("/")
     host = ENV_HOSTS.get(env)
     if not host:
-        print(f"Error: ENV must be dev, stage, or prod (got '{env}')")
+        print(f"Error: ENV must be dev, stage, prod or a URL (got '{env}')")
         sys.exit(1)
-    return f"https://{host}/catalogue/v2/works"
+    return f"https://{host}"
+
+
+def env_to_base_url(env: str) -> str:
+    return f"{env_to_host_url(env)}/catalogue/v2/works"
 
 
 def check_vegeta():
@@ -46,6 +96,15 @@ def check_vegeta():
         sys.exit(1)
 
 
+def check_engine(args):
+    if args.engine == "native":
+        return
+    if args.workers or args.remote:
+        print("Error: --workers and --remote need --engine native")
+        sys.exit(1)
+    check_vegeta()
+
+
 def read_queries(queries_file: str) -> list[str]:
     if not os.path.isfile(queries_file):
         print(f"Error: queries file '{queries_file}' not found.")
@@ -60,18 +119,27 @@ def read_queries(queries_file: str) -> list[str]:
     return queries
 
 
+def build_target_urls(
+    queries: list[str], base_url: str, semantic: bool, cluster: str = "elser"
+) -> list[str]:
+    urls = []
+    for query in queries:
+        encoded = urllib.parse.quote(query)
+        if semantic:
+            urls.append(f"{base_url}?elasticCluster={cluster}&query={encoded}")
+        else:
+            urls.append(f"{base_url}?query={encoded}")
+    return urls
+
+
 def build_targets(
     queries: list[str], base_url: str, semantic: bool, cluster: str = "elser"
 ) -> str:
     """Write vegeta target lines to a temp file. Returns the file path."""
     fd, path = tempfile.mkstemp(suffix=".txt", prefix="vegeta-targets-")
     with os.fdopen(fd, "w") as f:
-        for query in queries:
-            encoded = urllib.parse.quote(query)
-            if semantic:
-                f.write(f"GET {base_url}?elasticCluster={cluster}&query={encoded}\n")
-            else:
-                f.write(f"GET {base_url}?query={encoded}\n")
+        for url in build_target_urls(queries, base_url, semantic, cluster):
+            f.write(f"GET {url}\n")
     return path
 
 
@@ -92,94 +160,47 @@ def run_attack(targets_file: str, rate: int, duration: str, output_bin: str):
         subprocess.run(cmd, stdout=out, check=True)
 
 
-def run_parallel_attacks(
-    sem_targets: str,
-    default_targets: str,
-    rate: int,
-    duration: str,
-    sem_bin: str,
-    default_bin: str,
-    sem_jsonl: str,
-    default_jsonl: str,
-):
-    """Launch two vegeta attack pipelines in parallel, producing both .bin and .jsonl."""
-    # semantic: vegeta attack | tee sem.bin | vegeta encode --to json > sem.jsonl
-    sem_jsonl_f = open(sem_jsonl, "w")
-    sem_attack = subprocess.Popen(
-        [
-            "vegeta",
-            "attack",
-            f"-targets={sem_targets}",
-            f"-rate={rate}/s",
-            f"-duration={duration}",
-        ],
-        stdout=subprocess.PIPE,
-    )
-    sem_tee = subprocess.Popen(
-        ["tee", sem_bin],
-        stdin=sem_attack.stdout,
-        stdout=subprocess.PIPE,
-    )
-    sem_attack.stdout.close()
-    sem_encode = subprocess.Popen(
-        ["vegeta", "encode", "--to", "json"],
-        stdin=sem_tee.stdout,
-        stdout=sem_jsonl_f,
-    )
-    sem_tee.stdout.close()
+def run_parallel_attacks(jobs, rate: int, duration: str):
+    """
+    Launch one vegeta attack pipeline per (targets_file, bin_path, jsonl_path)
+    in ``jobs``, all in parallel. Returns the pipelines.
+    """
+    return [
+        run_single_attack_pipeline(targets_file, rate, duration, bin_path, jsonl_path)
+        for targets_file, bin_path, jsonl_path in jobs
+    ]
 
-    # default: vegeta attack | tee default.bin | vegeta encode --to json > default.jsonl
-    default_jsonl_f = open(default_jsonl, "w")
-    default_attack = subprocess.Popen(
-        [
-            "vegeta",
-            "attack",
-            f"-targets={default_targets}",
-            f"-rate={rate}/s",
-            f"-duration={duration}",
-        ],
-        stdout=subprocess.PIPE,
-    )
-    default_tee = subprocess.Popen(
-        ["tee", default_bin],
-        stdin=default_attack.stdout,
-        stdout=subprocess.PIPE,
-    )
-    default_attack.stdout.close()
-    default_encode = subprocess.Popen(
-        ["vegeta", "encode", "--to", "json"],
-        stdin=default_tee.stdout,
-        stdout=default_jsonl_f,
-    )
-    default_tee.stdout.close()
 
-    return (sem_attack, sem_tee, sem_encode, sem_jsonl_f), (
-        default_attack,
-        default_tee,
-        default_encode,
-        default_jsonl_f,
-    )
+def wait_pipelines(pipelines):
+    for pipeline in pipelines:
+        wait_single_pipeline(pipeline)
 
 
-def wait_pipelines(sem_pipeline, default_pipeline):
-    for proc in sem_pipeline[:3]:
-        proc.wait()
-    sem_pipeline[3].close()
-    for proc in default_pipeline[:3]:
-        proc.wait()
-    default_pipeline[3].close()
+def print_report(results):
+    """``results`` is either a vegeta .bin file, or rows from a stored run."""
+    if isinstance(results, str):
+        subprocess.run(["vegeta", "report", results])
+    else:
+        print_text_report(results)
 
 
-def generate_report(bin_path: str, label: str):
+def print_histogram(results):
+    if isinstance(results, str):
+        subprocess.run(
+            ["vegeta", "report", "-type=hist[0,200ms,500ms,1s,2s,5s,10s]", results]
+        )
+    else:
+        print_text_histogram(results)
+
+
+def generate_report(results, label: str):
     print(f"\n--- {label} ---")
-    subprocess.run(["vegeta", "report", bin_path])
+    print_report(results)
 
 
-def generate_histogram(bin_path: str, label: str):
+def generate_histogram(results, label: str):
     print(f"\n{label}:")
-    subprocess.run(
-        ["vegeta", "report", "-type=hist[0,200ms,500ms,1s,2s,5s,10s]", bin_path]
-    )
+    print_histogram(results)
 
 
 def generate_plot(bin_path: str, html_path: str):
@@ -191,71 +212,6 @@ def generate_plot(bin_path: str, html_path: str):
         pass
 
 
-def generate_html_report(sem_jsonl: str, default_jsonl: str, output_html: str):
-    """Build a self-contained Plotly.js comparison HTML report."""
-
-    def load_jsonl(path):
-        results = []
-        try:
-            with open(path) as f:
-                for line in f:
-                    if line.strip():
-                        try:
-                            results.append(json.loads(line))
-                        except json.JSONDecodeError:
-                            pass
-        except FileNotFoundError:
-            pass
-        return results
-
-    def ts(s):
-        return datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp()
-
-    sem = load_jsonl(sem_jsonl)
-    default_results = load_jsonl(default_jsonl)
-
-    if sem or default_results:
-        all_results = sem + default_results
-        t0 = min(ts(r["timestamp"]) for r in all_results)
-        sem_t = [ts(r["timestamp"]) - t0 for r in sem]
-        sem_l = [r["latency"] / 1e6 for r in sem]
-        default_t = [ts(r["timestamp"]) - t0 for r in default_results]
-        default_l = [r["latency"] / 1e6 for r in default_results]
-        data_js = (
-            f"var semT = {json.dumps(sem_t)};\n"
-            f"var semL = {json.dumps(sem_l)};\n"
-            f"var defaultT = {json.dumps(default_t)};\n"
-            f"var defaultL = {json.dumps(default_l)};\n"
-        )
-    else:
-        data_js = "var semT=[],semL=[],defaultT=[],defaultL=[];\n"
-
-    html = f"""<!DOCTYPE html>
-<html><head><title>Vegeta Load Test Comparison</title>
-<script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
-<style>body{{font-family:system-ui;margin:20px;background:#1a1a2e;color:#eee}}h1{{color:#e94560}}.chart{{width:100%;height:500px;margin:20px 0}}</style>
-</head><body>
-<h1>Semantic vs Default Search &mdash; Load Test Comparison</h1>
-<div id="latency" class="chart"></div>
-<div id="histogram" class="chart"></div>
-<script>
-{data_js}
-Plotly.newPlot('latency', [
-  {{x:semT,y:semL,mode:'markers',name:'Semantic (ELSER)',marker:{{size:5,color:'#e94560',opacity:0.7}}}},
-  {{x:defaultT,y:defaultL,mode:'markers',name:'Default',marker:{{size:5,color:'#0f3460',opacity:0.7}}}}
-],{{title:'Response Latency Over Time',xaxis:{{title:'Time (s)'}},yaxis:{{title:'Latency (ms)'}},
-   paper_bgcolor:'#1a1a2e',plot_bgcolor:'#16213e',font:{{color:'#eee'}}}});
-Plotly.newPlot('histogram', [
-  {{x:semL,type:'histogram',name:'Semantic (ELSER)',opacity:0.7,marker:{{color:'#e94560'}}}},
-  {{x:defaultL,type:'histogram',name:'Default',opacity:0.7,marker:{{color:'#0f3460'}}}}
-],{{title:'Latency Distribution',barmode:'overlay',xaxis:{{title:'Latency (ms)'}},yaxis:{{title:'Count'}},
-   paper_bgcolor:'#1a1a2e',plot_bgcolor:'#16213e',font:{{color:'#eee'}}}});
-</script></body></html>"""
-
-    with open(output_html, "w") as f:
-        f.write(html)
-
-
 # ── Subcommand handlers ──────────────────────────────────────────────
 
 
@@ -293,14 +249,57 @@ def wait_single_pipeline(pipeline):
     pipeline[3].close()
 
 
+def native_options(args) -> dict:
+    return {
+        "max_in_flight": args.max_in_flight,
+        "body_sample_rate": args.sample_bodies,
+    }
+
+
+def start_native(args, urls, dur_secs, jsonl_path):
+    """
+    Start a native attack in the background, in this process or spread over
+    worker processes if --workers/--remote were given. Returns the thread.
+    """
+    return start_native_jobs(args, [(urls, jsonl_path)], dur_secs)
+
+
+def start_native_jobs(args, jobs, dur_secs):
+    """
+    Like ``start_native``, for several (urls, jsonl_path) attacks at once.
+    They share a start time, whether they run here or on workers.
+    """
+    if args.workers or args.remote:
+        return start_distributed_attacks(
+            jobs,
+            args.rate,
+            dur_secs,
+            local_workers=args.workers,
+            remote_workers=[parse_address(a) for a in args.remote],
+            token=args.token,
+            **native_options(args),
+        )
+    return start_native_attacks(jobs, args.rate, dur_secs, **native_options(args))
+
+
+def wait_native(thread):
+    """
+    Wait for a native attack's thread, and stop with an error if the attack
+    failed, rather than going on to report a partial run.
+    """
+    try:
+        thread.join()
+    except Exception as e:
+        print(f"Error: the attack failed: {str(e) or type(e).__name__}")
+        sys.exit(1)
+
+
 def cmd_search(args):
-    check_vegeta()
+    native = args.engine == "native"
+    check_engine(args)
     base_url = env_to_base_url(args.env)
     queries = read_queries(args.queries)
     semantic = args.cluster is not None
-    targets = build_targets(
-        queries, base_url, semantic=semantic, cluster=args.cluster or "elser"
-    )
 
     duration = args.duration
     if duration == "0":
@@ -311,24 +310,38 @@ def cmd_search(args):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     mode_tag = f"semantic_{args.cluster}" if semantic else "default"
     results_bin = os.path.join(OUTPUT_DIR, f"results_{mode_tag}_{timestamp}.bin")
+    jsonl_path = os.path.join(OUTPUT_DIR, f"results_{mode_tag}_{timestamp}.jsonl")
 
     mode_label = f"semantic ({args.cluster})" if semantic else "default"
     print(f"Loaded {len(queries)} queries from {args.queries}")
     print(f"Environment: {args.env} ({ENV_HOSTS[args.env]})")
     print(f"Mode: {mode_label}")
+    print(f"Engine: {args.engine}")
     print(f"Rate: {args.rate}/s")
     if duration != args.duration:
         pass  # already printed above
     else:
         print(f"Duration: {duration}")
 
-    if args.live:
-        jsonl_path = os.path.join(OUTPUT_DIR, f"results_{mode_tag}_{timestamp}.jsonl")
-        pipeline = run_single_attack_pipeline(
-            targets, args.rate, duration, results_bin, jsonl_path
+    dur_secs = parse_duration(duration)
+
+    if native:
+        urls = build_target_urls(
+            queries, base_url, semantic=semantic, cluster=args.cluster or "elser"
         )
+    else:
+        targets = build_targets(
+            queries, base_url, semantic=semantic, cluster=args.cluster or "elser"
+        )
+
+    if args.live:
+        if native:
+            thread = start_native(args, urls, dur_secs, jsonl_path)
+        else:
+            pipeline = run_single_attack_pipeline(
+                targets, args.rate, duration, results_bin, jsonl_path
+            )
 
-        dur_secs = parse_duration(duration)
         print()
         print("Streaming live results... (Ctrl+C to stop early)")
         print()
@@ -340,66 +353,150 @@ def cmd_search(args):
         except ImportError:
             run_single_fallback(jsonl_path, dur_secs, label=mode_label)
 
-        wait_single_pipeline(pipeline)
-        os.unlink(targets)
+        if native:
+            wait_native(thread)
+        else:
+            wait_single_pipeline(pipeline)
+            os.unlink(targets)
+    elif native:
+        wait_native(start_native(args, urls, dur_secs, jsonl_path))
     else:
         try:
             run_attack(targets, args.rate, duration, results_bin)
         finally:
             os.unlink(targets)
 
+    run_path = None
+    if os.path.exists(jsonl_path):
+        run_path = ingest_run(
+            {mode_tag: jsonl_path},
+            os.path.join(OUTPUT_DIR, f"run_{mode_tag}_{timestamp}.npy"),
+        )
+    results = load_run(run_path).select(mode_tag) if native else results_bin
+
     print(f"\n=== {mode_label.title()} Search Summary ===")
-    subprocess.run(["vegeta", "report", results_bin])
+    print_report(results)
 
     print("\n=== Latency Histogram ===")
-    subprocess.run(
-        ["vegeta", "report", "-type=hist[0,200ms,500ms,1s,2s,5s,10s]", results_bin]
-    )
+    print_histogram(results)
+
+    if run_path:
+        print("\n=== Latency Breakdown ===")
+        print_latency_breakdown(load_run(run_path).by_mode())
 
-    html_path = os.path.join(OUTPUT_DIR, f"plot_{mode_tag}_{timestamp}.html")
-    generate_plot(results_bin, html_path)
+    if not native:
+        html_path = os.path.join(OUTPUT_DIR, f"plot_{mode_tag}_{timestamp}.html")
+        generate_plot(results_bin, html_path)
 
-    print(f"\nRaw results saved to {results_bin}")
+    print(f"\nRaw results saved to {jsonl_path if native else results_bin}")
+    if run_path:
+        print(f"Columnar run saved to {run_path}")
+
+
+def compare_variants(args) -> list[Variant]:
+    """
+    The variants to compare: each --variant, or for the original two-way
+    comparison, --cluster against default search.
+    """
+    if args.variant and args.cluster:
+        print("Error: use either --cluster or --variant, not both")
+        sys.exit(1)
+    if not args.variant:
+        if not args.cluster:
+            print("Error: give --cluster, or two or more --variant")
+            sys.exit(1)
+        return [
+            Variant("semantic", env=args.env, cluster=args.cluster),
+            Variant("default", env=args.env),
+        ]
+
+    try:
+        variants = [
+            parse_variant(tokens, default_env=args.env) for tokens in args.variant
+        ]
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    names = [v.name for v in variants]
+    if len(variants) < 2 or len(set(names)) != len(names):
+        print("Error: give two or more --variant, with different names")
+        sys.exit(1)
+    return variants
 
 
 def cmd_compare(args):
-    check_vegeta()
-    base_url = env_to_base_url(args.env)
+    native = args.engine == "native"
+    check_engine(args)
+    variants = compare_variants(args)
+    baseline = args.baseline or ("default" if args.cluster else variants[0].name)
+    if baseline not in [v.name for v in variants]:
+        print(f"Error: baseline '{baseline}' is not one of the variants")
+        sys.exit(1)
     queries = read_queries(args.queries)
-    sem_targets = build_targets(queries, base_url, semantic=True, cluster=args.cluster)
-    default_targets = build_targets(queries, base_url, semantic=False)
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    sem_bin = os.path.join(OUTPUT_DIR, f"semantic_{timestamp}.bin")
-    default_bin = os.path.join(OUTPUT_DIR, f"default_{timestamp}.bin")
-    sem_jsonl = os.path.join(OUTPUT_DIR, f"semantic_{timestamp}.jsonl")
-    default_jsonl = os.path.join(OUTPUT_DIR, f"default_{timestamp}.jsonl")
+    bin_paths = {
+        v.name: os.path.join(OUTPUT_DIR, f"{v.name}_{timestamp}.bin") for v in variants
+    }
+    jsonl_paths = {
+        v.name: os.path.join(OUTPUT_DIR, f"{v.name}_{timestamp}.jsonl")
+        for v in variants
+    }
 
     print("=== Parallel Load Test ===")
-    print(f"Environment: {args.env} ({ENV_HOSTS[args.env]})")
     print(f"Queries: {len(queries)} from {args.queries}")
-    print(f"Cluster: {args.cluster}")
-    print(f"Rate: {args.rate}/s per test ({args.rate}x2 total)")
+    print("Variants:")
+    for v in variants:
+        marker = "  (baseline)" if v.name == baseline else ""
+        print(f"  {v.name:<12} {v.describe()}{marker}")
+    print(f"Engine: {args.engine}")
+    print(f"Rate: {args.rate}/s per variant ({args.rate}x{len(variants)} total)")
     print(f"Duration: {args.duration}")
     print()
 
-    print("Starting semantic search attack...")
-    print("Starting default search attack...")
-
-    sem_pipeline, default_pipeline = run_parallel_attacks(
-        sem_targets,
-        default_targets,
-        args.rate,
-        args.duration,
-        sem_bin,
-        default_bin,
-        sem_jsonl,
-        default_jsonl,
-    )
+    for v in variants:
+        print(f"Starting {v.name} attack...")
 
     dur_secs = parse_duration(args.duration)
 
+    urls = {
+        v.name: build_target_urls(
+            v.queries(queries),
+            env_to_base_url(v.env),
+            semantic=v.semantic,
+            cluster=v.cluster,
+        )
+        for v in variants
+    }
+    # Each variant's URLs, back to the query they were made from, so the
+    # per-query stats pair a transformed query with the baseline's
+    query_urls = {
+        name: dict(zip(variant_urls, queries)) for name, variant_urls in urls.items()
+    }
+
+    if native:
+        jobs = [(urls[v.name], jsonl_paths[v.name]) for v in variants]
+        # One event loop (or one coordinator) for every variant, so they
+        # share a pacing clock
+        threads = [start_native_jobs(args, jobs, dur_secs)]
+    else:
+        targets = {
+            v.name: build_targets(
+                v.queries(queries),
+                env_to_base_url(v.env),
+                semantic=v.semantic,
+                cluster=v.cluster,
+            )
+            for v in variants
+        }
+        pipelines = run_parallel_attacks(
+            [(targets[name], bin_paths[name], jsonl_paths[name]) for name in targets],
+            args.rate,
+            args.duration,
+        )
+
     if args.live:
         print()
         print("Streaming live results... (Ctrl+C to stop early)")
@@ -408,41 +505,349 @@ def cmd_compare(args):
         try:
             import plotext  # noqa: F401
 
-            run_plotext(sem_jsonl, default_jsonl, dur_secs)
+            run_plotext(jsonl_paths, dur_secs, baseline=baseline)
         except ImportError:
-            run_fallback(sem_jsonl, default_jsonl, dur_secs)
+            run_fallback(jsonl_paths, dur_secs)
 
-    wait_pipelines(sem_pipeline, default_pipeline)
+    if native:
+        for thread in threads:
+            wait_native(thread)
+    else:
+        wait_pipelines(pipelines)
+
+        # Clean up target files
+        for targets_file in targets.values():
+            os.unlink(targets_file)
 
-    # Clean up target files
-    os.unlink(sem_targets)
-    os.unlink(default_targets)
+    run_path = ingest_run(
+        jsonl_paths,
+        os.path.join(OUTPUT_DIR, f"run_{timestamp}.npy"),
+        query_urls=query_urls,
+    )
+    run = load_run(run_path)
+    results = run.by_mode() if native else bin_paths
 
     print()
     print("============================================")
     print("=== Final Reports ===")
     print("============================================")
 
-    generate_report(sem_bin, "Semantic Search")
-    generate_report(default_bin, "Default Search")
+    for v in variants:
+        generate_report(results[v.name], f"{v.name.title()} Search")
 
     print("\n--- Latency Histograms ---")
-    generate_histogram(sem_bin, "Semantic")
-    generate_histogram(default_bin, "Default")
+    for v in variants:
+        generate_histogram(results[v.name], v.name.title())
+
+    print("\n--- Latency Breakdown ---")
+    print_latency_breakdown(run.by_mode())
+
+    print("\n--- Per-query Latency ---")
+    print_query_leaderboard(run, baseline=baseline)
 
     combined_html = os.path.join(OUTPUT_DIR, f"comparison_{timestamp}.html")
-    generate_html_report(sem_jsonl, default_jsonl, combined_html)
+    generate_html_report(run_path, combined_html)
 
+    width = max(len("Columnar run:"), *(len(v.name) + 1 for v in variants))
     print()
     print("Results saved to:")
-    print(f"  Semantic:     {sem_bin}")
-    print(f"  Default:      {default_bin}")
-    print(f"  HTML report:  {combined_html}")
+    for v in variants:
+        path = jsonl_paths[v.name] if native else bin_paths[v.name]
+        print(f"  {v.name + ':':<{width}}  {path}")
+    print(f"  {'Columnar run:':<{width}}  {run_path}")
+    print(f"  {'HTML report:':<{width}}  {combined_html}")
+
+
+def cmd_ramp(args):
+    base_url = env_to_base_url(args.env)
+    queries = read_queries(args.queries)
+    rates = stage_rates(args.start_rate, args.end_rate, args.stages)
+    stage_secs = parse_duration(args.stage_duration)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    print("=== Ramp Load Test ===")
+    print(f"Environment: {args.env} ({ENV_HOSTS[args.env]})")
+    print(f"Queries: {len(queries)} from {args.queries}")
+    print(f"Clusters: {', '.join(args.cluster)}")
+    print(f"Profile: {args.profile}, {len(rates)} stages of {args.stage_duration}")
+    print(f"Rates: {' → '.join(f'{r:g}' for r in rates)} rps")
+    print(
+        f"Stop when: p99 > {args.max_p99}ms or error rate > {args.max_error_rate:.1%}"
+    )
+
+    def print_stage(stage):
+        status = "ok" if stage.passed else "SATURATED"
+        print(
+            f"  {stage.target_rate:>7g} rps  achieved={stage.throughput:>7.1f}/s  "
+            f"p50={stage.p50:>8.1f}ms  p99={stage.p99:>8.1f}ms  "
+            f"errors={stage.error_rate:>6.1%}  {status}"
+        )
+
+    sustainable = {}
+    for cluster in args.cluster:
+        print(f"\n--- {cluster} ---")
+        urls = build_target_urls(
+            queries, base_url, semantic=cluster != "default", cluster=cluster
+        )
+        stages = run_ramp(
+            urls,
+            rates,
+            stage_secs,
+            label=cluster,
+            output_prefix=os.path.join(OUTPUT_DIR, f"ramp_{cluster}_{timestamp}"),
+            profile=args.profile,
+            max_p99_ms=args.max_p99,
+            max_error_rate=args.max_error_rate,
+            on_stage=print_stage,
+            **native_options(args),
+        )
+        sustainable[cluster] = max_sustainable_throughput(stages)
+        if all(s.passed for s in stages):
+            print(
+                f"  (never saturated — try a higher --end-rate than {args.end_rate:g})"
+            )
+
+    print()
+    print("============================================")
+    print("=== Max Sustainable Throughput ===")
+    print("============================================")
+    for cluster, throughput in sustainable.items():
+        print(f"  {cluster:<10} {throughput:>8.1f} req/s")
+    print(f"\nResults saved to {OUTPUT_DIR}/ramp_<cluster>_{timestamp}.npy")
+
+
+def cmd_replay(args):
+    if not os.path.isfile(args.log):
+        print(f"Error: request log '{args.log}' not found.")
+        sys.exit(1)
+    logged = read_request_log(args.log)
+    if not logged:
+        print(f"Error: request log '{args.log}' is empty.")
+        sys.exit(1)
+
+    host_url = env_to_host_url(args.env)
+    dur_secs = parse_duration(args.duration) if args.duration else None
+    replay_secs = replay_duration(logged, speed=args.speed, rate=args.rate)
+    if dur_secs is not None:
+        replay_secs = min(replay_secs, dur_secs)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    jsonl_path = os.path.join(OUTPUT_DIR, f"replay_{timestamp}.jsonl")
+
+    mix = Counter(endpoint(host_url + r.path) for r in logged)
+    print("=== Replay Load Test ===")
+    print(f"Environment: {args.env} ({ENV_HOSTS[args.env]})")
+    print(f"Request log: {len(logged)} requests from {args.log}")
+    if args.rate:
+        print(f"Timing: evenly spaced at {args.rate:g}/s")
+    else:
+        print(f"Timing: original inter-arrival times at {args.speed:g}x speed")
+    print(f"Duration: {replay_secs:.0f}s")
+    print("Endpoint mix:")
+    for name, count in mix.most_common():
+        print(f"  {name:<20} {count:>7}  {count / len(logged):>6.1%}")
+
+    requests = replay_schedule(
+        logged, host_url, speed=args.speed, rate=args.rate, duration_secs=dur_secs
+    )
+    attack_kwargs = native_options(args)
+
+    if args.live:
+        thread = AttackThread(
+            target=lambda: asyncio.run(attack(requests, jsonl_path, **attack_kwargs))
+        )
+        thread.start()
+
+        print()
+        print("Streaming live results... (Ctrl+C to stop early)")
+        print()
+
+        try:
+            import plotext  # noqa: F401
+
+            run_single_plotext(jsonl_path, math.ceil(replay_secs), label="Replay")
+        except ImportError:
+            run_single_fallback(jsonl_path, math.ceil(replay_secs), label="Replay")
+
+        wait_native(thread)
+    else:
+        asyncio.run(attack(requests, jsonl_path, **attack_kwargs))
+
+    run_path = ingest_run(
+        {"replay": jsonl_path},
+        os.path.join(OUTPUT_DIR, f"run_replay_{timestamp}.npy"),
+        mode_of=endpoint,
+    )
+    run = load_run(run_path)
+
+    print()
+    print("============================================")
+    print("=== Final Reports ===")
+    print("============================================")
+
+    generate_report(run.results, "All requests")
+    for name, rows in run.by_mode().items():
+        generate_report(rows, name)
+
+    print("\n--- Latency Breakdown ---")
+    print_latency_breakdown(run.by_mode())
+
+    html_path = os.path.join(OUTPUT_DIR, f"replay_{timestamp}.html")
+    generate_html_report(run_path, html_path)
+
+    print()
+    print("Results saved to:")
+    print(f"  Raw results:  {jsonl_path}")
+    print(f"  Columnar run: {run_path}")
+    print(f"  HTML report:  {html_path}")
+
+
+def cmd_queries(args):
+    if not os.path.isfile(args.run):
+        print(f"Error: run file '{args.run}' not found.")
+        sys.exit(1)
+    run = load_run(args.run)
+    if args.baseline is not None and args.baseline not in run.modes:
+        print(f"Error: no mode '{args.baseline}' in run (has {', '.join(run.modes)})")
+        sys.exit(1)
+    print_query_leaderboard(run, baseline=args.baseline, top=args.top)
+
+
+def cmd_diff(args):
+    runs = []
+    for run_path in (args.run_a, args.run_b):
+        if not os.path.isfile(run_path):
+            print(f"Error: run file '{run_path}' not found.")
+            sys.exit(1)
+        runs.append(load_run(run_path))
+    run_a, run_b = runs
+
+    if args.mode:
+        pairs = []
+        for mode in args.mode:
+            mode_a, _, mode_b = mode.partition(":")
+            pairs.append((mode_a, mode_b or mode_a))
+    elif set(run_a.modes) & set(run_b.modes):
+        pairs = [(m, m) for m in run_a.modes if m in run_b.modes]
+    elif len(run_a.modes) == len(run_b.modes) == 1:
+        pairs = [(run_a.modes[0], run_b.modes[0])]
+    else:
+        print(
+            f"Error: runs have no modes in common (A: {', '.join(run_a.modes)}; "
+            f"B: {', '.join(run_b.modes)}), so pick some with --mode"
+        )
+        sys.exit(1)
+
+    print(f"A (baseline):  {args.run_a}")
+    print(f"B (candidate): {args.run_b}")
+
+    regressed = []
+    for mode_a, mode_b in pairs:
+        for run, mode, label in ((run_a, mode_a, "A"), (run_b, mode_b, "B")):
+            if mode not in run.modes:
+                print(f"Error: no mode '{mode}' in run {label}")
+                sys.exit(1)
+        rows_a, rows_b = run_a.select(mode_a), run_b.select(mode_b)
+        if not len(rows_a) or not len(rows_b):
+            print(f"Error: no results for {mode_a} vs {mode_b}")
+            sys.exit(1)
+
+        diff = compare_rows(
+            mode_a if mode_a == mode_b else f"{mode_a} vs {mode_b}",
+            rows_a,
+            rows_b,
+            max_p50_increase=args.max_p50_increase,
+            max_p99_increase=args.max_p99_increase,
+            max_error_rate_increase=args.max_error_rate_increase,
+            confidence=args.confidence,
+            n_boot=args.bootstrap,
+        )
+        print_mode_diff(diff, confidence=args.confidence)
+        if diff.regressed:
+            regressed.append(diff.mode)
+
+    print()
+    if regressed:
+        print(f"REGRESSION in {', '.join(regressed)}")
+        sys.exit(1)
+    print("No significant regression")
+
+
+def cmd_ingest(args):
+    jsonl_paths = {}
+    for arg in args.results:
+        mode, sep, path = arg.rpartition("=")
+        if not sep:
+            mode = mode_from_path(path)
+        if not os.path.isfile(path):
+            print(f"Error: results file '{path}' not found.")
+            sys.exit(1)
+        jsonl_paths[mode] = path
+
+    run_path = (
+        args.output or os.path.splitext(args.results[0].rpartition("=")[2])[0] + ".npy"
+    )
+    ingest_run(jsonl_paths, run_path)
+
+    run = load_run(run_path)
+    print(f"Ingested {len(run.results)} results ({', '.join(run.modes)}) to {run_path}")
+
+
+def cmd_worker(args):
+    try:
+        run_worker(args.host, args.port, token=args.token)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
 
 
 # ── CLI ───────────────────────────────────────────────────────────────
 
 
+def positive_float(value):
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, not {value}")
+    return number
+
+
+def add_env_arg(parser):
+    parser.add_argument(
+        "--env",
+        default="dev",
+        choices=["dev", "stage", "prod"],
+        help="API environment (default: dev)",
+    )
+
+
+def add_native_args(parser, native_only=False):
+    """
+    Options for the native engine. ``native_only`` marks them as such, for
+    commands that can use either engine.
+    """
+    prefix = "native engine only: " if native_only else ""
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f"{prefix}cap on concurrent requests "
+        f"(default: {DEFAULT_MAX_IN_FLIGHT}"
+        + (", per worker with --workers/--remote)" if native_only else ")"),
+    )
+    parser.add_argument(
+        "--sample-bodies",
+        type=float,
+        default=DEFAULT_BODY_SAMPLE_RATE,
+        help=f"{prefix}fraction of response bodies to parse for totalResults "
+        f"(default: {DEFAULT_BODY_SAMPLE_RATE})",
+    )
+
+
 def add_common_args(parser, default_duration="30s"):
     parser.add_argument(
         "queries",
@@ -458,11 +863,39 @@ def add_common_args(parser, default_duration="30s"):
         default=default_duration,
         help=f"test duration e.g. 30s, 1m (default: {default_duration})",
     )
+    add_env_arg(parser)
     parser.add_argument(
-        "--env",
-        default="dev",
-        choices=["dev", "stage", "prod"],
-        help="API environment (default: dev)",
+        "--engine",
+        default="vegeta",
+        choices=["vegeta", "native"],
+        help="load generator: shell out to vegeta, or the built-in asyncio "
+        "engine (default: vegeta)",
+    )
+    add_native_args(parser, native_only=True)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="native engine only: split the rate across this many local "
+        "worker processes",
+    )
+    parser.add_argument(
+        "--remote",
+        type=lambda s: [a for a in s.split(",") if a],
+        default=[],
+        metavar="HOST:PORT,...",
+        help="native engine only: also split the rate across these remote "
+        "workers (started with `loadtest worker`)",
+    )
+    add_token_arg(parser)
+
+
+def add_token_arg(parser):
+    parser.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV_VAR),
+        help="shared secret that remote workers require in every job "
+        f"(default: ${TOKEN_ENV_VAR})",
     )
 
 
@@ -475,15 +908,30 @@ def main():
 
     # compare
     p_compare = subparsers.add_parser(
-        "compare", help="Run semantic + default in parallel"
+        "compare",
+        help="Run several variants (clusters, environments, query transforms) "
+        "in parallel",
     )
     add_common_args(p_compare)
     p_compare.add_argument(
         "--cluster",
-        required=True,
         choices=["elser", "openai"],
         help="semantic cluster to compare against default search",
     )
+    p_compare.add_argument(
+        "--variant",
+        nargs="+",
+        action="append",
+        metavar="NAME [KEY=VALUE]",
+        help="a variant to compare, with optional env=ENV|URL, "
+        f"cluster={{{','.join(CLUSTERS)}}} and "
+        f"transform={{{','.join(QUERY_TRANSFORMS)}}} (repeat for each variant)",
+    )
+    p_compare.add_argument(
+        "--baseline",
+        help="variant the others are compared against (default: the first "
+        "--variant, or default search with --cluster)",
+    )
     p_compare.add_argument(
         "--live", action="store_true", help="show live terminal graph during test"
     )
@@ -505,6 +953,189 @@ def main():
     )
     p_search.set_defaults(func=cmd_search)
 
+    # ramp
+    p_ramp = subparsers.add_parser(
+        "ramp",
+        help="Raise the rate in stages until p99 or errors pass a threshold "
+        "(native engine)",
+    )
+    p_ramp.add_argument(
+        "queries",
+        nargs="?",
+        default="queries.txt",
+        help="queries file (default: queries.txt)",
+    )
+    p_ramp.add_argument(
+        "--cluster",
+        nargs="+",
+        default=["default"],
+        choices=["default", "elser", "openai"],
+        help="clusters to ramp, one after another (default: default)",
+    )
+    p_ramp.add_argument(
+        "--start-rate", type=float, default=5, help="first stage rate (default: 5)"
+    )
+    p_ramp.add_argument(
+        "--end-rate", type=float, default=200, help="last stage rate (default: 200)"
+    )
+    p_ramp.add_argument(
+        "--stages", type=int, default=8, help="number of stages (default: 8)"
+    )
+    p_ramp.add_argument(
+        "--stage-duration",
+        default="30s",
+        help="duration of each stage e.g. 30s, 1m (default: 30s)",
+    )
+    p_ramp.add_argument(
+        "--profile",
+        default="step",
+        choices=PROFILES,
+        help="step: constant rate per stage; linear: ramp smoothly from the "
+        "previous stage's rate (default: step)",
+    )
+    p_ramp.add_argument(
+        "--max-p99",
+        type=float,
+        default=2000,
+        help="stop once a stage's p99 exceeds this many ms (default: 2000)",
+    )
+    p_ramp.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=0.01,
+        help="stop once a stage's error rate exceeds this fraction (default: 0.01)",
+    )
+    add_env_arg(p_ramp)
+    add_native_args(p_ramp)
+    p_ramp.set_defaults(func=cmd_ramp)
+
+    # replay
+    p_replay = subparsers.add_parser(
+        "replay", help="Replay a recorded request log (native engine)"
+    )
+    p_replay.add_argument("log", help="request log (JSONL; see loadtest/replay.py)")
+    timing = p_replay.add_mutually_exclusive_group()
+    timing.add_argument(
+        "--speed",
+        type=positive_float,
+        default=1.0,
+        help="keep the original arrival times, scaled by this factor "
+        "(2 = twice as fast; default: 1)",
+    )
+    timing.add_argument(
+        "--rate",
+        type=positive_float,
+        default=None,
+        help="ignore the original arrival times and send at this fixed rate",
+    )
+    p_replay.add_argument(
+        "--duration",
+        default=None,
+        help="stop after this much replay time e.g. 30s, 1m (default: whole log)",
+    )
+    add_env_arg(p_replay)
+    add_native_args(p_replay)
+    p_replay.add_argument(
+        "--live", action="store_true", help="show live terminal graph during test"
+    )
+    p_replay.set_defaults(func=cmd_replay)
+
+    # queries
+    p_queries = subparsers.add_parser(
+        "queries", help="Per-query latency leaderboard for a stored run"
+    )
+    p_queries.add_argument("run", help="columnar run file (.npy)")
+    p_queries.add_argument(
+        "--baseline",
+        default=None,
+        help="mode to compare the others against, e.g. default",
+    )
+    p_queries.add_argument(
+        "--top", type=int, default=10, help="queries to show per table (default: 10)"
+    )
+    p_queries.set_defaults(func=cmd_queries)
+
+    # diff
+    p_diff = subparsers.add_parser(
+        "diff",
+        help="Compare two stored runs and exit non-zero on a significant "
+        "latency or error regression",
+    )
+    p_diff.add_argument("run_a", help="baseline run file (.npy)")
+    p_diff.add_argument("run_b", help="candidate run file (.npy)")
+    p_diff.add_argument(
+        "--mode",
+        action="append",
+        metavar="MODE[:MODE_B]",
+        help="mode to compare, or a pair of differently named modes "
+        "(repeatable; default: every mode in both runs)",
+    )
+    p_diff.add_argument(
+        "--max-p50-increase",
+        type=float,
+        default=0.10,
+        help="fail if p50 is slower by more than this fraction (default: 0.10)",
+    )
+    p_diff.add_argument(
+        "--max-p99-increase",
+        type=float,
+        default=0.20,
+        help="fail if p99 is slower by more than this fraction (default: 0.20)",
+    )
+    p_diff.add_argument(
+        "--max-error-rate-increase",
+        type=float,
+        default=0.005,
+        help="fail if the error rate rises by more than this (default: 0.005)",
+    )
+    p_diff.add_argument(
+        "--confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help=f"confidence level for intervals and tests (default: {DEFAULT_CONFIDENCE})",
+    )
+    p_diff.add_argument(
+        "--bootstrap",
+        type=int,
+        default=DEFAULT_BOOTSTRAP_SAMPLES,
+        help=f"bootstrap resamples (default: {DEFAULT_BOOTSTRAP_SAMPLES})",
+    )
+    p_diff.set_defaults(func=cmd_diff)
+
+    # ingest
+    p_ingest = subparsers.add_parser(
+        "ingest", help="Convert JSONL results into a columnar run file"
+    )
+    p_ingest.add_argument(
+        "results",
+        nargs="+",
+        help="JSONL results files, optionally as MODE=PATH "
+        "(mode defaults to the filename, e.g. default_<timestamp>.jsonl)",
+    )
+    p_ingest.add_argument(
+        "--output", help="run file to write (default: first results file, as .npy)"
+    )
+    p_ingest.set_defaults(func=cmd_ingest)
+
+    # worker
+    p_worker = subparsers.add_parser(
+        "worker", help="Run a load generating worker for --remote attacks"
+    )
+    p_worker.add_argument(
+        "--host",
+        default=DEFAULT_WORKER_HOST,
+        help=f"address to listen on (default: {DEFAULT_WORKER_HOST}; any other "
+        "address needs --token)",
+    )
+    add_token_arg(p_worker)
+    p_worker.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_WORKER_PORT,
+        help=f"port to listen on (default: {DEFAULT_WORKER_PORT})",
+    )
+    p_worker.set_defaults(func=cmd_worker)
+
     args = parser.parse_args()
     args.func(args)
 
@@ -0,0 +1,401 @@
+"""
+Distributed load generation: one coordinator, many workers.
+
+A single Python process tops out at a few thousand requests per second, so
+for higher rates the native engine can be spread over several worker
+processes, either spawned locally (``--workers N``) or already running on
+other machines (``loadtest worker`` there, ``--remote host:port`` here).
+
+The protocol is newline-delimited JSON over TCP. For each attack, the
+coordinator opens one connection per worker and sends a single job line:
+
+    {"urls": [...], "rate": 400, "duration_secs": 60, "shard": 1,
+     "shards": 4, "start_at": 1735732800.5, "max_in_flight": 256,
+     "timeout": 30.0, "body_sample_rate": 0.1, "token": "..."}
+
+Workers have no other authentication, and send load to whatever URLs a job
+names, so every job must carry the worker's shared ``token`` (set with
+``--token`` or LOADTEST_WORKER_TOKEN on both sides). Workers listen on
+127.0.0.1 by default, and won't listen on any other address without a
+token. Local workers get a random token for each run.
+
+Shard i of n sends requests i, i+n, i+2n, ... of the constant-rate schedule
+for the whole target rate, so together the workers send exactly the
+requests (and URLs) a single process would, at the same intended times.
+``start_at`` is a wall-clock time shared by every worker; remote workers
+need NTP-synced clocks for their timestamps and latencies to line up.
+
+Several attacks (e.g. one per variant in ``loadtest compare``) can run at
+once. Each is split over every worker, and all of them get the same
+``start_at``, so the n-th request of every attack is due at the same moment.
+
+Each worker streams back its result lines (the usual Vegeta JSONL schema)
+as requests complete, then ``{"status": "done"}``, or
+``{"status": "failed", "error": "..."}`` if the job failed. Result lines
+never have a ``status`` key, which is how the two are told apart. If the
+coordinator hangs up, the worker abandons the job. Each result's ``seq`` is
+its index in the whole schedule, so it's unique across workers.
+
+The coordinator appends each attack's results from every worker to one
+JSONL file as they arrive, which the live graph can follow like any other.
+Arrival order is only roughly time order; ingesting the file into a
+columnar run sorts it.
+"""
+
+import asyncio
+import contextlib
+import hmac
+import ipaddress
+import json
+import multiprocessing
+import secrets
+import time
+
+from loadtest.native import (
+    DEFAULT_BODY_SAMPLE_RATE,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_TIMEOUT,
+    AttackThread,
+    attack_to,
+)
+
+DEFAULT_WORKER_HOST = "127.0.0.1"
+DEFAULT_WORKER_PORT = 7070
+
+TOKEN_ENV_VAR = "LOADTEST_WORKER_TOKEN"
+
+# Time allowed between sending jobs and the shared start, so every worker
+# has its job before the first request is due
+START_DELAY_SECS = 1.0
+
+# Job lines carry the full URL list, which can run to megabytes
+LINE_LIMIT = 1 << 26
+
+
+class WorkerError(Exception):
+    pass
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(address):
+    """Parse "host:port" (or just "host") into a (host, port) pair."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, DEFAULT_WORKER_PORT
+    return host, int(port)
+
+
+def shard_schedule(urls, rate, duration_secs, shard, shards):
+    """
+    Yield this shard's (seq, offset, url) triples of a constant-rate
+    schedule, where seq is the request's index in the whole schedule.
+    """
+    for i in range(shard, int(rate * duration_secs), shards):
+        yield i, i / rate, urls[i % len(urls)]
+
+
+# ── Worker ────────────────────────────────────────────────────────────
+
+
+class _StreamOut:
+    """
+    Adapts a StreamWriter to the ``write(str)`` interface attack_to uses,
+    with ``drain()`` so a slow coordinator slows the worker down.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, line):
+        self.writer.write(line.encode())
+
+    async def drain(self):
+        await self.writer.drain()
+
+
+def _message(**fields):
+    return json.dumps(fields).encode() + b"\n"
+
+
+def _token_matches(job, token):
+    if token is None:
+        return True
+    sent = job.get("token")
+    return isinstance(sent, str) and hmac.compare_digest(sent, token)
+
+
+async def _run_job(reader, writer, token):
+    try:
+        job = json.loads(await reader.readline())
+        if not _token_matches(job, token):
+            writer.write(_message(status="failed", error="bad or missing token"))
+            return
+        requests = shard_schedule(
+            job["urls"], job["rate"], job["duration_secs"], job["shard"], job["shards"]
+        )
+        running = asyncio.create_task(
+            attack_to(
+                requests,
+                _StreamOut(writer),
+                start_at=job["start_at"],
+                max_in_flight=job["max_in_flight"],
+                timeout=job["timeout"],
+                body_sample_rate=job.get("body_sample_rate", DEFAULT_BODY_SAMPLE_RATE),
+                numbered=True,
+            )
+        )
+    except (ValueError, KeyError) as e:
+        writer.write(_message(status="failed", error=f"bad job: {e}"))
+        return
+
+    # The coordinator never sends anything after the job, so a read only
+    # returns once it has hung up
+    hangup = asyncio.create_task(reader.read())
+    await asyncio.wait({running, hangup}, return_when=asyncio.FIRST_COMPLETED)
+
+    if not running.done():
+        running.cancel()
+        return
+
+    hangup.cancel()
+    try:
+        running.result()
+    except Exception as e:
+        writer.write(_message(status="failed", error=str(e) or type(e).__name__))
+    else:
+        writer.write(_message(status="done"))
+
+
+async def serve(host, port, *, token=None, ready=None, jobs=None):
+    """
+    Accept jobs on ``host:port`` until interrupted, or until ``jobs`` jobs
+    have finished, if given. If ``token`` is given, jobs without it are
+    refused. The bound port is put on the ``ready`` queue if given (so port
+    0 can be used), otherwise printed.
+    """
+    if token is None and not is_loopback(host):
+        raise ValueError(
+            f"Refusing to listen on {host} without a token: anyone who can "
+            f"connect could use this worker to send load anywhere"
+        )
+
+    finished = asyncio.Event()
+    remaining = jobs
+
+    async def handle(reader, writer):
+        nonlocal remaining
+        try:
+            await _run_job(reader, writer, token)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            if jobs is not None:
+                remaining -= 1
+                if not remaining:
+                    finished.set()
+
+    server = await asyncio.start_server(handle, host, port, limit=LINE_LIMIT)
+    bound_port = server.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.put(bound_port)
+    else:
+        print(f"Load test worker listening on {host}:{bound_port}")
+
+    async with server:
+        if jobs is not None:
+            await finished.wait()
+        else:
+            await server.serve_forever()
+
+
+def run_worker(host=DEFAULT_WORKER_HOST, port=DEFAULT_WORKER_PORT, token=None):
+    asyncio.run(serve(host, port, token=token))
+
+
+def _local_worker(ready, jobs, token):
+    asyncio.run(serve("127.0.0.1", 0, token=token, ready=ready, jobs=jobs))
+
+
+def start_local_workers(count, *, token, jobs=1):
+    """
+    Start ``count`` worker processes on localhost, which each exit after
+    ``jobs`` jobs. Returns the processes and their (host, port) addresses.
+    """
+    # Spawn rather than fork: the coordinator runs in a thread alongside
+    # the live graph, and forking a threaded process isn't safe
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    processes = [
+        context.Process(target=_local_worker, args=(ready, jobs, token), daemon=True)
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    addresses = [("127.0.0.1", ready.get(timeout=30)) for _ in processes]
+    return processes, addresses
+
+
+# ── Coordinator ───────────────────────────────────────────────────────
+
+
+async def _drive_worker(address, job, out):
+    host, port = address
+    try:
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+    except OSError as e:
+        raise WorkerError(f"Can't reach worker {host}:{port}: {e}") from e
+
+    try:
+        writer.write(json.dumps(job).encode() + b"\n")
+        await writer.drain()
+
+        count = 0
+        async for line in reader:
+            status = json.loads(line).get("status")
+            if status == "done":
+                return count
+            if status == "failed":
+                raise WorkerError(
+                    f"Worker {host}:{port} failed: {json.loads(line)['error']}"
+                )
+            out.write(line)
+            count += 1
+        raise WorkerError(f"Worker {host}:{port} hung up before finishing")
+    finally:
+        writer.close()
+
+
+async def coordinate(
+    addresses,
+    jobs,
+    rate,
+    duration_secs,
+    *,
+    token=None,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    timeout=DEFAULT_TIMEOUT,
+    body_sample_rate=DEFAULT_BODY_SAMPLE_RATE,
+):
+    """
+    Split each constant-rate attack in ``jobs`` ((urls, out) pairs) across
+    the workers at ``addresses``, writing each attack's result lines (as
+    bytes) to its ``out``. Every attack shares one start time. Returns the
+    number of results from each worker, for each attack.
+
+    ``max_in_flight`` applies to each worker and attack separately.
+    """
+    start_at = time.time() + START_DELAY_SECS
+    tasks = [
+        [
+            asyncio.create_task(
+                _drive_worker(
+                    address,
+                    {
+                        "urls": urls,
+                        "rate": rate,
+                        "duration_secs": duration_secs,
+                        "shard": shard,
+                        "shards": len(addresses),
+                        "start_at": start_at,
+                        "max_in_flight": max_in_flight,
+                        "timeout": timeout,
+                        "body_sample_rate": body_sample_rate,
+                        "token": token,
+                    },
+                    out,
+                )
+            )
+            for shard, address in enumerate(addresses)
+        ]
+        for urls, out in jobs
+    ]
+    all_tasks = [task for job_tasks in tasks for task in job_tasks]
+    try:
+        counts = await asyncio.gather(*all_tasks)
+    finally:
+        # If one worker fails, hang up on the rest so they stop too
+        for task in all_tasks:
+            task.cancel()
+
+    return [
+        counts[i : i + len(addresses)] for i in range(0, len(counts), len(addresses))
+    ]
+
+
+def run_distributed_attacks(
+    jobs,
+    rate,
+    duration_secs,
+    *,
+    local_workers=0,
+    remote_workers=(),
+    token=None,
+    **kwargs,
+):
+    """
+    Like ``run_native_attacks``, but spread over ``local_workers`` spawned
+    processes plus any ``remote_workers`` (host, port) addresses. Each
+    (urls, jsonl_path) attack in ``jobs`` is split over every worker, and
+    they all share one start time.
+
+    ``token`` is the remote workers' token; local workers use it too, or a
+    random one if there isn't one.
+    """
+    token = token or secrets.token_urlsafe(16)
+    processes, addresses = start_local_workers(
+        local_workers, token=token, jobs=len(jobs)
+    )
+    addresses += list(remote_workers)
+    if not addresses:
+        raise ValueError("No workers to run the attack on")
+
+    try:
+        with contextlib.ExitStack() as stack:
+            outs = [
+                (urls, stack.enter_context(open(jsonl_path, "wb", buffering=0)))
+                for urls, jsonl_path in jobs
+            ]
+            asyncio.run(
+                coordinate(addresses, outs, rate, duration_secs, token=token, **kwargs)
+            )
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def run_distributed_attack(urls, rate, duration_secs, jsonl_path, **kwargs):
+    """Like ``run_distributed_attacks``, for a single attack."""
+    run_distributed_attacks([(urls, jsonl_path)], rate, duration_secs, **kwargs)
+
+
+def start_distributed_attacks(jobs, rate, duration_secs, **kwargs):
+    """
+    Run ``run_distributed_attacks`` in a background thread and return it.
+    Its ``join()`` raises anything the attack raised, e.g. a WorkerError.
+    """
+    thread = AttackThread(
+        target=run_distributed_attacks,
+        args=(jobs, rate, duration_secs),
+        kwargs=kwargs,
+    )
+    thread.start()
+    return thread
+
+
+def start_distributed_attack(urls, rate, duration_secs, jsonl_path, **kwargs):
+    """Run ``run_distributed_attack`` in a background thread and return it."""
+    return start_distributed_attacks(
+        [(urls, jsonl_path)], rate, duration_secs, **kwargs
+    )
@@ -0,0 +1,127 @@
+"""
+Streaming latency percentiles in constant memory.
+
+LatencyHistogram is an HDR-style log-linear histogram: values are bucketed
+by power of two, and each power of two is split into SUB_BUCKETS linear
+sub-buckets, so every recorded value is kept to within 1% of its true value
+however many are recorded. WindowedHistogram keeps one of these per second
+to give a sliding-window view (e.g. p99 over the last 10 seconds).
+"""
+
+from collections import deque
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Latencies are recorded in whole microseconds
+UNITS_PER_MS = 1000
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _bucket_index(value):
+    exponent = max(value.bit_length() - SUB_BUCKET_BITS - 1, 0)
+    return (exponent << SUB_BUCKET_BITS) + (value >> exponent)
+
+
+def _bucket_midpoint(index):
+    if index < 2 * SUB_BUCKETS:
+        return index
+    exponent = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (exponent << SUB_BUCKET_BITS)
+    return (mantissa << exponent) + (1 << exponent) / 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, latency_ms):
+        value = max(int(latency_ms * UNITS_PER_MS), 0)
+        index = _bucket_index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+        self.count += other.count
+        self.total += other.total
+        for attr, pick in (("min", min), ("max", max)):
+            ours, theirs = getattr(self, attr), getattr(other, attr)
+            if theirs is not None:
+                setattr(self, attr, theirs if ours is None else pick(ours, theirs))
+
+    @property
+    def mean(self):
+        return self.total / self.count / UNITS_PER_MS if self.count else 0
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """Return {percentile: latency in ms}, in a single pass over the buckets."""
+        if not self.count:
+            return {p: 0 for p in percentiles}
+
+        targets = sorted(percentiles)
+        result = {}
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            while targets and seen >= targets[0] / 100 * self.count:
+                value = min(max(_bucket_midpoint(index), self.min), self.max)
+                result[targets.pop(0)] = value / UNITS_PER_MS
+            if not targets:
+                break
+        for p in targets:
+            result[p] = self.max / UNITS_PER_MS
+        return result
+
+    def percentile(self, p):
+        return self.percentiles([p])[p]
+
+
+class WindowedHistogram:
+    """
+    Keeps a LatencyHistogram per second of test time, discarding any older
+    than ``window_secs``, plus a running histogram over the whole test.
+    """
+
+    def __init__(self, window_secs=10):
+        self.window_secs = window_secs
+        self.seconds = deque()
+        self.overall = LatencyHistogram()
+
+    def record(self, t, latency_ms):
+        second = int(t)
+        if not self.seconds or second > self.seconds[-1][0]:
+            self.seconds.append((second, LatencyHistogram()))
+            while self.seconds[0][0] <= second - self.window_secs:
+                self.seconds.popleft()
+
+        # Results don't always arrive in timestamp order, so a late arrival
+        # goes into the latest second at or before it that's still in the
+        # window (or is only counted in the overall histogram).
+        for s, histogram in reversed(self.seconds):
+            if s <= second:
+                histogram.record(latency_ms)
+                break
+
+        self.overall.record(latency_ms)
+
+    def window(self):
+        merged = LatencyHistogram()
+        for _, histogram in self.seconds:
+            merged.merge(histogram)
+        return merged
@@ -1,42 +1,102 @@
 #!/usr/bin/env python3
 """
-Live terminal graph comparing two Vegeta JSON result streams.
+Live terminal graph comparing any number of Vegeta JSON result streams.
 
-Usage: python3 live_graph.py <semantic.jsonl> <default.jsonl> <duration>
+Usage: python3 live_graph.py [LABEL=]<results.jsonl> ... <duration>
+       python3 live_graph.py <run.npy>
+
+Labels default to the mode in each filename, e.g. "semantic" for
+semantic_20250101_120000.jsonl.
 """
 
+import os
 import sys
 import json
 import time
+from collections import deque
 from datetime import datetime
 
-
-def read_new_results(filepath, file_pos):
-    results = []
-    try:
-        with open(filepath, "r") as f:
-            f.seek(file_pos)
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        results.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        pass
-            new_pos = f.tell()
-    except FileNotFoundError:
-        new_pos = file_pos
-    return results, new_pos
-
-
-def rolling_avg(times, values, window=5):
-    if len(values) < window:
-        return times, values
-    avg_t, avg_v = [], []
-    for i in range(window - 1, len(values)):
-        avg_t.append(times[i])
-        avg_v.append(sum(values[i - window + 1 : i + 1]) / window)
-    return avg_t, avg_v
+import numpy as np
+
+from loadtest.histogram import LatencyHistogram, WindowedHistogram
+from loadtest.report import SUMMARY_PERCENTILES, latency_breakdown, lttb, summarise
+from loadtest.store import load_run, mode_from_path
+from loadtest.timing import COMPONENTS, components, result_server_times
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# The scatter only shows the most recent points; percentiles and the rolling
+# average cover every result, but in constant memory.
+MAX_SCATTER_POINTS = 5000
+MAX_LINE_POINTS = 3600
+WINDOW_SECS = 10
+
+LIVE_COLORS = ["red", "cyan", "yellow", "green", "magenta", "blue"]
+
+
+class ResultFollower:
+    """
+    Tails a JSONL results file while it's still being written.
+
+    The file is opened once and kept open, and each call to ``read_new``
+    reads whatever has been appended since the last call. A trailing line
+    without its newline yet is held back until the rest of it arrives, so
+    records caught mid-write aren't lost.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.partial = b""
+        self.skipped = 0
+
+    def read_new(self):
+        if self.file is None:
+            try:
+                self.file = open(self.path, "rb", buffering=0)
+            except FileNotFoundError:
+                return []
+
+        chunk = self.file.readall()
+        if not chunk:
+            return []
+
+        complete, _, self.partial = (self.partial + chunk).rpartition(b"\n")
+        return self._parse(complete)
+
+    def _parse(self, data):
+        lines = [line for line in data.split(b"\n") if line.strip()]
+        if not lines:
+            return []
+
+        # Parse the whole batch in one call, only going line-by-line to
+        # find the culprit if something in it is malformed.
+        try:
+            return _loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            results = []
+            for line in lines:
+                try:
+                    results.append(_loads(line))
+                except ValueError:
+                    self.skipped += 1
+            return results
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 def parse_timestamp(ts):
@@ -52,245 +112,340 @@ def parse_duration(duration_str):
     return 30
 
 
-def run_plotext(sem_file, default_file, dur_secs):
-    import plotext as plt
-
-    sem_latencies, default_latencies = [], []
-    sem_times, default_times = [], []
-    sem_errors = default_errors = 0
-    sem_pos = default_pos = 0
-    start_time = None
-    prev_frame_lines = 0
+class Series:
+    """Running state for one stream of results in the live graph."""
+
+    def __init__(self, label, color="red"):
+        self.label = label
+        self.color = color
+        self.histogram = WindowedHistogram(WINDOW_SECS)
+        self.points = deque(maxlen=MAX_SCATTER_POINTS)
+        self.avg_line = deque(maxlen=MAX_LINE_POINTS)
+        self.errors = 0
+        self.latest_t = 0
+        self.breakdown = {c: LatencyHistogram() for c in COMPONENTS}
+
+    def add(self, t, latency_ms, code, server_ms=None, es_ms=None):
+        self.histogram.record(t, latency_ms)
+        for component, ms in components(latency_ms, server_ms, es_ms).items():
+            self.breakdown[component].record(ms)
+        self.points.append((t, latency_ms))
+        self.latest_t = max(self.latest_t, t)
+        if code != 200:
+            self.errors += 1
+
+    def end_tick(self):
+        if self.count:
+            self.avg_line.append((self.latest_t, self.histogram.window().mean))
+
+    @property
+    def count(self):
+        return self.histogram.overall.count
+
+    def plot(self, plt):
+        _plot_series(
+            plt,
+            self,
+            [t for t, _ in self.points],
+            [lat for _, lat in self.points],
+            [t for t, _ in self.avg_line],
+            [avg for _, avg in self.avg_line],
+        )
 
-    for tick in range(dur_secs + 10):
-        time.sleep(1)
+    def stats_line(self):
+        overall = self.histogram.overall
+        return _stats_text(
+            overall.mean,
+            overall.percentiles(),
+            self.histogram.window().percentile(99),
+            self.errors,
+            {c: h.percentile(50) for c, h in self.breakdown.items() if h.count},
+        )
 
-        new_sem, sem_pos = read_new_results(sem_file, sem_pos)
-        new_default, default_pos = read_new_results(default_file, default_pos)
-
-        for r in new_sem:
-            lat_ms = r["latency"] / 1_000_000
-            ts = parse_timestamp(r["timestamp"])
-            if start_time is None:
-                start_time = ts
-            sem_latencies.append(lat_ms)
-            sem_times.append(ts - start_time)
-            if r["code"] != 200:
-                sem_errors += 1
-
-        for r in new_default:
-            lat_ms = r["latency"] / 1_000_000
-            ts = parse_timestamp(r["timestamp"])
-            if start_time is None:
-                start_time = ts
-            default_latencies.append(lat_ms)
-            default_times.append(ts - start_time)
-            if r["code"] != 200:
-                default_errors += 1
-
-        if not sem_latencies and not default_latencies:
-            continue
 
-        plt.clear_figure()
-        plt.theme("dark")
-        plt.plot_size(width=100, height=25)
-        plt.title("Live Latency Comparison (ms)")
-        plt.xlabel("Time (s)")
-        plt.ylabel("Latency (ms)")
-
-        if sem_times:
-            plt.scatter(
-                sem_times,
-                sem_latencies,
-                label=f"Semantic (n={len(sem_latencies)}, err={sem_errors})",
-                marker="dot",
-                color="red",
-            )
-        if default_times:
-            plt.scatter(
-                default_times,
-                default_latencies,
-                label=f"Default (n={len(default_latencies)}, err={default_errors})",
-                marker="dot",
-                color="cyan",
-            )
-
-        if len(sem_latencies) > 5:
-            rt, rv = rolling_avg(sem_times, sem_latencies)
-            plt.plot(rt, rv, label="Semantic avg", color="red+")
-        if len(default_latencies) > 5:
-            rt, rv = rolling_avg(default_times, default_latencies)
-            plt.plot(rt, rv, label="Default avg", color="cyan+")
-
-        graph = plt.build()
-
-        sem_avg = sum(sem_latencies) / len(sem_latencies) if sem_latencies else 0
-        default_avg = (
-            sum(default_latencies) / len(default_latencies) if default_latencies else 0
+class StoredSeries:
+    """
+    The same picture as a Series, for a finished run: worked out from the
+    run's columns in a few array operations rather than result by result,
+    so reopening even a long run is quick.
+    """
+
+    def __init__(self, label, rows, t0_ns, color="red"):
+        self.label = label
+        self.color = color
+        self.count = len(rows)
+        self.errors = int((rows["code"] != 200).sum())
+
+        rows = rows[np.argsort(rows["timestamp_ns"], kind="stable")]
+        t = (rows["timestamp_ns"] - t0_ns) / 1e9
+        latency_ms = rows["latency_ns"] / 1e6
+        self.points = lttb(t, latency_ms, MAX_SCATTER_POINTS)
+
+        # The rolling average at the end of each second, as the live graph
+        # would have drawn it: per-second sums, added up over the window
+        seconds = t.astype(np.int64)
+        n_seconds = int(seconds[-1]) + 1 if self.count else 0
+        window = np.ones(WINDOW_SECS)
+        sums = np.convolve(np.bincount(seconds, latency_ms, n_seconds), window)
+        counts = np.convolve(np.bincount(seconds, minlength=n_seconds), window)
+        has_results = counts[:n_seconds] > 0
+        self.avg_line = lttb(
+            np.arange(n_seconds)[has_results].astype(float),
+            sums[:n_seconds][has_results] / counts[:n_seconds][has_results],
+            MAX_LINE_POINTS,
         )
-        sem_p99 = (
-            sorted(sem_latencies)[int(len(sem_latencies) * 0.99)]
-            if sem_latencies
-            else 0
+
+        summary = summarise(rows)
+        recent = latency_ms[t >= t[-1] - WINDOW_SECS] if self.count else latency_ms
+        self.stats = (
+            summary.get("mean", 0.0),
+            summary.get("percentiles", dict.fromkeys(SUMMARY_PERCENTILES, 0.0)),
+            float(np.percentile(recent, 99)) if len(recent) else 0.0,
+            self.errors,
+            {c: b[50] for c, b in latency_breakdown(rows).items()},
         )
-        default_p99 = (
-            sorted(default_latencies)[int(len(default_latencies) * 0.99)]
-            if default_latencies
-            else 0
+
+    def plot(self, plt):
+        _plot_series(plt, self, *map(np.ndarray.tolist, self.points + self.avg_line))
+
+    def stats_line(self):
+        return _stats_text(*self.stats)
+
+
+def _plot_series(plt, series, xs, ys, avg_xs, avg_ys):
+    if not xs:
+        return
+    plt.scatter(
+        xs,
+        ys,
+        label=f"{series.label} (n={series.count}, err={series.errors})",
+        marker="dot",
+        color=series.color,
+    )
+    if len(avg_xs) > 1:
+        plt.plot(
+            avg_xs,
+            avg_ys,
+            label=f"{series.label} avg ({WINDOW_SECS}s)",
+            color=series.color + "+",
         )
 
-        stats = (
-            f"  Semantic:     avg={sem_avg:>8.1f}ms  p99={sem_p99:>8.1f}ms  errors={sem_errors}\n"
-            f"  Default:      avg={default_avg:>8.1f}ms  p99={default_p99:>8.1f}ms  errors={default_errors}\n"
-            f"  Ratio: semantic is {sem_avg / default_avg if default_avg > 0 else 0:.1f}x "
-            f"{'slower' if default_avg == 0 or sem_avg / default_avg > 1 else 'faster'} than default"
+
+def _stats_text(mean, pct, window_p99, errors, split_p50):
+    """
+    The stats under the graph. ``split_p50`` is the median network/API/ES
+    split, for whichever components the server reported.
+    """
+    split = " ".join(f"{c}={ms:.1f}" for c, ms in split_p50.items())
+    return (
+        f"avg={mean:>8.1f}ms  p50={pct[50]:>8.1f}ms  "
+        f"p90={pct[90]:>8.1f}ms  p99={pct[99]:>8.1f}ms  "
+        f"p99.9={pct[99.9]:>8.1f}ms  p99({WINDOW_SECS}s)={window_p99:>8.1f}ms  "
+        f"errors={errors}" + (f"  p50 split: {split}ms" if split else "")
+    )
+
+
+class Clock:
+    """Converts result timestamps to seconds since the first result seen."""
+
+    def __init__(self):
+        self.start_time = None
+
+    def __call__(self, timestamp):
+        ts = parse_timestamp(timestamp)
+        if self.start_time is None:
+            self.start_time = ts
+        return ts - self.start_time
+
+
+def _add_results(series, results, clock):
+    for r in results:
+        series.add(
+            clock(r["timestamp"]),
+            r["latency"] / 1_000_000,
+            r["code"],
+            *result_server_times(r),
         )
+    series.end_tick()
 
-        frame = graph + "\n" + stats
-        frame_lines = frame.count("\n") + 1
 
-        # Move cursor up to overwrite the previous frame
-        if prev_frame_lines > 0:
-            sys.stdout.write(f"\033[{prev_frame_lines}A\033[J")
+def _draw_frame(plt, title, series_list, stats, prev_frame_lines):
+    plt.clear_figure()
+    plt.theme("dark")
+    plt.plot_size(width=100, height=25)
+    plt.title(title)
+    plt.xlabel("Time (s)")
+    plt.ylabel("Latency (ms)")
 
-        sys.stdout.write(frame + "\n")
-        sys.stdout.flush()
-        prev_frame_lines = frame_lines
+    for series in series_list:
+        series.plot(plt)
 
-        if tick > dur_secs + 5:
-            break
+    frame = plt.build() + "\n" + stats
+    frame_lines = frame.count("\n") + 1
 
+    # Move cursor up to overwrite the previous frame
+    if prev_frame_lines > 0:
+        sys.stdout.write(f"\033[{prev_frame_lines}A\033[J")
 
-def run_single_plotext(jsonl_file, dur_secs, label="Search"):
+    sys.stdout.write(frame + "\n")
+    sys.stdout.flush()
+    return frame_lines
+
+
+def _ratio_line(series_list, baseline):
+    base = next((s for s in series_list if s.label == baseline), series_list[0])
+    base_avg = base.histogram.overall.mean
+    ratios = [
+        f"{s.label} {s.histogram.overall.mean / base_avg:.1f}x"
+        for s in series_list
+        if s is not base and base_avg > 0
+    ]
+    return f"  Mean latency vs {base.label}: {', '.join(ratios)}" if ratios else ""
+
+
+def run_plotext(jsonl_files, dur_secs, baseline=None, title=None):
+    """
+    Follow each of ``jsonl_files`` ({label: path}) live, drawing them as one
+    graph. The stats include each series' mean latency as a multiple of the
+    ``baseline`` series (by default the first).
+    """
     import plotext as plt
 
-    latencies, times = [], []
-    errors = 0
-    file_pos = 0
-    start_time = None
+    series_list = [
+        Series(label, color=LIVE_COLORS[i % len(LIVE_COLORS)])
+        for i, label in enumerate(jsonl_files)
+    ]
+    followers = [ResultFollower(path) for path in jsonl_files.values()]
+    clock = Clock()
     prev_frame_lines = 0
+    width = max(len(label) for label in jsonl_files) + 1
 
     for tick in range(dur_secs + 10):
         time.sleep(1)
 
-        new_results, file_pos = read_new_results(jsonl_file, file_pos)
+        for series, follower in zip(series_list, followers):
+            _add_results(series, follower.read_new(), clock)
 
-        for r in new_results:
-            lat_ms = r["latency"] / 1_000_000
-            ts = parse_timestamp(r["timestamp"])
-            if start_time is None:
-                start_time = ts
-            latencies.append(lat_ms)
-            times.append(ts - start_time)
-            if r["code"] != 200:
-                errors += 1
-
-        if not latencies:
+        if not any(series.count for series in series_list):
             continue
 
-        plt.clear_figure()
-        plt.theme("dark")
-        plt.plot_size(width=100, height=25)
-        plt.title(f"Live Latency — {label} (ms)")
-        plt.xlabel("Time (s)")
-        plt.ylabel("Latency (ms)")
-
-        plt.scatter(
-            times,
-            latencies,
-            label=f"{label} (n={len(latencies)}, err={errors})",
-            marker="dot",
-            color="red",
+        stats = "\n".join(
+            f"  {s.label + ':':<{width}}  {s.stats_line()}" for s in series_list
+        )
+        if len(series_list) > 1:
+            stats += "\n" + _ratio_line(series_list, baseline)
+
+        prev_frame_lines = _draw_frame(
+            plt,
+            title or "Live Latency Comparison (ms)",
+            series_list,
+            stats,
+            prev_frame_lines,
         )
 
-        if len(latencies) > 5:
-            rt, rv = rolling_avg(times, latencies)
-            plt.plot(rt, rv, label="Rolling avg", color="red+")
-
-        graph = plt.build()
-
-        avg = sum(latencies) / len(latencies)
-        p99 = sorted(latencies)[int(len(latencies) * 0.99)]
-
-        stats = f"  avg={avg:>8.1f}ms  p99={p99:>8.1f}ms  errors={errors}"
-
-        frame = graph + "\n" + stats
-        frame_lines = frame.count("\n") + 1
+        if tick > dur_secs + 5:
+            break
 
-        if prev_frame_lines > 0:
-            sys.stdout.write(f"\033[{prev_frame_lines}A\033[J")
+    for follower in followers:
+        follower.close()
 
-        sys.stdout.write(frame + "\n")
-        sys.stdout.flush()
-        prev_frame_lines = frame_lines
 
-        if tick > dur_secs + 5:
-            break
+def run_single_plotext(jsonl_file, dur_secs, label="Search"):
+    run_plotext({label: jsonl_file}, dur_secs, title=f"Live Latency — {label} (ms)")
 
 
-def run_single_fallback(jsonl_file, dur_secs, label="Search"):
+def _print_fallback_header():
     print("(plotext not available — falling back to text output)")
-    print(f"{'Time':>6}  {'Latency':>10}  {'Status':>8}")
-    print("-" * 30)
-
-    file_pos = 0
-    start_time = None
+    print(
+        f"{'Time':>6}  {'Type':>14}  {'n':>7}  {'p50':>10}  {'p90':>10}  "
+        f"{'p99':>10}  {'p99.9':>10}  {'errors':>6}"
+    )
+    print("-" * 88)
+
+
+def _print_fallback_row(series):
+    # One row per series per second, summarising the sliding window, so the
+    # output stays readable however high the request rate
+    if not series.count:
+        return
+    pct = series.histogram.window().percentiles()
+    print(
+        f"{series.latest_t:>6.1f}  {series.label:>14}  {series.count:>7}  "
+        + "  ".join(f"{pct[p]:>8.1f}ms" for p in (50, 90, 99, 99.9))
+        + f"  {series.errors:>6}"
+    )
+
+
+def run_fallback(jsonl_files, dur_secs):
+    """Like ``run_plotext``, but printing a row per series per second."""
+    _print_fallback_header()
+
+    followers = [
+        (Series(label), ResultFollower(path)) for label, path in jsonl_files.items()
+    ]
+    clock = Clock()
 
     for tick in range(dur_secs + 10):
         time.sleep(1)
-        new_results, file_pos = read_new_results(jsonl_file, file_pos)
 
-        for r in new_results:
-            lat = r["latency"] / 1_000_000
-            ts = parse_timestamp(r["timestamp"])
-            if start_time is None:
-                start_time = ts
-            t = ts - start_time
-            print(f"{t:>6.1f}  {lat:>8.1f}ms  HTTP {r['code']}")
+        for series, follower in followers:
+            _add_results(series, follower.read_new(), clock)
+            _print_fallback_row(series)
 
         if tick > dur_secs + 5:
             break
 
+    for _, follower in followers:
+        follower.close()
 
-def run_fallback(sem_file, default_file, dur_secs):
-    print("(plotext not available — falling back to text output)")
-    print(f"{'Time':>6}  {'Latency':>10}  {'Type':>14}  {'Status':>8}")
-    print("-" * 46)
 
-    sem_pos = default_pos = 0
-    start_time = None
+def run_single_fallback(jsonl_file, dur_secs, label="Search"):
+    run_fallback({label: jsonl_file}, dur_secs)
 
-    for tick in range(dur_secs + 10):
-        time.sleep(1)
-        new_sem, sem_pos = read_new_results(sem_file, sem_pos)
-        new_default, default_pos = read_new_results(default_file, default_pos)
-
-        for label, results in [("Semantic", new_sem), ("Default", new_default)]:
-            for r in results:
-                lat = r["latency"] / 1_000_000
-                ts = parse_timestamp(r["timestamp"])
-                if start_time is None:
-                    start_time = ts
-                t = ts - start_time
-                print(f"{t:>6.1f}  {lat:>8.1f}ms  {label:>14}  HTTP {r['code']}")
 
-        if tick > dur_secs + 5:
-            break
+def show_stored_run(run_path):
+    """Draw a single frame for a finished run saved by loadtest.store."""
+    import plotext as plt
+
+    run = load_run(run_path)
+    t0 = int(run.results["timestamp_ns"].min()) if len(run.results) else 0
+
+    series_list = [
+        StoredSeries(
+            mode.replace("_", " ").title(),
+            rows,
+            t0,
+            color=LIVE_COLORS[i % len(LIVE_COLORS)],
+        )
+        for i, (mode, rows) in enumerate(run.by_mode().items())
+    ]
+
+    stats = "\n".join(f"  {s.label:<12} {s.stats_line()}" for s in series_list)
+    _draw_frame(
+        plt, f"Latency — {os.path.basename(run_path)} (ms)", series_list, stats, 0
+    )
 
 
 def main():
-    if len(sys.argv) < 4:
-        print(f"Usage: {sys.argv[0]} <semantic.jsonl> <default.jsonl> <duration>")
+    if len(sys.argv) == 2 and sys.argv[1].endswith(".npy"):
+        show_stored_run(sys.argv[1])
+        return
+
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} [LABEL=]<results.jsonl> ... <duration>")
+        print(f"       {sys.argv[0]} <run.npy>")
         sys.exit(1)
 
-    sem_file = sys.argv[1]
-    default_file = sys.argv[2]
-    dur_secs = parse_duration(sys.argv[3])
+    jsonl_files = {}
+    for arg in sys.argv[1:-1]:
+        label, sep, path = arg.rpartition("=")
+        jsonl_files[label if sep else mode_from_path(path)] = path
+    dur_secs = parse_duration(sys.argv[-1])
 
     try:
-        run_plotext(sem_file, default_file, dur_secs)
+        run_plotext(jsonl_files, dur_secs)
     except ImportError:
-        run_fallback(sem_file, default_file, dur_secs)
+        run_fallback(jsonl_files, dur_secs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+"""
+Native asyncio load generator — an alternative to shelling out to Vegeta.
+
+Requests follow an open model: every request has an intended send time fixed
+by the target rate, regardless of how the requests before it got on. Latency
+is measured from that intended time rather than from when the request
+actually left, so a server that stalls shows up as high latency instead of
+as a quietly reduced request rate (i.e. it doesn't suffer from coordinated
+omission).
+
+Results are written in the same JSONL schema as `vegeta encode --to json`,
+so the live graph and the HTML report can read either engine's output, plus
+``server_ms``, ``es_ms`` and ``total_results`` fields (see loadtest.timing).
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from loadtest.timing import body_fields, server_times
+
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_BODY_SAMPLE_RATE = 0.1
+
+
+def constant_schedule(rate, duration_secs):
+    """Yield intended send offsets (seconds from the start) at a fixed rate."""
+    for i in range(int(rate * duration_secs)):
+        yield i / rate
+
+
+def linear_schedule(start_rate, end_rate, duration_secs):
+    """
+    Yield intended send offsets for a rate rising linearly from
+    ``start_rate`` to ``end_rate`` over ``duration_secs``.
+
+    n requests have been due by time t when n = r0·t + (r1 - r0)·t²/2T, so
+    each offset is the positive root of that quadratic.
+    """
+    if start_rate == end_rate:
+        yield from constant_schedule(start_rate, duration_secs)
+        return
+
+    a = (end_rate - start_rate) / (2 * duration_secs)
+    total = int((start_rate + end_rate) * duration_secs / 2)
+    for n in range(total):
+        yield (-start_rate + math.sqrt(start_rate**2 + 4 * a * n)) / (2 * a)
+
+
+def format_timestamp(epoch_ns):
+    """Format nanoseconds since the epoch as an RFC 3339 timestamp."""
+    secs, nanos = divmod(epoch_ns, 1_000_000_000)
+    dt = datetime.fromtimestamp(secs, tz=timezone.utc)
+    return f"{dt:%Y-%m-%dT%H:%M:%S}.{nanos:09d}Z"
+
+
+async def _send(client, url, seq, offset, clock, out, in_flight, sample_body):
+    try:
+        out.write(await _result_line(client, url, seq, offset, clock, sample_body))
+        # Keep the slot until a slow reader has taken the line, so the attack
+        # slows down rather than buffering results without limit
+        if hasattr(out, "drain"):
+            await out.drain()
+    finally:
+        in_flight.release()
+
+
+async def _result_line(client, url, seq, offset, clock, sample_body):
+    start_perf, start_wall_ns = clock
+    code, bytes_in, error = 0, 0, ""
+    server_ms = es_ms = total_results = None
+    try:
+        response = await client.get(url)
+    except Exception as e:
+        # Anything that goes wrong with one request (e.g. a malformed URL
+        # from a replayed log) is that request's failure, not the whole run's.
+        # A failed request always has code 0 and an error, like Vegeta's.
+        error = str(e) or type(e).__name__
+    else:
+        code = response.status_code
+        bytes_in = len(response.content)
+        server_ms, es_ms = server_times(response.headers)
+        if sample_body:
+            try:
+                total_results, took_ms = body_fields(response.content)
+            except Exception:
+                # The response still arrived; it just has no sampled fields
+                took_ms = None
+            if es_ms is None:
+                es_ms = took_ms
+
+    # Measured from the intended send time, not from when we got round to it
+    latency_ns = int((time.perf_counter() - start_perf - offset) * 1e9)
+
+    result = {
+        "attack": "",
+        "seq": seq,
+        "code": code,
+        "timestamp": format_timestamp(start_wall_ns + int(offset * 1e9)),
+        "latency": latency_ns,
+        "bytes_out": 0,
+        "bytes_in": bytes_in,
+        "error": error,
+        "body": None,
+        "method": "GET",
+        "url": url,
+        "server_ms": server_ms,
+        "es_ms": es_ms,
+        "total_results": total_results,
+    }
+    return json.dumps(result) + "\n"
+
+
+async def attack(requests, jsonl_path, **kwargs):
+    """
+    Send each (offset, url) in ``requests`` at its intended offset in seconds
+    from the start, writing one JSONL result line per request.
+
+    At most ``max_in_flight`` requests are outstanding at once; when the cap
+    is reached, later requests wait for a free slot but their latency is
+    still measured from their intended send time. Keyword arguments are as
+    for ``attack_to``.
+    """
+    # Line-buffered, so the live graph sees each result as soon as it lands
+    with open(jsonl_path, "w", buffering=1) as out:
+        await attack_to(requests, out, **kwargs)
+
+
+async def attack_to(
+    requests,
+    out,
+    *,
+    start_at=None,
+    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+    timeout=DEFAULT_TIMEOUT,
+    body_sample_rate=DEFAULT_BODY_SAMPLE_RATE,
+    numbered=False,
+):
+    """
+    Like ``attack``, but write result lines to ``out`` (anything with a
+    ``write(str)`` method). If ``out`` also has an async ``drain()`` method,
+    like a StreamWriter, each request holds its in-flight slot until the
+    drain after its line returns, so a slow reader applies backpressure.
+
+    If ``numbered``, ``requests`` holds (seq, offset, url) triples instead,
+    for when this is one part of a larger schedule; otherwise requests are
+    numbered from 0.
+
+    Offsets count from ``start_at`` (seconds since the epoch) if given,
+    otherwise from now. Workers given the same ``start_at`` share one clock,
+    so their intended send times interleave exactly.
+
+    Every response's Server-Timing header is recorded, but only a
+    ``body_sample_rate`` fraction of bodies are parsed (for totalResults),
+    to keep JSON decoding from eating into the rate we can generate.
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(
+        max_connections=max_in_flight, max_keepalive_connections=max_in_flight
+    )
+    pending = set()
+
+    async with httpx.AsyncClient(
+        limits=limits, timeout=timeout, follow_redirects=True
+    ) as client:
+        if start_at is None:
+            clock = (time.perf_counter(), time.time_ns())
+        else:
+            clock = (
+                time.perf_counter() + start_at - time.time(),
+                int(start_at * 1e9),
+            )
+
+        if not numbered:
+            requests = (
+                (seq, offset, url) for seq, (offset, url) in enumerate(requests)
+            )
+
+        for seq, offset, url in requests:
+            delay = clock[0] + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await in_flight.acquire()
+            # Evenly spaced, e.g. every 10th request for a rate of 0.1
+            sample_body = int((seq + 1) * body_sample_rate) > int(
+                seq * body_sample_rate
+            )
+            task = asyncio.create_task(
+                _send(client, url, seq, offset, clock, out, in_flight, sample_body)
+            )
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+
+class AttackThread(threading.Thread):
+    """
+    A thread that keeps any exception its target raises, and raises it
+    again from ``join()``, so a failed attack isn't reported as a short one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.error = None
+
+    def run(self):
+        try:
+            super().run()
+        except BaseException as e:
+            self.error = e
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        if self.error is not None and not self.is_alive():
+            raise self.error
+
+
+def run_native_attacks(jobs, rate, duration_secs, **kwargs):
+    """
+    Run one constant-rate attack per (urls, jsonl_path) in ``jobs``, all at
+    once. They share an event loop and a start time, so the n-th request of
+    every attack is due at the same moment.
+    """
+
+    async def run_all():
+        start_at = time.time()
+        await asyncio.gather(
+            *(
+                attack(
+                    zip(constant_schedule(rate, duration_secs), itertools.cycle(urls)),
+                    jsonl_path,
+                    start_at=start_at,
+                    **kwargs,
+                )
+                for urls, jsonl_path in jobs
+            )
+        )
+
+    asyncio.run(run_all())
+
+
+def run_native_attack(urls, rate, duration_secs, jsonl_path, **kwargs):
+    """Cycle through ``urls`` at a constant ``rate`` for ``duration_secs``."""
+    run_native_attacks([(urls, jsonl_path)], rate, duration_secs, **kwargs)
+
+
+def start_native_attacks(jobs, rate, duration_secs, **kwargs):
+    """
+    Run ``run_native_attacks`` in a background thread and return the thread,
+    whose ``join()`` raises anything the attack raised.
+    """
+    thread = AttackThread(
+        target=run_native_attacks,
+        args=(jobs, rate, duration_secs),
+        kwargs=kwargs,
+    )
+    thread.start()
+    return thread
+
+
+def start_native_attack(urls, rate, duration_secs, jsonl_path, **kwargs):
+    """Run ``run_native_attack`` in a background thread and return the thread."""
+    return start_native_attacks([(urls, jsonl_path)], rate, duration_secs, **kwargs)
@@ -0,0 +1,140 @@
+"""
+Ramp and step load profiles, for finding the saturation point of a cluster.
+
+The request rate is raised in stages (e.g. 5 → 200 rps over 8 stages). After
+each stage we measure the achieved throughput, latency percentiles and error
+rate, and stop as soon as p99 or the error rate goes past its threshold. The
+highest throughput achieved by a stage that stayed within both thresholds is
+the cluster's max sustainable throughput.
+
+Throughput is measured over the end of each stage, not the whole of it. In
+a linear ramp the rate climbs throughout the stage, so the stage's average
+would understate the rate it reached (a 5 → 27.5 rps stage averages about
+16 rps).
+"""
+
+import asyncio
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+
+from loadtest.native import attack, constant_schedule, linear_schedule
+from loadtest.report import is_success, summarise
+from loadtest.store import ingest_run, read_jsonl_results
+
+PROFILES = ["step", "linear"]
+
+# The fraction of each stage, at its end, that throughput is measured over
+THROUGHPUT_WINDOW_FRACTION = 0.2
+
+
+@dataclass
+class StageResult:
+    target_rate: float
+    requests: int
+    throughput: float
+    p50: float
+    p99: float
+    error_rate: float
+    passed: bool
+
+
+def stage_rates(start_rate, end_rate, stages):
+    return [round(r, 1) for r in np.linspace(start_rate, end_rate, stages).tolist()]
+
+
+def final_window_throughput(rows, window_secs):
+    """
+    Successful responses per second that completed in the last
+    ``window_secs`` before the stage's final request was due.
+    """
+    if not len(rows):
+        return 0.0
+    end = int(rows["timestamp_ns"].max())
+    done = rows["timestamp_ns"] + rows["latency_ns"]
+    in_window = (done > end - window_secs * 1e9) & (done <= end)
+    return float((in_window & is_success(rows["code"])).sum() / window_secs)
+
+
+def stage_schedule(profile, rates, index, stage_secs):
+    """
+    Intended send offsets for one stage. ``step`` holds the stage's rate
+    constant; ``linear`` ramps up to it from the previous stage's rate.
+    """
+    if profile == "linear":
+        previous = rates[index - 1] if index > 0 else rates[0]
+        return linear_schedule(previous, rates[index], stage_secs)
+    return constant_schedule(rates[index], stage_secs)
+
+
+def run_ramp(
+    urls,
+    rates,
+    stage_secs,
+    *,
+    label,
+    output_prefix,
+    profile="step",
+    max_p99_ms,
+    max_error_rate,
+    on_stage=None,
+    **attack_kwargs,
+):
+    """
+    Run each stage in turn against ``urls``, stopping at the first stage
+    that breaches a threshold. Returns a list of StageResult.
+
+    Each stage's results are kept as ``{output_prefix}_stage<N>.jsonl``, and
+    all stages are ingested together into ``{output_prefix}.npy`` with one
+    mode per stage.
+    """
+    stages = []
+    jsonl_paths = {}
+
+    for index, rate in enumerate(rates):
+        jsonl_path = f"{output_prefix}_stage{index + 1}.jsonl"
+        requests = zip(
+            stage_schedule(profile, rates, index, stage_secs), itertools.cycle(urls)
+        )
+        asyncio.run(attack(requests, jsonl_path, **attack_kwargs))
+
+        mode = f"{label} @ {rate:g} rps"
+        jsonl_paths[mode] = jsonl_path
+        rows = read_jsonl_results({mode: jsonl_path}).results
+        summary = summarise(rows)
+
+        if summary["count"]:
+            p50, p99 = summary["percentiles"][50], summary["percentiles"][99]
+            error_rate = summary["error_rate"]
+        else:
+            p50 = p99 = error_rate = float("nan")
+
+        stage = StageResult(
+            target_rate=rate,
+            requests=summary["count"],
+            throughput=final_window_throughput(
+                rows, stage_secs * THROUGHPUT_WINDOW_FRACTION
+            ),
+            p50=p50,
+            p99=p99,
+            error_rate=error_rate,
+            passed=bool(
+                summary["count"] and p99 <= max_p99_ms and error_rate <= max_error_rate
+            ),
+        )
+        stages.append(stage)
+        if on_stage is not None:
+            on_stage(stage)
+
+        if not stage.passed:
+            break
+
+    ingest_run(jsonl_paths, f"{output_prefix}.npy")
+
+    return stages
+
+
+def max_sustainable_throughput(stages):
+    passed = [s.throughput for s in stages if s.passed]
+    return max(passed) if passed else 0.0
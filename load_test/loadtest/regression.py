@@ -0,0 +1,222 @@
+"""
+Statistical comparison of two stored runs, for use as a regression gate.
+
+For each mode, run B (the candidate) is compared against run A (the
+baseline) on:
+
+- p50 and p99 latency. The relative change comes with a bootstrap
+  confidence interval. Resampling millions of raw latencies thousands of
+  times would be slow, so latencies are first binned into BOOTSTRAP_BINS
+  log-spaced bins (about 1% wide) and each bootstrap resample is a single
+  multinomial draw over the bin counts.
+- The error rate, with a one-sided two-proportion z-test.
+- The whole latency distribution, with a one-sided Mann-Whitney U test of
+  whether B's latencies tend to be larger than A's.
+
+A check fails when it got worse by more than its limit and the change is
+statistically significant: the confidence interval excludes zero, or for
+the error rate, the z-test rejects "no increase".
+"""
+
+import math
+from dataclasses import dataclass
+from statistics import NormalDist
+
+import numpy as np
+
+from loadtest.report import is_success
+
+BOOTSTRAP_BINS = 2000
+DEFAULT_BOOTSTRAP_SAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+
+
+@dataclass
+class Check:
+    name: str
+    baseline: float
+    candidate: float
+    change: float
+    ci_low: float
+    ci_high: float
+    limit: float
+    regressed: bool
+
+
+@dataclass
+class ModeDiff:
+    mode: str
+    baseline_count: int
+    candidate_count: int
+    checks: list[Check]
+    prob_slower: float
+    mann_whitney_p: float
+
+    @property
+    def regressed(self):
+        return any(check.regressed for check in self.checks)
+
+
+def bootstrap_percentiles(latency_ms, percentiles, n_boot, rng):
+    """
+    Bootstrap distribution of ``percentiles`` of ``latency_ms``, as an
+    (n_boot, len(percentiles)) array.
+    """
+    lo = max(float(latency_ms.min()), 1e-3)
+    hi = max(float(latency_ms.max()), lo) * 1.000001
+    edges = np.geomspace(lo, hi, BOOTSTRAP_BINS + 1)
+    midpoints = np.sqrt(edges[:-1] * edges[1:])
+
+    counts, _ = np.histogram(np.clip(latency_ms, lo, hi), bins=edges)
+    n = len(latency_ms)
+    resampled = rng.multinomial(n, counts / n, size=n_boot).cumsum(axis=1)
+
+    result = np.empty((n_boot, len(percentiles)))
+    for j, p in enumerate(percentiles):
+        # First bin where the cumulative count reaches the percentile
+        index = (resampled < p / 100 * n).sum(axis=1)
+        result[:, j] = midpoints[np.minimum(index, BOOTSTRAP_BINS - 1)]
+    return result
+
+
+def mann_whitney_u(a, b):
+    """
+    One-sided Mann-Whitney U test that values in ``b`` tend to be larger
+    than those in ``a``. Returns (P(b > a), p-value), using the normal
+    approximation with tie correction.
+    """
+    n_a, n_b = len(a), len(b)
+    n = n_a + n_b
+    _, inverse, counts = np.unique(
+        np.concatenate([a, b]), return_inverse=True, return_counts=True
+    )
+    # Tied values share the average of the ranks they span
+    average_ranks = np.cumsum(counts) - (counts - 1) / 2
+    u_b = average_ranks[inverse[n_a:]].sum() - n_b * (n_b + 1) / 2
+
+    ties = float((counts.astype(np.float64) ** 3 - counts).sum())
+    variance = n_a * n_b / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 0.5, 1.0
+
+    z = (u_b - n_a * n_b / 2 - 0.5) / math.sqrt(variance)
+    return u_b / (n_a * n_b), 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def error_rate_increase_p(errors_a, n_a, errors_b, n_b):
+    """One-sided two-proportion z-test p-value that B's error rate is higher."""
+    pooled = (errors_a + errors_b) / (n_a + n_b)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n_a + 1 / n_b))
+    if se == 0:
+        return 1.0
+    z = (errors_b / n_b - errors_a / n_a) / se
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare_rows(
+    mode,
+    baseline,
+    candidate,
+    *,
+    max_p50_increase,
+    max_p99_increase,
+    max_error_rate_increase,
+    confidence=DEFAULT_CONFIDENCE,
+    n_boot=DEFAULT_BOOTSTRAP_SAMPLES,
+    seed=0,
+):
+    """
+    Compare two sets of rows from stored runs. Latency limits are relative
+    (0.1 = 10% slower); the error rate limit is absolute (0.01 = one more
+    failed request in every hundred).
+    """
+    rng = np.random.default_rng(seed)
+    a = baseline["latency_ns"] / 1e6
+    b = candidate["latency_ns"] / 1e6
+    tail = (1 - confidence) / 2
+
+    checks = []
+    percentiles = [50, 99]
+    exact_a = np.percentile(a, percentiles)
+    exact_b = np.percentile(b, percentiles)
+    boot_a = bootstrap_percentiles(a, percentiles, n_boot, rng)
+    boot_b = bootstrap_percentiles(b, percentiles, n_boot, rng)
+    for j, (p, limit) in enumerate(
+        zip(percentiles, [max_p50_increase, max_p99_increase])
+    ):
+        change = exact_b[j] / exact_a[j] - 1
+        ci_low, ci_high = np.quantile(boot_b[:, j] / boot_a[:, j] - 1, [tail, 1 - tail])
+        checks.append(
+            Check(
+                name=f"p{p}",
+                baseline=float(exact_a[j]),
+                candidate=float(exact_b[j]),
+                change=float(change),
+                ci_low=float(ci_low),
+                ci_high=float(ci_high),
+                limit=limit,
+                regressed=bool(change > limit and ci_low > 0),
+            )
+        )
+
+    errors_a = int((~is_success(baseline["code"])).sum())
+    errors_b = int((~is_success(candidate["code"])).sum())
+    rate_a, rate_b = errors_a / len(a), errors_b / len(b)
+    p_value = error_rate_increase_p(errors_a, len(a), errors_b, len(b))
+    # Normal-approximation interval for the difference in error rates
+    z = NormalDist().inv_cdf(1 - tail)
+    se = math.sqrt(rate_a * (1 - rate_a) / len(a) + rate_b * (1 - rate_b) / len(b))
+    checks.append(
+        Check(
+            name="error rate",
+            baseline=rate_a,
+            candidate=rate_b,
+            change=rate_b - rate_a,
+            ci_low=rate_b - rate_a - z * se,
+            ci_high=rate_b - rate_a + z * se,
+            limit=max_error_rate_increase,
+            regressed=bool(
+                rate_b - rate_a > max_error_rate_increase and p_value < 1 - confidence
+            ),
+        )
+    )
+
+    prob_slower, mw_p = mann_whitney_u(a, b)
+    return ModeDiff(
+        mode=mode,
+        baseline_count=len(a),
+        candidate_count=len(b),
+        checks=checks,
+        prob_slower=prob_slower,
+        mann_whitney_p=mw_p,
+    )
+
+
+def print_mode_diff(diff, confidence=DEFAULT_CONFIDENCE):
+    print(
+        f"\n=== {diff.mode} (A: {diff.baseline_count} requests, "
+        f"B: {diff.candidate_count} requests) ==="
+    )
+    ci_label = f"{confidence:.0%} CI"
+    print(
+        f"  {'':<11} {'A':>10} {'B':>10} {'change':>9}  {ci_label:>20}  "
+        f"{'limit':>8}  result"
+    )
+    for check in diff.checks:
+        if check.name == "error rate":
+            values = f"{check.baseline:>10.2%} {check.candidate:>10.2%}"
+            change = f"{check.change * 100:>+7.2f}pp"
+            ci = f"[{check.ci_low * 100:+.2f}pp, {check.ci_high * 100:+.2f}pp]"
+            limit = f"+{check.limit * 100:.2f}pp"
+        else:
+            values = f"{check.baseline:>8.1f}ms {check.candidate:>8.1f}ms"
+            change = f"{check.change:>+9.1%}"
+            ci = f"[{check.ci_low:+.1%}, {check.ci_high:+.1%}]"
+            limit = f"+{check.limit:.0%}"
+        result = "REGRESSED" if check.regressed else "ok"
+        print(f"  {check.name:<11} {values} {change}  {ci:>20}  {limit:>8}  {result}")
+
+    print(
+        f"  Mann-Whitney U: P(B slower than A) = {diff.prob_slower:.3f}, "
+        f"one-sided p = {diff.mann_whitney_p:.2g}"
+    )
@@ -0,0 +1,124 @@
+"""
+Replay recorded production traffic against the catalogue API.
+
+A request log is a JSONL file with one request per line, e.g.
+
+    {"timestamp": "2025-01-01T12:00:00.250Z", "path": "/works", "params": {"query": "cheese", "aggregations": "workType"}}
+    {"timestamp": "2025-01-01T12:00:00.900Z", "path": "/images/abc123", "params": {}}
+    {"timestamp": 1735732801.1, "url": "/catalogue/v2/works?workType=k&page=2"}
+
+``timestamp`` may be RFC 3339 or seconds since the epoch. Paths are relative
+to /catalogue/v2 unless they already start with /catalogue/. A plain list of
+queries with no timing (like smoke_tests/queries.csv) is also accepted, and
+is replayed as /works searches one second apart. Replaying keeps
+the log's endpoint mix (filters, aggregations, includes, paging, /images),
+and either keeps its original inter-arrival times (optionally sped up or
+slowed down) or spreads the requests evenly at a fixed rate.
+"""
+
+import json
+import urllib.parse
+from dataclasses import dataclass
+
+from loadtest.store import parse_timestamp_ns
+
+NON_FILTER_PARAMS = {"page", "pageSize", "include", "aggregations", "sort", "sortOrder"}
+
+
+@dataclass
+class LoggedRequest:
+    offset: float
+    path: str
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return parse_timestamp_ns(value) / 1e9
+
+
+def _request_path(entry):
+    if "url" in entry:
+        split = urllib.parse.urlsplit(entry["url"])
+        path = split.path + (f"?{split.query}" if split.query else "")
+    else:
+        path = entry["path"]
+        params = entry.get("params") or {}
+        if params:
+            path += "?" + urllib.parse.urlencode(list(params.items()))
+
+    if not path.startswith("/catalogue/"):
+        path = "/catalogue/v2" + path
+    return path
+
+
+def read_request_log(log_path):
+    """Read a request log, returning LoggedRequests sorted by time."""
+    if not log_path.endswith(".jsonl"):
+        with open(log_path) as f:
+            queries = [line.strip() for line in f if line.strip()]
+        return [
+            LoggedRequest(
+                offset=float(i),
+                path="/catalogue/v2/works?" + urllib.parse.urlencode({"query": q}),
+            )
+            for i, q in enumerate(queries)
+        ]
+
+    entries = []
+    with open(log_path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                entries.append((_parse_time(entry["timestamp"]), _request_path(entry)))
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{log_path}:{line_no}: bad log entry ({e})") from e
+
+    entries.sort(key=lambda e: e[0])
+    if not entries:
+        return []
+
+    t0 = entries[0][0]
+    return [LoggedRequest(offset=t - t0, path=path) for t, path in entries]
+
+
+def replay_schedule(logged, base_url, *, speed=1.0, rate=None, duration_secs=None):
+    """
+    Yield (offset, url) pairs for the native engine.
+
+    By default the original inter-arrival times are kept, divided by
+    ``speed``. If ``rate`` is given, the original timing is dropped and
+    requests are sent evenly at that rate instead. Stops after
+    ``duration_secs`` of replay time if given.
+    """
+    for i, request in enumerate(logged):
+        offset = i / rate if rate else request.offset / speed
+        if duration_secs is not None and offset >= duration_secs:
+            return
+        yield offset, base_url + request.path
+
+
+def replay_duration(logged, *, speed=1.0, rate=None):
+    if not logged:
+        return 0
+    return len(logged) / rate if rate else logged[-1].offset / speed
+
+
+def endpoint(url):
+    """
+    A coarse label for the endpoint a URL hits, e.g. "works search",
+    "works/{id}", "images filter".
+    """
+    split = urllib.parse.urlsplit(url)
+    parts = split.path.removeprefix("/catalogue/v2/").strip("/").split("/")
+    params = urllib.parse.parse_qs(split.query)
+
+    if len(parts) > 1:
+        return f"{parts[0]}/{{id}}"
+    if "query" in params:
+        return f"{parts[0]} search"
+    if set(params) - NON_FILTER_PARAMS:
+        return f"{parts[0]} filter"
+    return f"{parts[0]} list"
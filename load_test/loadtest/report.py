@@ -0,0 +1,495 @@
+"""
+Vectorised summaries and HTML reports for stored load test runs.
+
+Everything here works on the NumPy columns from loadtest.store, so the cost
+of a report is a handful of array operations rather than a Python loop per
+request. The HTML report stays a fixed size however long the run was: the
+latency scatter is downsampled with LTTB (largest-triangle-three-buckets,
+which keeps the visually important peaks), and time series and histograms
+are pre-binned to a fixed number of buckets before they're embedded.
+"""
+
+import html
+import json
+import math
+
+import numpy as np
+
+from loadtest.store import MISSING, load_run
+from loadtest.timing import COMPONENTS, SPLIT_UNAVAILABLE
+
+HISTOGRAM_BUCKETS_MS = [0, 200, 500, 1000, 2000, 5000, 10000]
+SUMMARY_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+MAX_SCATTER_POINTS = 2000
+MAX_TIME_BUCKETS = 600
+HISTOGRAM_BINS = 80
+
+SERIES_COLORS = ["#e94560", "#0f3460", "#f5a623", "#50c878", "#9b59b6", "#1abc9c"]
+
+
+def is_success(codes):
+    return (codes >= 200) & (codes < 400)
+
+
+def summarise(rows):
+    """Summary statistics for some rows of a stored run, like `vegeta report`."""
+    if not len(rows):
+        return {"count": 0}
+
+    latency_ms = rows["latency_ns"] / 1e6
+    timestamps = rows["timestamp_ns"]
+    ok = is_success(rows["code"])
+
+    start, end = int(timestamps.min()), int(timestamps.max())
+    wait = int((timestamps + rows["latency_ns"]).max())
+    codes, counts = np.unique(rows["code"], return_counts=True)
+
+    return {
+        "count": len(rows),
+        "rate": (len(rows) - 1) / ((end - start) / 1e9) if end > start else 0,
+        "throughput": ok.sum() / ((wait - start) / 1e9) if wait > start else 0,
+        "duration_s": (wait - start) / 1e9,
+        "attack_s": (end - start) / 1e9,
+        "wait_s": (wait - end) / 1e9,
+        "min": latency_ms.min(),
+        "mean": latency_ms.mean(),
+        "max": latency_ms.max(),
+        "percentiles": dict(
+            zip(SUMMARY_PERCENTILES, np.percentile(latency_ms, SUMMARY_PERCENTILES))
+        ),
+        "success_ratio": ok.mean(),
+        "error_rate": 1 - ok.mean(),
+        "status_codes": dict(zip(codes.tolist(), counts.tolist())),
+    }
+
+
+def print_text_report(rows):
+    s = summarise(rows)
+    if not s["count"]:
+        print("No results.")
+        return
+
+    pct = s["percentiles"]
+    latencies = [s["min"], s["mean"], pct[50], pct[90], pct[95], pct[99], s["max"]]
+    print(
+        f"Requests      [total, rate, throughput]  "
+        f"{s['count']}, {s['rate']:.2f}, {s['throughput']:.2f}"
+    )
+    print(
+        f"Duration      [total, attack, wait]      "
+        f"{s['duration_s']:.3f}s, {s['attack_s']:.3f}s, {s['wait_s']:.3f}s"
+    )
+    print(
+        "Latencies     [min, mean, 50, 90, 95, 99, max]  "
+        + ", ".join(f"{v:.3f}ms" for v in latencies)
+    )
+    print(f"Success       [ratio]                    {s['success_ratio']:.2%}")
+    print(
+        "Status Codes  [code:count]               "
+        + "  ".join(f"{code}:{count}" for code, count in s["status_codes"].items())
+    )
+
+
+def print_text_histogram(rows):
+    latency_ms = rows["latency_ns"] / 1e6
+    edges = HISTOGRAM_BUCKETS_MS + [math.inf]
+    counts, _ = np.histogram(latency_ms, bins=edges)
+    print(f"{'Bucket':<20} {'#':>6}  {'%':>7}")
+    for lo, hi, count in zip(edges, edges[1:], counts.tolist()):
+        share = count / len(latency_ms) if len(latency_ms) else 0
+        bucket = f"[{lo}ms, {hi}ms]" if hi != math.inf else f"[{lo}ms, +Inf]"
+        print(f"{bucket:<20} {count:>6}  {share:>7.2%}")
+
+
+def lttb(x, y, n_out):
+    """
+    Downsample (x, y) to ``n_out`` points with largest-triangle-three-buckets.
+
+    ``x`` must be sorted. The first and last points are always kept; from
+    each bucket in between, we keep the point that makes the largest
+    triangle with the previously kept point and the mean of the next bucket.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def time_bucket_size(duration_s):
+    """Bucket width in whole seconds, so there are at most MAX_TIME_BUCKETS."""
+    return max(1, math.ceil(duration_s / MAX_TIME_BUCKETS))
+
+
+def time_series(rows, t0_ns, bucket_s, n_buckets):
+    """Per-bucket throughput (requests/s), error rate, and p50/p99 latency."""
+    bucket = ((rows["timestamp_ns"] - t0_ns) // int(bucket_s * 1e9)).astype(np.int64)
+    bucket = np.clip(bucket, 0, n_buckets - 1)
+    errors = ~is_success(rows["code"])
+
+    totals = np.bincount(bucket, minlength=n_buckets)
+    error_counts = np.bincount(bucket, weights=errors, minlength=n_buckets)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        error_rate = np.where(totals > 0, error_counts / totals, np.nan)
+
+    latency_ms = rows["latency_ns"] / 1e6
+    p50, p99 = grouped_percentiles(bucket, latency_ms, n_buckets, [50, 99])
+
+    return {
+        "throughput": totals / bucket_s,
+        "error_rate": error_rate,
+        "p50": p50,
+        "p99": p99,
+    }
+
+
+def grouped_percentiles(groups, values, n_groups, percentiles):
+    """
+    Percentiles of ``values`` within each of ``n_groups`` integer groups, all
+    computed at once: sort by (group, value), then index into each group's
+    slice of the sorted values. Empty groups get NaN.
+    """
+    totals = np.bincount(groups, minlength=n_groups)
+    if not len(values):
+        return [np.full(n_groups, np.nan) for _ in percentiles]
+
+    sorted_values = values[np.lexsort((values, groups))]
+    starts = np.concatenate([[0], np.cumsum(totals)[:-1]])
+
+    result = []
+    for p in percentiles:
+        idx = starts + np.floor(p / 100 * np.maximum(totals - 1, 0)).astype(np.int64)
+        picked = sorted_values[np.minimum(idx, len(sorted_values) - 1)]
+        result.append(np.where(totals > 0, picked, np.nan))
+    return result
+
+
+def per_query_stats(rows, n_queries):
+    """
+    Count, p50, p99, mean latency and error count for each query index,
+    as arrays indexed by query.
+    """
+    rows = rows[rows["query"] >= 0]
+    query = rows["query"].astype(np.int64)
+    latency_ms = rows["latency_ns"] / 1e6
+
+    counts = np.bincount(query, minlength=n_queries)
+    errors = np.bincount(
+        query, weights=~is_success(rows["code"]), minlength=n_queries
+    ).astype(np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(query, weights=latency_ms, minlength=n_queries) / counts
+    p50, p99 = grouped_percentiles(query, latency_ms, n_queries, [50, 99])
+
+    return {"count": counts, "p50": p50, "p99": p99, "mean": mean, "errors": errors}
+
+
+def _query_label(query, width=40):
+    return query if len(query) <= width else query[: width - 1] + "…"
+
+
+def print_query_leaderboard(run, baseline=None, top=10):
+    """
+    Print the slowest queries for each mode, the queries with the biggest
+    p50 ratio against ``baseline`` (e.g. semantic vs default), and per-query
+    error counts.
+    """
+    n_queries = len(run.queries)
+    stats = {
+        mode: per_query_stats(rows, n_queries) for mode, rows in run.by_mode().items()
+    }
+
+    for mode, s in stats.items():
+        print(f"\nSlowest queries — {mode} (by p99)")
+        print(f"  {'Query':<40} {'n':>6} {'p50':>10} {'p99':>10} {'errors':>7}")
+        ranked = np.argsort(np.nan_to_num(s["p99"], nan=-1))[::-1][:top]
+        for q in ranked:
+            if not s["count"][q]:
+                continue
+            print(
+                f"  {_query_label(run.queries[q]):<40} {s['count'][q]:>6} "
+                f"{s['p50'][q]:>8.1f}ms {s['p99'][q]:>8.1f}ms {s['errors'][q]:>7}"
+            )
+
+    if baseline is not None and baseline in stats:
+        base = stats[baseline]
+        for mode, s in stats.items():
+            if mode == baseline:
+                continue
+            with np.errstate(invalid="ignore", divide="ignore"):
+                ratio = s["p50"] / base["p50"]
+            print(f"\nBiggest p50 ratio — {mode} vs {baseline}")
+            print(
+                f"  {'Query':<40} {mode + ' p50':>14} {baseline + ' p50':>14} {'ratio':>7}"
+            )
+            ranked = np.argsort(np.nan_to_num(ratio, nan=-1))[::-1][:top]
+            for q in ranked:
+                if np.isnan(ratio[q]):
+                    continue
+                print(
+                    f"  {_query_label(run.queries[q]):<40} {s['p50'][q]:>12.1f}ms "
+                    f"{base['p50'][q]:>12.1f}ms {ratio[q]:>6.1f}x"
+                )
+
+    errors = {mode: s["errors"] for mode, s in stats.items() if s["errors"].any()}
+    if errors:
+        print("\nErrors per query")
+        print(f"  {'Query':<40} " + " ".join(f"{mode:>10}" for mode in errors))
+        total = sum(errors.values())
+        for q in np.argsort(total)[::-1]:
+            if not total[q]:
+                break
+            print(
+                f"  {_query_label(run.queries[q]):<40} "
+                + " ".join(f"{e[q]:>10}" for e in errors.values())
+            )
+
+
+def latency_breakdown(rows):
+    """
+    p50 and p99 of each latency component (see loadtest.timing), over the
+    rows whose response reported the times it needs. Returns
+    {component: {"count": n, 50: ms, 99: ms}}, leaving out components no
+    response reported.
+    """
+    latency, server, es = rows["latency_ns"], rows["server_ns"], rows["es_ns"]
+    has_server, has_es = server != MISSING, es != MISSING
+    parts = {
+        "network": (latency - server)[has_server],
+        "api": (server - es)[has_server & has_es],
+        "es": es[has_es],
+    }
+
+    breakdown = {}
+    for component in COMPONENTS:
+        values = np.maximum(parts[component], 0) / 1e6
+        if len(values):
+            p50, p99 = np.percentile(values, [50, 99])
+            breakdown[component] = {"count": len(values), 50: p50, 99: p99}
+    return breakdown
+
+
+def print_latency_breakdown(by_mode):
+    """
+    Print where each mode's time went, and what its sampled response bodies
+    said about result counts. Modes whose responses didn't report server
+    timing (e.g. any run against the catalogue API today) are named as
+    having no split, rather than given a row of blanks.
+    """
+    breakdowns = {mode: latency_breakdown(rows) for mode, rows in by_mode.items()}
+    unsplit = [mode for mode, breakdown in breakdowns.items() if not breakdown]
+    breakdowns = {mode: b for mode, b in breakdowns.items() if b}
+    if not breakdowns:
+        print(f"  Latency split unavailable: {SPLIT_UNAVAILABLE}")
+    else:
+        print(
+            f"  {'Mode':<20} {'covered':>8}  "
+            + "  ".join(f"{c + ' p50/p99':>20}" for c in COMPONENTS)
+        )
+        for mode, breakdown in breakdowns.items():
+            rows = by_mode[mode]
+            covered = max((b["count"] for b in breakdown.values()), default=0)
+            cells = [
+                (
+                    f"{breakdown[c][50]:.1f} / {breakdown[c][99]:.1f}ms"
+                    if c in breakdown
+                    else "-"
+                )
+                for c in COMPONENTS
+            ]
+            print(
+                f"  {mode:<20} {covered / max(len(rows), 1):>8.1%}  "
+                + "  ".join(f"{cell:>20}" for cell in cells)
+            )
+        if unsplit:
+            print(f"  No split for {', '.join(unsplit)}: {SPLIT_UNAVAILABLE}")
+
+    counts = {
+        mode: rows["total_results"][rows["total_results"] != MISSING]
+        for mode, rows in by_mode.items()
+    }
+    if any(len(c) for c in counts.values()):
+        print(
+            f"\n  {'Mode':<20} {'sampled':>8}  {'median results':>15}  {'zero results':>13}"
+        )
+        for mode, c in counts.items():
+            if len(c):
+                print(
+                    f"  {mode:<20} {len(c):>8}  {np.median(c):>15.0f}  "
+                    f"{(c == 0).mean():>13.1%}"
+                )
+
+
+def _to_json_list(values, ndigits=3):
+    # NaN isn't valid JSON; Plotly treats null as a gap
+    return [None if math.isnan(v) else round(v, ndigits) for v in values.tolist()]
+
+
+def build_report_data(run):
+    results = run.results
+    if len(results):
+        t0 = int(results["timestamp_ns"].min())
+        duration_s = (int(results["timestamp_ns"].max()) - t0) / 1e9
+    else:
+        t0, duration_s = 0, 0
+
+    bucket_s = time_bucket_size(duration_s)
+    n_buckets = int(duration_s // bucket_s) + 1
+    bucket_times = np.arange(n_buckets) * bucket_s
+
+    latency_ms = results["latency_ns"] / 1e6
+    if len(results):
+        # Log-spaced bins so both a fast default search and a slow semantic
+        # one get a sensible share of the histogram
+        lo = max(float(latency_ms.min()), 0.1)
+        hi = max(float(latency_ms.max()), lo * 1.01)
+        hist_edges = np.geomspace(lo, hi, HISTOGRAM_BINS + 1)
+    else:
+        hist_edges = np.array([0.0, 1.0])
+
+    series = []
+    for i, (mode, rows) in enumerate(run.by_mode().items()):
+        t = (rows["timestamp_ns"] - t0) / 1e9
+        latency = rows["latency_ns"] / 1e6
+        scatter_t, scatter_l = lttb(
+            np.asarray(t), np.asarray(latency), MAX_SCATTER_POINTS
+        )
+        counts, _ = np.histogram(latency, bins=hist_edges)
+        ts = time_series(rows, t0, bucket_s, n_buckets)
+        breakdown = latency_breakdown(rows)
+
+        series.append(
+            {
+                "name": mode.replace("_", " ").title(),
+                "color": SERIES_COLORS[i % len(SERIES_COLORS)],
+                "summary": summarise(rows),
+                "scatter": {
+                    "t": _to_json_list(scatter_t),
+                    "l": _to_json_list(scatter_l),
+                },
+                "hist": counts.tolist(),
+                "throughput": _to_json_list(ts["throughput"]),
+                "error_rate": _to_json_list(ts["error_rate"] * 100),
+                "p50": _to_json_list(ts["p50"]),
+                "p99": _to_json_list(ts["p99"]),
+                "breakdown": [
+                    round(float(breakdown[c][50]), 3) if c in breakdown else None
+                    for c in COMPONENTS
+                ],
+            }
+        )
+
+    return {
+        "bucket_s": bucket_s,
+        "bucket_times": bucket_times.tolist(),
+        "hist_centres": _to_json_list(np.sqrt(hist_edges[:-1] * hist_edges[1:])),
+        "components": list(COMPONENTS),
+        "has_breakdown": any(v is not None for s in series for v in s["breakdown"]),
+        "series": series,
+    }
+
+
+def _summary_table(series):
+    header = "".join(
+        f"<th>{h}</th>"
+        for h in ["", "Requests", "Throughput"]
+        + [f"p{p}" for p in SUMMARY_PERCENTILES]
+        + ["Max", "Errors"]
+    )
+    rows = []
+    for s in series:
+        summary = s["summary"]
+        if not summary["count"]:
+            continue
+        cells = (
+            [summary["count"], f"{summary['throughput']:.1f}/s"]
+            + [f"{v:.0f}ms" for v in summary["percentiles"].values()]
+            + [f"{summary['max']:.0f}ms", f"{summary['error_rate']:.2%}"]
+        )
+        rows.append(
+            f"<tr><th>{html.escape(s['name'])}</th>"
+            + "".join(f"<td>{c}</td>" for c in cells)
+            + "</tr>"
+        )
+    return f"<table><tr>{header}</tr>{''.join(rows)}</table>"
+
+
+def generate_html_report(run_path: str, output_html: str):
+    """Build a self-contained, fixed-size Plotly.js comparison HTML report."""
+    data = build_report_data(load_run(run_path))
+
+    title = " vs ".join(html.escape(s["name"]) for s in data["series"])
+    summaries = _summary_table(data["series"])
+    for s in data["series"]:
+        del s["summary"]
+
+    report = f"""<!DOCTYPE html>
+<html><head><title>Vegeta Load Test Comparison</title>
+<script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
+<style>body{{font-family:system-ui;margin:20px;background:#1a1a2e;color:#eee}}h1{{color:#e94560}}.chart{{width:100%;height:500px;margin:20px 0}}table{{border-collapse:collapse}}th,td{{padding:4px 12px;text-align:right}}</style>
+</head><body>
+<h1>{title} Search &mdash; Load Test Comparison</h1>
+{summaries}
+<div id="latency" class="chart"></div>
+<div id="percentiles" class="chart"></div>
+<div id="throughput" class="chart"></div>
+<div id="errors" class="chart"></div>
+<div id="histogram" class="chart"></div>
+<div id="breakdown" class="chart"></div>
+<p id="no-breakdown" style="display:none">Latency breakdown unavailable: {SPLIT_UNAVAILABLE}</p>
+<script>
+var data = {json.dumps(data)};
+var layout = function(title, xtitle, ytitle, extra) {{
+  return Object.assign({{title:title,xaxis:{{title:xtitle}},yaxis:{{title:ytitle}},
+    paper_bgcolor:'#1a1a2e',plot_bgcolor:'#16213e',font:{{color:'#eee'}}}}, extra || {{}});
+}};
+var bucketLabel = data.bucket_s > 1 ? ' (' + data.bucket_s + 's buckets)' : '';
+Plotly.newPlot('latency', data.series.map(function(s) {{
+  return {{x:s.scatter.t,y:s.scatter.l,mode:'markers',name:s.name,marker:{{size:5,color:s.color,opacity:0.7}}}};
+}}), layout('Response Latency Over Time (downsampled)', 'Time (s)', 'Latency (ms)'));
+Plotly.newPlot('percentiles', [].concat.apply([], data.series.map(function(s) {{
+  return [
+    {{x:data.bucket_times,y:s.p50,mode:'lines',name:s.name+' p50',line:{{color:s.color}}}},
+    {{x:data.bucket_times,y:s.p99,mode:'lines',name:s.name+' p99',line:{{color:s.color,dash:'dot'}}}}
+  ];
+}})), layout('Latency Percentiles' + bucketLabel, 'Time (s)', 'Latency (ms)'));
+Plotly.newPlot('throughput', data.series.map(function(s) {{
+  return {{x:data.bucket_times,y:s.throughput,mode:'lines',name:s.name,line:{{color:s.color}}}};
+}}), layout('Throughput' + bucketLabel, 'Time (s)', 'Requests/s'));
+Plotly.newPlot('errors', data.series.map(function(s) {{
+  return {{x:data.bucket_times,y:s.error_rate,mode:'lines',name:s.name,line:{{color:s.color}}}};
+}}), layout('Error Rate' + bucketLabel, 'Time (s)', 'Errors (%)'));
+Plotly.newPlot('histogram', data.series.map(function(s) {{
+  return {{x:data.hist_centres,y:s.hist,type:'bar',name:s.name,opacity:0.7,marker:{{color:s.color}}}};
+}}), layout('Latency Distribution', 'Latency (ms)', 'Count', {{barmode:'overlay',xaxis:{{title:'Latency (ms)',type:'log'}}}}));
+if (data.has_breakdown) {{
+  Plotly.newPlot('breakdown', data.components.map(function(c, i) {{
+    return {{x:data.series.map(function(s) {{ return s.name; }}),y:data.series.map(function(s) {{ return s.breakdown[i]; }}),type:'bar',name:c}};
+  }}), layout('Median Latency Breakdown (from Server-Timing)', '', 'Latency (ms)', {{barmode:'stack'}}));
+}} else {{
+  document.getElementById('breakdown').style.display = 'none';
+  document.getElementById('no-breakdown').style.display = 'block';
+}}
+</script></body></html>"""
+
+    with open(output_html, "w") as f:
+        f.write(report)
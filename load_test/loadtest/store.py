@@ -0,0 +1,215 @@
+"""
+Columnar storage for load test runs.
+
+A run is ingested once from its JSONL result files into a single NumPy
+``.npy`` file holding a structured array (one row per request, sorted by
+timestamp), plus a small ``.json`` sidecar with the mode and query names
+the integer columns refer to. Every request is tagged with its query (or,
+for non-search requests, its path), so latency can be attributed per query,
+and with the server and Elasticsearch time it reported, if any, so latency
+can be split into components. Loading a run memory-maps the ``.npy``, so
+reopening even a multi-million-request run is near-instant and only the
+columns you touch are read from disk.
+"""
+
+import json
+import os
+import re
+import urllib.parse
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from loadtest.timing import result_server_times
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+RESULT_DTYPE = np.dtype(
+    [
+        ("timestamp_ns", "<i8"),
+        ("latency_ns", "<i8"),
+        ("code", "<i2"),
+        ("query", "<i4"),
+        ("mode", "<i2"),
+        ("server_ns", "<i8"),
+        ("es_ns", "<i8"),
+        ("total_results", "<i4"),
+    ]
+)
+
+NO_QUERY = -1
+
+# For server_ns, es_ns and total_results, when the response didn't say
+MISSING = -1
+
+TIMESTAMP_RE = re.compile(
+    r"^(?P<seconds>.+T\d\d:\d\d:\d\d)(?:\.(?P<fraction>\d+))?(?P<tz>Z|[+-]\d\d:\d\d)$"
+)
+
+
+def parse_timestamp_ns(ts):
+    """
+    Parse an RFC 3339 timestamp to integer nanoseconds since the epoch.
+
+    datetime only keeps microseconds, so the fractional part is handled
+    separately to keep Vegeta's full nanosecond precision.
+    """
+    m = TIMESTAMP_RE.match(ts)
+    if m is None:
+        raise ValueError(f"Unrecognised timestamp: {ts!r}")
+    tz = "+00:00" if m["tz"] == "Z" else m["tz"]
+    seconds = int(datetime.fromisoformat(m["seconds"] + tz).timestamp())
+    nanos = int((m["fraction"] or "0").ljust(9, "0")[:9])
+    return seconds * 1_000_000_000 + nanos
+
+
+def target_from_url(url):
+    """
+    What a request was for: its search query if it has one, otherwise its
+    path and query string (e.g. for replayed /works/{id} requests).
+    """
+    split = urllib.parse.urlsplit(url)
+    params = urllib.parse.parse_qs(split.query)
+    if "query" in params:
+        return params["query"][0]
+    if not split.path:
+        return None
+    return split.path + (f"?{split.query}" if split.query else "")
+
+
+def mode_from_path(path):
+    """Guess a mode name from a result filename, e.g. default_20250101_120000.jsonl"""
+    name = os.path.basename(path).split(".")[0]
+    name = re.sub(r"_\d{8}_\d{6}$", "", name)
+    return name.removeprefix("results_")
+
+
+@dataclass
+class Run:
+    results: np.ndarray
+    modes: list[str]
+    queries: list[str]
+
+    def select(self, mode):
+        """Rows for a single mode."""
+        return self.results[self.results["mode"] == self.modes.index(mode)]
+
+    def by_mode(self):
+        return {mode: self.select(mode) for mode in self.modes}
+
+
+def sidecar_path(run_path):
+    return os.path.splitext(run_path)[0] + ".json"
+
+
+def read_jsonl_results(jsonl_paths, mode_of=None, query_urls=None):
+    """
+    Read a run's JSONL result files into an in-memory Run.
+
+    ``jsonl_paths`` maps mode name (e.g. "default", "semantic") to the JSONL
+    file holding that mode's results. Alternatively, pass ``mode_of`` to
+    split results into modes by their URL instead, e.g. by endpoint.
+
+    Requests are tagged with ``target_from_url``, unless ``query_urls`` maps
+    their mode to a {url: query} dict with their URL in it. That's for when
+    a mode rewrote its queries (e.g. a variant's transform), so its requests
+    are grouped under the original query, the same as the other modes'.
+    """
+    modes = {} if mode_of else {mode: i for i, mode in enumerate(jsonl_paths)}
+    queries = {}
+    rows = []
+
+    for mode, path in jsonl_paths.items():
+        original_queries = (query_urls or {}).get(mode, {})
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    r = _loads(line)
+                except ValueError:
+                    continue
+
+                url = r.get("url", "")
+                query = original_queries.get(url) or target_from_url(url)
+                mode_index = modes.setdefault(
+                    mode_of(url) if mode_of else mode, len(modes)
+                )
+                query_index = (
+                    NO_QUERY
+                    if query is None
+                    else queries.setdefault(query, len(queries))
+                )
+                server_ms, es_ms = result_server_times(r)
+                total_results = r.get("total_results")
+                rows.append(
+                    (
+                        parse_timestamp_ns(r["timestamp"]),
+                        r["latency"],
+                        r["code"],
+                        query_index,
+                        mode_index,
+                        MISSING if server_ms is None else int(server_ms * 1e6),
+                        MISSING if es_ms is None else int(es_ms * 1e6),
+                        MISSING if total_results is None else total_results,
+                    )
+                )
+
+    results = np.array(rows, dtype=RESULT_DTYPE)
+    results.sort(order="timestamp_ns", kind="stable")
+
+    return Run(results=results, modes=list(modes), queries=list(queries))
+
+
+def ingest_run(jsonl_paths, run_path, mode_of=None, query_urls=None):
+    """
+    Convert a run's JSONL result files into the columnar format, as read
+    by ``read_jsonl_results``. Returns ``run_path``.
+    """
+    run = read_jsonl_results(jsonl_paths, mode_of=mode_of, query_urls=query_urls)
+
+    tmp_path = run_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, run.results)
+    os.replace(tmp_path, run_path)
+
+    with open(sidecar_path(run_path), "w") as f:
+        json.dump(
+            {
+                "modes": run.modes,
+                "queries": run.queries,
+                "sources": {
+                    mode: os.path.basename(p) for mode, p in jsonl_paths.items()
+                },
+            },
+            f,
+            indent=2,
+        )
+
+    return run_path
+
+
+def load_run(run_path):
+    """Memory-map a run previously written by ``ingest_run``."""
+    with open(sidecar_path(run_path)) as f:
+        meta = json.load(f)
+    results = np.load(run_path, mmap_mode="r")
+
+    # Runs stored before a column was added get it filled in as MISSING
+    if results.dtype != RESULT_DTYPE:
+        upgraded = np.full(len(results), MISSING, dtype=RESULT_DTYPE)
+        for name in results.dtype.names:
+            upgraded[name] = results[name]
+        results = upgraded
+
+    return Run(
+        results=results,
+        modes=meta["modes"],
+        queries=meta["queries"],
+    )
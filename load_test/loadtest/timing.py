@@ -0,0 +1,147 @@
+"""
+Where the time went: splitting client-side latency into network, API and
+Elasticsearch time.
+
+The split needs the server to say how long it spent, which it can do with a
+``Server-Timing`` header (e.g. ``es;dur=41.2, app;dur=63.0``) or an upstream
+time header set by a proxy. The catalogue API doesn't send either today:
+Elasticsearch's ``took`` is only recorded as the ``elasticTook`` APM label.
+So until it does, the components are only filled in against a server that
+sends them, and every other request is just counted as "not covered".
+
+For a request with a client latency of L, a server time of S and an
+Elasticsearch time of E:
+
+    network = L - S    (CDN, load balancer, TLS, and the wire)
+    api     = S - E    (the API service itself, e.g. building the query)
+    es      = E
+
+Response bodies are also sampled for ``totalResults`` (and a top-level
+``took``, if the API ever starts sending one).
+"""
+
+import json
+import re
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Server-Timing metric names for the whole of the server's time, and for the
+# part of it spent in Elasticsearch, in order of preference
+SERVER_TOTAL_METRICS = ("total", "app", "api")
+ES_METRICS = ("es", "elasticsearch", "search", "db")
+
+# Headers some proxies use for the upstream's response time, in milliseconds
+UPSTREAM_TIME_HEADERS = ("x-envoy-upstream-service-time", "x-upstream-time")
+
+COMPONENTS = ("network", "api", "es")
+
+# Why reports have no breakdown for a mode
+SPLIT_UNAVAILABLE = (
+    "no response reported server timing (the catalogue API doesn't send a "
+    "Server-Timing header or a took field)"
+)
+
+DUR_RE = re.compile(r"(?:^|;)\s*dur\s*=\s*\"?([\d.]+)")
+
+
+def parse_server_timing(value):
+    """Parse a Server-Timing header value into {metric name: duration in ms}."""
+    metrics = {}
+    for entry in value.split(","):
+        name, _, params = entry.strip().partition(";")
+        m = DUR_RE.search(";" + params)
+        if name and m:
+            metrics[name.strip().lower()] = float(m.group(1))
+    return metrics
+
+
+def _header(headers, name):
+    # httpx headers are case-insensitive; Vegeta's are {Name: [values]}
+    if hasattr(headers, "get_list"):
+        values = headers.get_list(name)
+    else:
+        values = next(
+            (v for k, v in headers.items() if k.lower() == name.lower()), None
+        )
+        if isinstance(values, str):
+            values = [values]
+    return ", ".join(values) if values else None
+
+
+def server_times(headers):
+    """
+    Server and Elasticsearch time in ms from response headers, as a pair
+    where either may be None if the response didn't say.
+    """
+    if not headers:
+        return None, None
+
+    server_ms = es_ms = None
+    server_timing = _header(headers, "server-timing")
+    if server_timing:
+        metrics = parse_server_timing(server_timing)
+        server_ms = next(
+            (metrics[m] for m in SERVER_TOTAL_METRICS if m in metrics), None
+        )
+        es_ms = next((metrics[m] for m in ES_METRICS if m in metrics), None)
+
+    if server_ms is None:
+        for name in UPSTREAM_TIME_HEADERS:
+            value = _header(headers, name)
+            if value:
+                try:
+                    server_ms = float(value.split(",")[0])
+                    break
+                except ValueError:
+                    pass
+
+    return server_ms, es_ms
+
+
+def body_fields(body):
+    """
+    ``totalResults`` and a top-level ``took`` (in ms) from a JSON response
+    body, either of which may be None.
+    """
+    try:
+        doc = _loads(body)
+    except ValueError:
+        return None, None
+    if not isinstance(doc, dict):
+        return None, None
+
+    total, took = doc.get("totalResults"), doc.get("took")
+    return (
+        total if isinstance(total, int) else None,
+        float(took) if isinstance(took, (int, float)) else None,
+    )
+
+
+def result_server_times(result):
+    """
+    Server and Elasticsearch time for a parsed JSONL result line, from the
+    native engine's fields or, failing that, Vegeta's recorded headers.
+    """
+    if "server_ms" in result:
+        return result["server_ms"], result.get("es_ms")
+    return server_times(result.get("headers"))
+
+
+def components(latency_ms, server_ms, es_ms):
+    """
+    Split a latency into {component: ms}. Components that can't be worked
+    out from what the server told us are left out.
+    """
+    split = {}
+    if server_ms is not None:
+        split["network"] = max(latency_ms - server_ms, 0.0)
+        if es_ms is not None:
+            split["api"] = max(server_ms - es_ms, 0.0)
+    if es_ms is not None:
+        split["es"] = es_ms
+    return split
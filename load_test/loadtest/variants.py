@@ -0,0 +1,91 @@
+"""
+Named variants for N-way comparisons.
+
+A variant is one arm of a ``loadtest compare`` run: which environment it
+hits, which Elasticsearch cluster it asks for, and how each query is
+rewritten before it's sent. On the command line each one is given as
+
+    --variant NAME [env=ENV] [cluster=CLUSTER] [transform=TRANSFORM]
+
+e.g. ``--variant default --variant elser cluster=elser --variant stage
+env=stage``. ENV is dev, stage, prod or a base URL such as
+http://localhost:8080; CLUSTER is one of CLUSTERS; TRANSFORM names an entry
+in QUERY_TRANSFORMS.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+
+CLUSTERS = ["default", "elser", "openai"]
+
+
+def _ascii_fold(query):
+    return unicodedata.normalize("NFKD", query).encode("ascii", "ignore").decode()
+
+
+QUERY_TRANSFORMS = {
+    "none": lambda query: query,
+    "lowercase": str.lower,
+    "ascii": _ascii_fold,
+    "phrase": lambda query: f'"{query}"',
+    "first-word": lambda query: query.split()[0] if query.split() else query,
+}
+
+NAME_RE = re.compile(r"^[\w.-]+$")
+
+
+@dataclass
+class Variant:
+    name: str
+    env: str
+    cluster: str = "default"
+    transform: str = "none"
+
+    @property
+    def semantic(self):
+        return self.cluster != "default"
+
+    def queries(self, queries):
+        transform = QUERY_TRANSFORMS[self.transform]
+        return [transform(query) for query in queries]
+
+    def describe(self):
+        parts = [f"env={self.env}", f"cluster={self.cluster}"]
+        if self.transform != "none":
+            parts.append(f"transform={self.transform}")
+        return " ".join(parts)
+
+
+def parse_variant(tokens, default_env):
+    """
+    Parse a variant from its command-line tokens, NAME followed by any
+    key=value settings. Raises ValueError if they don't make sense.
+    """
+    name, *settings = tokens
+    if not NAME_RE.match(name):
+        raise ValueError(
+            f"variant name {name!r} may only contain letters, digits, '.', '_' and '-'"
+        )
+
+    variant = Variant(name=name, env=default_env)
+    for setting in settings:
+        key, sep, value = setting.partition("=")
+        if not sep or key not in ("env", "cluster", "transform"):
+            raise ValueError(
+                f"bad setting {setting!r} for variant {name!r} "
+                "(expected env=, cluster= or transform=)"
+            )
+        setattr(variant, key, value)
+
+    if variant.cluster not in CLUSTERS:
+        raise ValueError(
+            f"unknown cluster {variant.cluster!r} for variant {name!r} "
+            f"(expected one of {', '.join(CLUSTERS)})"
+        )
+    if variant.transform not in QUERY_TRANSFORMS:
+        raise ValueError(
+            f"unknown transform {variant.transform!r} for variant {name!r} "
+            f"(expected one of {', '.join(QUERY_TRANSFORMS)})"
+        )
+    return variant
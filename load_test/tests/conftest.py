@@ -0,0 +1,51 @@
+"""
+A stub of the catalogue API for the load test's tests, on a local port.
+
+    /works?delay=0.2    responds after 0.2 seconds
+    /status/429         responds with that status
+
+Every response is a small JSON body with ``totalResults``.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        delay = float(params.get("delay", ["0"])[0])
+        if delay:
+            time.sleep(delay)
+
+        status = 200
+        if url.path.startswith("/status/"):
+            status = int(url.path.rsplit("/", 1)[1])
+
+        body = json.dumps({"totalResults": 3, "results": []}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    """The base URL of a stub API server, e.g. http://127.0.0.1:12345"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import queue
+import socket
+
+import pytest
+
+from loadtest.distributed import (
+    WorkerError,
+    coordinate,
+    run_distributed_attacks,
+    serve,
+    shard_schedule,
+    start_distributed_attack,
+)
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_shards_cover_the_whole_schedule():
+    urls = ["a", "b", "c"]
+    shards = [list(shard_schedule(urls, 10, 1, i, 3)) for i in range(3)]
+
+    merged = sorted(triple for shard in shards for triple in shard)
+    assert merged == [(i, i / 10, urls[i % 3]) for i in range(10)]
+
+
+def test_local_workers_split_every_attack(stub_server, tmp_path):
+    jobs = [
+        ([f"{stub_server}/works?q={i}" for i in range(5)], tmp_path / "a.jsonl"),
+        ([f"{stub_server}/works?v=b"], tmp_path / "b.jsonl"),
+    ]
+
+    run_distributed_attacks(jobs, 20, 1, local_workers=3)
+
+    starts = []
+    for urls, path in jobs:
+        results = sorted(read_results(path), key=lambda r: r["seq"])
+        assert [r["seq"] for r in results] == list(range(20))
+        assert [r["url"] for r in results] == [urls[i % len(urls)] for i in range(20)]
+        assert {r["code"] for r in results} == {200}
+        starts.append(results[0]["timestamp"])
+
+    # Every attack is paced by the same clock
+    assert starts[0] == starts[1]
+
+
+def test_a_job_with_the_wrong_token_is_refused(stub_server):
+    class Out(list):
+        write = list.append
+
+    async def run():
+        ready = queue.Queue()
+        server = asyncio.create_task(
+            serve("127.0.0.1", 0, token="secret", ready=ready, jobs=1)
+        )
+        port = await asyncio.to_thread(ready.get, timeout=5)
+        try:
+            await coordinate(
+                [("127.0.0.1", port)],
+                [([f"{stub_server}/works"], Out())],
+                5,
+                1,
+                token="guess",
+            )
+        finally:
+            await server
+
+    with pytest.raises(WorkerError, match="token"):
+        asyncio.run(run())
+
+
+def test_a_worker_error_is_raised_from_join(stub_server, tmp_path):
+    thread = start_distributed_attack(
+        [f"{stub_server}/works"],
+        5,
+        1,
+        tmp_path / "results.jsonl",
+        remote_workers=[("127.0.0.1", free_port())],
+    )
+
+    with pytest.raises(WorkerError, match="Can't reach worker"):
+        thread.join()
+
+
+def test_a_worker_wont_listen_publicly_without_a_token():
+    with pytest.raises(ValueError, match="without a token"):
+        asyncio.run(serve("0.0.0.0", 0))
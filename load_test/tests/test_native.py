@@ -0,0 +1,94 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from loadtest.native import (
+    AttackThread,
+    attack_to,
+    constant_schedule,
+    linear_schedule,
+    run_native_attack,
+    start_native_attack,
+)
+
+
+def run(requests, **kwargs):
+    out = io.StringIO()
+    asyncio.run(attack_to(requests, out, **kwargs))
+    return sorted(
+        (json.loads(line) for line in out.getvalue().splitlines()),
+        key=lambda r: r["seq"],
+    )
+
+
+def test_constant_schedule_is_evenly_spaced():
+    assert list(constant_schedule(4, 1)) == [0, 0.25, 0.5, 0.75]
+
+
+def test_linear_schedule_ramps_up():
+    offsets = list(linear_schedule(10, 30, 2))
+
+    # The average rate is 20 rps, over 2 seconds
+    assert len(offsets) == 40
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert gaps == sorted(gaps, reverse=True)
+    assert gaps[0] == pytest.approx(1 / 10, rel=0.05)
+    assert gaps[-1] == pytest.approx(1 / 30, rel=0.05)
+
+
+def test_sends_every_request_at_its_offset(stub_server):
+    requests = [
+        (offset, f"{stub_server}/works?q={i}") for i, offset in enumerate([0, 0.2, 0.4])
+    ]
+    results = run(requests, body_sample_rate=1.0)
+
+    assert [r["seq"] for r in results] == [0, 1, 2]
+    assert [r["url"] for r in results] == [url for _, url in requests]
+    assert all(r["code"] == 200 and r["error"] == "" for r in results)
+    assert all(r["total_results"] == 3 for r in results)
+
+
+def test_latency_is_measured_from_the_intended_send_time(stub_server):
+    # With one request in flight at a time, the second can't be sent until
+    # the first has finished, 0.3s after it was due; that wait counts
+    requests = [(0, f"{stub_server}/works?delay=0.3"), (0, f"{stub_server}/works")]
+    first, second = run(requests, max_in_flight=1)
+
+    assert first["latency"] >= 0.3e9
+    assert second["latency"] >= 0.3e9
+    assert first["timestamp"] == second["timestamp"]
+
+
+def test_failed_requests_are_recorded_not_raised(stub_server):
+    requests = [
+        (0, "http://127.0.0.1:1/unreachable"),
+        (0, "not a url"),
+        (0, f"{stub_server}/status/503"),
+    ]
+    unreachable, malformed, unavailable = run(requests)
+
+    for result in (unreachable, malformed):
+        assert result["code"] == 0
+        assert result["error"]
+
+    # An error status is a response, not a failed request
+    assert unavailable["code"] == 503
+    assert unavailable["error"] == ""
+
+
+def test_writes_jsonl(stub_server, tmp_path):
+    jsonl_path = tmp_path / "results.jsonl"
+    run_native_attack([f"{stub_server}/works"], 20, 0.5, jsonl_path)
+
+    results = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert sorted(r["seq"] for r in results) == list(range(10))
+
+
+def test_attack_thread_raises_the_attacks_exception(tmp_path):
+    # A directory can't be opened as the results file
+    thread = start_native_attack(["http://127.0.0.1:1/"], 1, 1, tmp_path)
+    assert isinstance(thread, AttackThread)
+    with pytest.raises(OSError):
+        thread.join()
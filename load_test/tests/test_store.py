@@ -0,0 +1,59 @@
+import json
+
+from loadtest.cli import build_target_urls
+from loadtest.report import per_query_stats
+from loadtest.store import read_jsonl_results
+from loadtest.variants import Variant
+
+
+def write_results(path, urls, latency_ms):
+    with open(path, "w") as f:
+        for seq, url in enumerate(urls):
+            result = {
+                "seq": seq,
+                "code": 200,
+                "timestamp": f"2025-01-01T12:00:{seq:02d}Z",
+                "latency": int(latency_ms * 1e6),
+                "url": url,
+            }
+            f.write(json.dumps(result) + "\n")
+
+
+def test_transformed_queries_are_grouped_with_the_original(tmp_path):
+    queries = ["Cheese", "Café au lait"]
+    variants = [
+        Variant(name="default", env="prod"),
+        Variant(name="ascii", env="prod", transform="ascii"),
+    ]
+    urls = {
+        v.name: build_target_urls(v.queries(queries), "http://api/works", False)
+        for v in variants
+    }
+    paths = {name: tmp_path / f"{name}.jsonl" for name in urls}
+    write_results(paths["default"], urls["default"], 10)
+    write_results(paths["ascii"], urls["ascii"], 20)
+
+    run = read_jsonl_results(
+        paths,
+        query_urls={
+            name: dict(zip(variant_urls, queries))
+            for name, variant_urls in urls.items()
+        },
+    )
+
+    assert run.queries == queries
+    for mode, latency_ms in [("default", 10), ("ascii", 20)]:
+        stats = per_query_stats(run.select(mode), len(run.queries))
+        assert list(stats["count"]) == [1, 1]
+        assert list(stats["p50"]) == [latency_ms, latency_ms]
+
+
+def test_other_requests_are_tagged_by_their_query_or_path(tmp_path):
+    path = tmp_path / "replay.jsonl"
+    write_results(
+        path, ["http://api/works?query=cheese", "http://api/works/abc123"], 10
+    )
+
+    run = read_jsonl_results({"replay": path})
+
+    assert run.queries == ["cheese", "/works/abc123"]
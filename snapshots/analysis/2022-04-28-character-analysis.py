@@ -20,7 +20,7 @@ every character to check they were supported by the candidate font.
 import csv
 import unicodedata
 
-from utils import get_works
+from scanner import reduce_works
 
 
 def get_used_characters(json_object):
@@ -37,8 +37,22 @@ def get_used_characters(json_object):
         raise ValueError(f"Unrecognised type: {type(json_object)}")
 
 
+def find_examples(examples, work):
+    """Records ``work`` as the example of any characters not seen before."""
+    for char in get_used_characters(work):
+        examples.setdefault(char, work["id"])
+    return examples
+
+
+def merge_examples(examples, other):
+    # Chunks are merged in snapshot order, so the earlier example wins
+    for char, work_id in other.items():
+        examples.setdefault(char, work_id)
+    return examples
+
+
 if __name__ == "__main__":
-    seen_characters = set()
+    examples = reduce_works(find_examples, initial=dict, combine=merge_examples)
 
     with open("character_analysis.csv", "w") as outfile:
         writer = csv.DictWriter(
@@ -52,17 +66,12 @@ if __name__ == "__main__":
         )
         writer.writeheader()
 
-        for w in get_works():
-            work_id = w["id"]
-            characters = get_used_characters(w)
-
-            for char in characters:
-                if char not in seen_characters:
-                    writer.writerow(
-                        {
-                            "character": char,
-                            "Unicode name": unicodedata.name(char),
-                            "Unicode category": unicodedata.category(char),
-                            "example work": work_id,
-                        }
-                    )
+        for char, work_id in examples.items():
+            writer.writerow(
+                {
+                    "character": char,
+                    "Unicode name": unicodedata.name(char),
+                    "Unicode category": unicodedata.category(char),
+                    "example work": work_id,
+                }
+            )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Compare the JSON decoders in decoders.py on a synthetic snapshot.
+
+The snapshot is made from the visible works in the API's test documents,
+copied over and over (with new IDs) until there are enough of them, so you
+don't need to download a real snapshot to run this:
+
+    $ python3 benchmark_decoders.py [NUMBER_OF_WORKS]
+
+For each decoder that's installed, it times parsing every work in full,
+parsing just a few fields, and writing every work back out. The lines are
+decompressed before the timer starts, so this only measures the JSON.
+"""
+
+import glob
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+from decoders import BACKENDS, get_decoder
+
+TEST_DOCUMENTS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "../../common/search/src/test/resources/test_documents",
+)
+
+DEFAULT_WORK_COUNT = 50_000
+
+
+def get_test_works():
+    """The display JSON of every visible work in the test documents."""
+    works = []
+    for path in sorted(glob.glob(os.path.join(TEST_DOCUMENTS, "work*.json"))):
+        with open(path) as f:
+            document = json.load(f)["document"]
+        if document["type"] == "Visible":
+            works.append(document["display"])
+    return works
+
+
+def create_snapshot(snapshot_filename, *, count):
+    works = get_test_works()
+
+    with gzip.open(snapshot_filename, "wb") as outfile:
+        for i in range(count):
+            work = dict(works[i % len(works)], id=f"{i:08d}")
+            outfile.write(json.dumps(work).encode("utf8") + b"\n")
+
+
+def time_it(fn, lines):
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return time.perf_counter() - start
+
+
+def run_benchmarks(lines):
+    works = [json.loads(line) for line in lines]
+
+    results = []
+    for name in BACKENDS:
+        try:
+            decoder = get_decoder(name)
+        except ImportError:
+            print(f"{name} isn't installed, skipping")
+            continue
+
+        results.append(
+            (
+                name,
+                time_it(decoder.loads, lines),
+                time_it(lambda line: decoder.loads_fields(line, ["id"]), lines),
+                time_it(
+                    lambda line: decoder.loads_fields(line, ["items", "holdings"]),
+                    lines,
+                ),
+                time_it(decoder.dumps, works),
+            )
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        count = int(sys.argv[1])
+    except IndexError:
+        count = DEFAULT_WORK_COUNT
+    except ValueError:
+        sys.exit(f"Usage: {__file__} [NUMBER_OF_WORKS]")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_filename = os.path.join(tmp_dir, "works-benchmark.json.gz")
+        create_snapshot(snapshot_filename, count=count)
+        print(f"Created a snapshot of {count:,} works")
+
+        lines = list(gzip.open(snapshot_filename))
+
+    results = run_benchmarks(lines)
+
+    print()
+    print(
+        f"{'decoder':<10} {'loads':>8} {'id only':>8} {'items':>8} {'dumps':>8}"
+        f"   (seconds for {count:,} works)"
+    )
+    for name, *timings in results:
+        print(f"{name:<10} " + " ".join(f"{t:>8.2f}" for t in timings))
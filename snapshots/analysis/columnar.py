@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+A columnar copy of a snapshot, so reading a few fields doesn't mean reading
+all of them.
+
+``trim_snapshot`` writes a new gzip file for every combination of fields
+you ask for, each costing a full pass over the snapshot. This converts the
+snapshot once into a Parquet file with one column per top-level field;
+reading any set of fields then only reads those columns.
+
+Each column holds that field's JSON for each work, rather than an Arrow
+struct or list. Arrow types would be smaller and faster to filter, but
+every struct gets every key seen anywhere in the column, so a location
+without a shelfmark would come back with ``"shelfmark": null``. Keeping the
+JSON means works come back exactly as they are in the snapshot, and code
+that checks whether a key is present keeps working.
+
+This needs pyarrow (``pip install pyarrow``). When a snapshot is converted,
+caches made from any older snapshot (columnar, trimmed or seekable) are
+deleted.
+"""
+
+import glob
+import gzip
+import os
+import re
+import sys
+import uuid
+
+import tqdm
+
+from decoders import dumps, loads
+from query import matches
+
+# Works per row group: enough to compress well, few enough to keep memory low
+BATCH_SIZE = 10_000
+
+# Fields that only turn up partway through the snapshot, after the schema
+# is fixed, go in here as one JSON object
+OTHER_FIELDS = "_other"
+
+SNAPSHOT_DATE_RE = re.compile(r"works-(\d{4}-\d{2}-\d{2})")
+
+
+def columnar_filename(snapshot_filename):
+    name, _ = snapshot_filename.split(".", 1)
+    return f"{name}.parquet"
+
+
+def evict_old_caches(snapshot_filename):
+    """
+    Delete the columnar, trimmed and seekable copies of any snapshot older
+    than this one, in the same directory.
+    """
+    match = SNAPSHOT_DATE_RE.search(os.path.basename(snapshot_filename))
+    if match is None:
+        return
+    current_date = match.group(1)
+    directory = os.path.dirname(snapshot_filename)
+
+    for path in glob.glob(os.path.join(directory, "works-*")):
+        name = os.path.basename(path)
+        date = SNAPSHOT_DATE_RE.match(name)
+        is_original = re.fullmatch(r"works-\d{4}-\d{2}-\d{2}\.json\.gz", name)
+        if date and date.group(1) < current_date and not is_original:
+            os.unlink(path)
+
+
+def _schema(fields):
+    import pyarrow as pa
+
+    return pa.schema([(f, pa.string()) for f in fields + [OTHER_FIELDS]])
+
+
+def _to_batch(works, fields, schema):
+    import pyarrow as pa
+
+    columns = {f: [] for f in schema.names}
+    for work in works:
+        for f in fields:
+            columns[f].append(dumps(work[f]) if f in work else None)
+        other = {k: v for k, v in work.items() if k not in columns}
+        columns[OTHER_FIELDS].append(dumps(other) if other else None)
+    return pa.record_batch([columns[f] for f in schema.names], schema=schema)
+
+
+def convert_snapshot(*, snapshot_filename):
+    """
+    Writes a columnar copy of a snapshot, if there isn't one already, and
+    returns its filename.
+    """
+    import pyarrow.parquet as pq
+
+    new_name = columnar_filename(snapshot_filename)
+    if os.path.exists(new_name):
+        return new_name
+
+    tmp_path = new_name + "." + str(uuid.uuid4()) + ".tmp"
+    writer = None
+    fields = None
+    batch = []
+
+    def write_batch():
+        nonlocal writer, fields
+        if writer is None:
+            # The columns are the fields in the first batch, which in
+            # practice is all of them
+            fields = list(dict.fromkeys(k for work in batch for k in work))
+            writer = pq.ParquetWriter(tmp_path, _schema(fields), compression="zstd")
+        writer.write_batch(_to_batch(batch, fields, writer.schema))
+        batch.clear()
+
+    for line in tqdm.tqdm(gzip.open(snapshot_filename), desc="Converting"):
+        batch.append(loads(line))
+        if len(batch) == BATCH_SIZE:
+            write_batch()
+
+    if batch or writer is None:
+        write_batch()
+    writer.close()
+
+    os.rename(tmp_path, new_name)
+    evict_old_caches(snapshot_filename)
+    return new_name
+
+
+def _filter_batch(batch, where, available):
+    """
+    Drops the rows that can't match ``where``, by searching the columns'
+    JSON for each predicate's needles without parsing it.
+    """
+    import pyarrow.compute as pc
+
+    mask = None
+    for predicate in where:
+        column = predicate.field if predicate.field in available else OTHER_FIELDS
+        for needle in predicate.needles():
+            found = pc.fill_null(
+                pc.match_substring(batch.column(column), needle), False
+            )
+            mask = found if mask is None else pc.and_(mask, found)
+
+    return batch if mask is None else batch.filter(mask)
+
+
+def read_works(columnar_filename, *, fields=None, where=()):
+    """
+    Generates works from a columnar snapshot, with only the given top-level
+    fields (or all of them), that match the predicates in ``where``.
+
+    The fields the predicates look at must be in ``fields``.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(columnar_filename)
+    available = parquet_file.schema_arrow.names
+
+    if fields is None:
+        columns = available
+    else:
+        columns = [f for f in fields if f in available]
+        # A field that isn't a column of its own might be in the leftovers
+        if any(f not in available for f in fields):
+            columns.append(OTHER_FIELDS)
+
+    for batch in parquet_file.iter_batches(columns=columns):
+        batch = _filter_batch(batch, where, available)
+
+        for row in zip(*(batch.column(c).to_pylist() for c in columns)):
+            work = {}
+            for name, value in zip(columns, row):
+                if value is None:
+                    continue
+                if name == OTHER_FIELDS:
+                    other = loads(value)
+                    work.update(
+                        other
+                        if fields is None
+                        else {k: v for k, v in other.items() if k in fields}
+                    )
+                else:
+                    work[name] = loads(value)
+
+            if matches(work, where):
+                yield work
+
+
+if __name__ == "__main__":
+    try:
+        filename = sys.argv[1]
+    except IndexError:
+        sys.exit(f"Usage: {__file__} <FILENAME>")
+
+    print(convert_snapshot(snapshot_filename=filename))
@@ -0,0 +1,124 @@
+"""
+Reading and writing JSON with the fastest library that's installed.
+
+Once decompression is spread across every core, most of the time in a pass
+over a snapshot is spent parsing JSON. The snapshot readers use this module
+rather than the json module directly, so they can use a faster parser:
+
+    orjson      (pip install orjson) is several times faster than the json
+                module at parsing whole works, and at writing them
+
+    simdjson    (pip install pysimdjson) can find a few fields in a work
+                without turning the rest of it into Python objects, which
+                makes reading just the ``id`` or a couple of fields faster
+
+    json        the standard library, if neither is installed
+
+By default it uses the first of these that's installed. To pick one, set
+the ``SNAPSHOT_JSON_DECODER`` environment variable, e.g. to ``simdjson`` if
+you mostly read a few fields at a time. To see how they compare on your
+machine, run ``benchmark_decoders.py``.
+"""
+
+import json
+import os
+
+BACKENDS = ["orjson", "simdjson", "json"]
+
+
+class JsonDecoder:
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def loads_fields(self, data, fields):
+        """
+        Parses a work, and returns a dict of just the given top-level
+        fields (the ones it has).
+        """
+        work = self.loads(data)
+        return {f: work[f] for f in fields if f in work}
+
+    def dumps(self, obj):
+        """Compact JSON, as UTF-8 bytes."""
+        # See https://twitter.com/raymondh/status/842777864193769472
+        return json.dumps(obj, separators=(",", ":")).encode("utf8")
+
+
+class OrjsonDecoder(JsonDecoder):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self.loads = orjson.loads
+        self.dumps = orjson.dumps
+
+
+class SimdjsonDecoder(JsonDecoder):
+    name = "simdjson"
+
+    def __init__(self):
+        import simdjson
+
+        self.simdjson = simdjson
+        self.parser = simdjson.Parser()
+
+        try:
+            self.dumps = OrjsonDecoder().dumps
+        except ImportError:
+            pass
+
+    def loads(self, data):
+        return self.parser.parse(data, recursive=True)
+
+    def loads_fields(self, data, fields):
+        # This parses lazily: only the fields we ask for are turned into
+        # Python objects. A parser can only be reused once nothing refers
+        # to its last document, so everything is copied out before returning.
+        doc = self.parser.parse(data)
+        result = {}
+        for f in fields:
+            try:
+                value = doc[f]
+            except KeyError:
+                continue
+            if isinstance(value, self.simdjson.Object):
+                value = value.as_dict()
+            elif isinstance(value, self.simdjson.Array):
+                value = value.as_list()
+            result[f] = value
+        del doc
+        return result
+
+
+_DECODERS = {
+    "orjson": OrjsonDecoder,
+    "simdjson": SimdjsonDecoder,
+    "json": JsonDecoder,
+}
+
+
+def get_decoder(name=None):
+    """
+    Returns the decoder with this name, or the first one that's installed.
+    """
+    if name is not None:
+        try:
+            return _DECODERS[name]()
+        except KeyError:
+            raise ValueError(f"Unknown JSON decoder {name!r}; pick from {BACKENDS}")
+
+    for backend in BACKENDS:
+        try:
+            return _DECODERS[backend]()
+        except ImportError:
+            pass
+
+
+decoder = get_decoder(os.environ.get("SNAPSHOT_JSON_DECODER"))
+
+loads = decoder.loads
+loads_fields = decoder.loads_fields
+dumps = decoder.dumps
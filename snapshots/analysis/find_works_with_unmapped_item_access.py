@@ -22,6 +22,7 @@ import json
 import boto3
 import tqdm
 
+from query import Equals
 from utils import get_works
 
 
@@ -44,7 +45,17 @@ def find_unmapped_item_ids():
     Generates (bib id, item id) pairs for items that haven't been mapped
     correctly.
     """
-    for work in get_works(fields=["items"]):
+    works = get_works(
+        fields=[
+            "items.identifiers",
+            "items.locations.type",
+            "items.locations.accessConditions.note",
+        ],
+        # Only a few works have the placeholder, so skip the rest unparsed
+        where=[Equals("items.locations.accessConditions.note", PLACEHOLDER_MESSAGE)],
+    )
+
+    for work in works:
         for item in work["items"]:
             locations = item["locations"]
 
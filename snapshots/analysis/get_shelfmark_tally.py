@@ -6,9 +6,23 @@ of each one.
 
 import collections
 import csv
+import functools
 import sys
 
-from utils import get_locations
+from scanner import reduce_works
+
+
+def tally_shelfmarks(tally, work):
+    for item in work["items"]:
+        for loc in item["locations"]:
+            tally[loc.get("shelfmark")].add(work["id"])
+    return tally
+
+
+def merge_tallies(tally, other):
+    for shelfmark, ids in other.items():
+        tally[shelfmark].update(ids)
+    return tally
 
 
 if __name__ == "__main__":
@@ -17,10 +31,12 @@ if __name__ == "__main__":
     except IndexError:
         sys.exit(f"Usage: {__file__} <FILENAME>")
 
-    tally = collections.defaultdict(set)
-
-    for work_id, _, loc in get_locations(filename):
-        tally[loc.get("shelfmark")].add(work_id)
+    tally = reduce_works(
+        tally_shelfmarks,
+        initial=functools.partial(collections.defaultdict, set),
+        combine=merge_tallies,
+        snapshot_filename=filename,
+    )
 
     with open("shelfmark_tally.csv", "w") as outfile:
         writer = csv.DictWriter(
@@ -0,0 +1,179 @@
+"""
+Nested fields and simple filters for ``get_works``.
+
+A path like ``items.locations.accessConditions`` names a field inside
+another field. Wherever a path goes through a list, it means that field of
+every element in the list, so ``items.locations.type`` is the type of every
+location on every item.
+
+You can pass paths as ``fields``, to only get those parts of each work:
+
+    for work in get_works(fields=["items.locations.accessConditions"]):
+        ...
+
+and pick out works with predicates, passed as ``where``:
+
+    from query import Contains, Equals, Exists
+
+    for work in get_works(where=[Equals("items.locations.type", "PhysicalLocation")]):
+        ...
+
+A work matches a predicate if any of the values at its path does, and
+matches ``where`` if it matches every predicate in it.
+
+Each predicate also knows some text that has to be in a work's JSON for it
+to match -- e.g. ``Equals("items.locations.type", "PhysicalLocation")``
+can't match a work without ``PhysicalLocation`` in it. ``get_works`` looks
+for that text before parsing each work, so works that can't match are
+skipped without being parsed. That makes narrow questions much cheaper:
+most of the time in a pass over the snapshot is spent in ``json.loads``.
+"""
+
+import re
+
+# Text that's written the same way in any JSON encoder: printable ASCII,
+# except quotes and backslashes (which get escaped). Anything else may or
+# may not be escaped, depending on who wrote the JSON.
+_UNESCAPED = re.compile(r"[\x20\x21\x23-\x5b\x5d-\x7e]+")
+
+
+def split_path(path):
+    return tuple(path.split("."))
+
+
+def get_values(obj, path):
+    """
+    Generates every value at ``path`` (a tuple of keys) inside ``obj``.
+    Lists are flattened, so this never yields a list.
+    """
+    if isinstance(obj, list):
+        for elem in obj:
+            yield from get_values(elem, path)
+    elif not path:
+        yield obj
+    elif isinstance(obj, dict) and path[0] in obj:
+        yield from get_values(obj[path[0]], path[1:])
+
+
+def _needle(text):
+    """
+    The longest part of ``text`` that will appear as-is in any JSON
+    containing it, or None if there isn't any.
+    """
+    return max(_UNESCAPED.findall(text), key=len, default=None)
+
+
+class Predicate:
+    def __init__(self, path):
+        self.path = split_path(path)
+
+    @property
+    def field(self):
+        """The top-level field this predicate looks at."""
+        return self.path[0]
+
+    def needles(self):
+        """
+        Strings that appear in the JSON of every work that matches.
+
+        The top-level key isn't included, because columnar snapshots store
+        each top-level field's value without its key.
+        """
+        key = self.path[-1]
+        if len(self.path) > 1 and _needle(key) == key:
+            return [f'"{key}"']
+        return []
+
+    def matches(self, work):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({'.'.join(self.path)!r})"
+
+
+class Exists(Predicate):
+    """Works with a non-empty value at ``path``."""
+
+    def matches(self, work):
+        return any(v is not None for v in get_values(work, self.path))
+
+
+class Equals(Predicate):
+    """Works where a value at ``path`` is equal to ``value``."""
+
+    def __init__(self, path, value):
+        super().__init__(path)
+        self.value = value
+
+    def needles(self):
+        needles = super().needles()
+        if isinstance(self.value, str) and _needle(self.value):
+            needles.append(_needle(self.value))
+        return needles
+
+    def matches(self, work):
+        return any(v == self.value for v in get_values(work, self.path))
+
+    def __repr__(self):
+        return f"Equals({'.'.join(self.path)!r}, {self.value!r})"
+
+
+class Contains(Predicate):
+    """Works where a string at ``path`` contains ``text``."""
+
+    def __init__(self, path, text):
+        super().__init__(path)
+        self.text = text
+
+    def needles(self):
+        needles = super().needles()
+        if _needle(self.text):
+            needles.append(_needle(self.text))
+        return needles
+
+    def matches(self, work):
+        return any(
+            isinstance(v, str) and self.text in v for v in get_values(work, self.path)
+        )
+
+    def __repr__(self):
+        return f"Contains({'.'.join(self.path)!r}, {self.text!r})"
+
+
+def needles(where):
+    return [n for predicate in where for n in predicate.needles()]
+
+
+def matches(work, where):
+    return all(predicate.matches(work) for predicate in where)
+
+
+def make_projection(paths):
+    """
+    Turns a list of paths into a tree of the keys to keep, e.g.
+    ["id", "items.locations"] becomes {"id": None, "items": {"locations": None}},
+    where None means "all of it".
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, last = split_path(path)
+        for key in parents:
+            if key in node and node[key] is None:
+                # We're already keeping all of this field
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[last] = None
+    return tree
+
+
+def project(obj, tree):
+    """Keeps only the parts of ``obj`` in a projection tree."""
+    if tree is None:
+        return obj
+    if isinstance(obj, list):
+        return [project(elem, tree) for elem in obj]
+    if isinstance(obj, dict):
+        return {key: project(obj[key], sub) for key, sub in tree.items() if key in obj}
+    return obj
@@ -0,0 +1,147 @@
+"""
+Scan a whole snapshot using every core.
+
+``get_works`` parses one line at a time on one core, which takes a couple
+of minutes per pass over a full snapshot. Here, the snapshot is decompressed
+once, in this process, and split into chunks of whole lines; each chunk is
+parsed and processed in a pool of worker processes, and the results are
+merged back together.
+
+There are two ways to use it:
+
+    map_works(fn)
+        Calls ``fn(work)`` on every work, and yields the results that
+        aren't None, in snapshot order. Return None to filter a work out.
+
+    reduce_works(fn, initial=..., combine=...)
+        Folds each chunk into an accumulator with ``acc = fn(acc, work)``,
+        starting from ``initial()``, then merges the chunks' accumulators
+        with ``combine(a, b)``, in snapshot order.
+
+For example, counting works by type:
+
+    import collections
+
+    from scanner import reduce_works
+
+    def count_type(counter, work):
+        counter[work["workType"]["label"]] += 1
+        return counter
+
+    counts = reduce_works(
+        count_type, initial=collections.Counter, combine=lambda a, b: a + b
+    )
+
+The functions are sent to the workers, so ``fn`` and ``initial`` must be
+defined at the top level of a module (not lambdas or nested functions).
+``combine`` runs in this process, so can be anything.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import gzip
+import os
+
+import tqdm
+
+from decoders import loads
+from utils import get_latest_snapshot_filename
+
+# How much decompressed data to send to a worker at once
+CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def read_chunks(snapshot_filename, *, chunk_bytes=CHUNK_BYTES):
+    """
+    Decompresses a snapshot, yielding chunks of about ``chunk_bytes`` that
+    each end on a line boundary. Shows progress through the compressed file.
+    """
+    with open(snapshot_filename, "rb") as raw, gzip.GzipFile(fileobj=raw) as f:
+        with tqdm.tqdm(
+            total=os.stat(snapshot_filename).st_size, unit="B", unit_scale=True
+        ) as progress:
+            leftover = b""
+            while True:
+                data = f.read(chunk_bytes)
+                progress.update(raw.tell() - progress.n)
+                if not data:
+                    break
+
+                data = leftover + data
+                end = data.rfind(b"\n") + 1
+                if end:
+                    yield data[:end]
+                    leftover = data[end:]
+                else:
+                    leftover = data
+
+            if leftover.strip():
+                yield leftover
+
+
+def _parse(chunk):
+    return (loads(line) for line in chunk.split(b"\n") if line.strip())
+
+
+def _map_chunk(fn, chunk):
+    return [result for result in map(fn, _parse(chunk)) if result is not None]
+
+
+def _reduce_chunk(fn, initial, chunk):
+    acc = initial()
+    for work in _parse(chunk):
+        acc = fn(acc, work)
+    return acc
+
+
+def _run_chunks(process_chunk, *, snapshot_filename, processes):
+    """
+    Runs ``process_chunk`` on every chunk of the snapshot in a process pool,
+    yielding the results in order.
+
+    Only a few chunks per worker are in flight at once, so the decompressor
+    can't run ahead and fill up memory when the workers are slower.
+    """
+    if snapshot_filename is None:
+        snapshot_filename = get_latest_snapshot_filename()
+    processes = processes or os.cpu_count()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = collections.deque()
+        for chunk in read_chunks(snapshot_filename):
+            pending.append(executor.submit(process_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def map_works(fn, *, snapshot_filename=None, processes=None):
+    """
+    Yields ``fn(work)`` for every work in the snapshot, skipping None.
+    If no snapshot is given, it uses the latest snapshot.
+    """
+    for results in _run_chunks(
+        functools.partial(_map_chunk, fn),
+        snapshot_filename=snapshot_filename,
+        processes=processes,
+    ):
+        yield from results
+
+
+def reduce_works(fn, *, initial, combine, snapshot_filename=None, processes=None):
+    """
+    Reduces every work in the snapshot with ``fn(acc, work)``, chunk by
+    chunk in parallel, and returns the chunks' results merged with
+    ``combine``. If no snapshot is given, it uses the latest snapshot.
+    """
+    result = initial()
+    for chunk_result in _run_chunks(
+        functools.partial(_reduce_chunk, fn, initial),
+        snapshot_filename=snapshot_filename,
+        processes=processes,
+    ):
+        result = combine(result, chunk_result)
+    return result
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Look up individual works in a snapshot without reading the whole thing.
+
+A snapshot is one long gzip stream, so finding a single work means
+decompressing everything before it. This rewrites a snapshot in the same
+style as BGZF (the format used for indexed genomics files): a series of
+small, independent gzip members, each holding whole lines and no more than
+about 64KB of them. A SQLite index alongside it records which member each
+work is in, so looking a work up only means decompressing one small member.
+
+The rewritten file is still a valid gzip file with the same contents, so it
+can be read with ``get_works`` too.
+
+To use this:
+
+    from seekable import get_work, get_works, sample_works
+
+    work = get_work("a224tb56")
+
+    for work in get_works(["a224tb56", "a22au6yn"]):
+        print(work["title"])
+
+    for work in sample_works(100):
+        print(work["id"])
+
+The first call converts the latest snapshot, which takes a full pass over
+it; after that, lookups take milliseconds. You can also convert ahead of
+time by running this script with a snapshot's filename.
+"""
+
+import collections
+import gzip
+import os
+import sqlite3
+import sys
+import uuid
+import zlib
+
+import tqdm
+
+from decoders import loads, loads_fields
+from utils import get_latest_snapshot_filename
+
+# The uncompressed size of each gzip member, as in BGZF
+BLOCK_SIZE = 64 * 1024
+
+# How many decompressed blocks to keep around, for lookups that are close
+# together
+MAX_CACHED_BLOCKS = 64
+
+SCHEMA = """
+CREATE TABLE works (
+    id TEXT PRIMARY KEY,
+    block_offset INTEGER NOT NULL,
+    block_length INTEGER NOT NULL,
+    line_offset INTEGER NOT NULL,
+    line_length INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def seekable_filename(snapshot_filename):
+    name, ext = snapshot_filename.split(".", 1)
+    return f"{name}.seekable.{ext}"
+
+
+def index_filename(seekable_filename):
+    return seekable_filename + ".index.sqlite"
+
+
+def convert_snapshot(*, snapshot_filename):
+    """
+    Rewrites a snapshot as a seekable file with an index, if that hasn't
+    been done already, and returns the seekable file's name.
+    """
+    new_name = seekable_filename(snapshot_filename)
+    new_index = index_filename(new_name)
+
+    if os.path.exists(new_name) and os.path.exists(new_index):
+        return new_name
+
+    tmp_suffix = "." + str(uuid.uuid4()) + ".tmp"
+    tmp_path, tmp_index = new_name + tmp_suffix, new_index + tmp_suffix
+
+    db = sqlite3.connect(tmp_index)
+    db.executescript(SCHEMA)
+
+    with open(tmp_path, "wb") as outfile:
+        block, block_ids = [], []
+        block_size = 0
+
+        def write_block():
+            data = b"".join(block)
+            compressed = gzip.compress(data, mtime=0)
+            offset = outfile.tell()
+            outfile.write(compressed)
+
+            line_offset = 0
+            rows = []
+            for work_id, line in zip(block_ids, block):
+                rows.append((work_id, offset, len(compressed), line_offset, len(line)))
+                line_offset += len(line)
+            db.executemany("INSERT INTO works VALUES (?, ?, ?, ?, ?)", rows)
+
+        for line in tqdm.tqdm(gzip.open(snapshot_filename), desc="Converting"):
+            if block and block_size + len(line) > BLOCK_SIZE:
+                write_block()
+                block, block_ids = [], []
+                block_size = 0
+
+            block.append(line)
+            block_ids.append(loads_fields(line, ["id"])["id"])
+            block_size += len(line)
+
+        if block:
+            write_block()
+
+    db.commit()
+    db.close()
+
+    os.rename(tmp_index, new_index)
+    os.rename(tmp_path, new_name)
+
+    return new_name
+
+
+class SeekableSnapshot:
+    """A converted snapshot, opened for lookups."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.index = sqlite3.connect(index_filename(filename))
+        self.blocks = collections.OrderedDict()
+
+    def _read_block(self, offset, length):
+        try:
+            self.blocks.move_to_end(offset)
+            return self.blocks[offset]
+        except KeyError:
+            pass
+
+        self.file.seek(offset)
+        # wbits=31 means "expect a gzip header"
+        block = zlib.decompress(self.file.read(length), wbits=31)
+
+        self.blocks[offset] = block
+        if len(self.blocks) > MAX_CACHED_BLOCKS:
+            self.blocks.popitem(last=False)
+        return block
+
+    def _read_work(self, block_offset, block_length, line_offset, line_length):
+        block = self._read_block(block_offset, block_length)
+        return loads(block[line_offset : line_offset + line_length])
+
+    def get_work(self, work_id):
+        row = self.index.execute(
+            "SELECT block_offset, block_length, line_offset, line_length "
+            "FROM works WHERE id = ?",
+            (work_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(work_id)
+        return self._read_work(*row)
+
+    def get_works(self, work_ids):
+        """
+        Generates the works with these IDs, in the order they're in the
+        snapshot, so each block is only decompressed once. IDs that aren't
+        in the snapshot are skipped.
+        """
+        work_ids = list(work_ids)
+        locations = []
+        # SQLite limits how many parameters a query can have
+        for i in range(0, len(work_ids), 500):
+            batch = work_ids[i : i + 500]
+            locations.extend(
+                self.index.execute(
+                    "SELECT block_offset, block_length, line_offset, line_length "
+                    f"FROM works WHERE id IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+            )
+
+        for location in sorted(locations):
+            yield self._read_work(*location)
+
+    def sample_ids(self, count):
+        return [
+            work_id
+            for (work_id,) in self.index.execute(
+                "SELECT id FROM works ORDER BY random() LIMIT ?", (count,)
+            )
+        ]
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_open_snapshots = {}
+
+
+def open_snapshot(snapshot_filename=None):
+    """
+    Opens a snapshot for lookups, converting it first if need be.
+    If no snapshot is given, it uses the latest snapshot.
+    """
+    if snapshot_filename is None:
+        snapshot_filename = get_latest_snapshot_filename()
+
+    if snapshot_filename not in _open_snapshots:
+        _open_snapshots[snapshot_filename] = SeekableSnapshot(
+            convert_snapshot(snapshot_filename=snapshot_filename)
+        )
+    return _open_snapshots[snapshot_filename]
+
+
+def get_work(work_id, *, snapshot_filename=None):
+    return open_snapshot(snapshot_filename).get_work(work_id)
+
+
+def get_works(work_ids, *, snapshot_filename=None):
+    return open_snapshot(snapshot_filename).get_works(work_ids)
+
+
+def sample_works(count, *, snapshot_filename=None):
+    """Generates a random sample of ``count`` works from the snapshot."""
+    snapshot = open_snapshot(snapshot_filename)
+    return snapshot.get_works(snapshot.sample_ids(count))
+
+
+if __name__ == "__main__":
+    try:
+        filename = sys.argv[1]
+    except IndexError:
+        sys.exit(f"Usage: {__file__} <FILENAME>")
+
+    print(convert_snapshot(snapshot_filename=filename))
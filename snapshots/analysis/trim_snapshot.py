@@ -14,12 +14,13 @@ For a brief comparison, when I first wrote this script:
 """
 
 import gzip
-import json
 import os
 import uuid
 
 import tqdm
 
+from decoders import dumps, loads_fields
+
 
 def trim_snapshot(*, snapshot_filename, fields):
     fields = set(fields)
@@ -32,19 +33,13 @@ def trim_snapshot(*, snapshot_filename, fields):
     if not os.path.exists(new_name):
         tmp_path = new_name + "." + str(uuid.uuid4()) + ".tmp"
 
-        from utils import get_works
-
         with gzip.open(tmp_path, "wb") as outfile:
-            for work in tqdm.tqdm(get_works(snapshot_filename=snapshot_filename)):
-                trimmed_work = {
-                    key: value for key, value in work.items() if key in fields
-                }
-
-                # Compact JSON representation
-                # See https://twitter.com/raymondh/status/842777864193769472
-                line = json.dumps(trimmed_work, separators=(",", ":")) + "\n"
+            for line in tqdm.tqdm(gzip.open(snapshot_filename)):
+                # Only the fields we're keeping need to be parsed, which
+                # is much faster with some decoders (see decoders.py)
+                trimmed_work = loads_fields(line, fields)
 
-                outfile.write(line.encode("utf8"))
+                outfile.write(dumps(trimmed_work) + b"\n")
 
         os.rename(tmp_path, new_name)
 
@@ -1,8 +1,9 @@
 import gzip
-import json
 import os
 import re
 
+from decoders import loads
+from query import make_projection, matches, needles, project
 from trim_snapshot import trim_snapshot
 
 
@@ -19,7 +20,7 @@ def get_latest_snapshot_filename():
         raise RuntimeError("No local snapshots found!")
 
 
-def get_works(*, snapshot_filename=None, fields=None):
+def get_works(*, snapshot_filename=None, fields=None, where=()):
     """
     Generates a list of works from a given snapshot.
     If no snapshot is given, it uses the latest snapshot.
@@ -42,19 +43,70 @@ def get_works(*, snapshot_filename=None, fields=None):
 
     This will generate Works that only have that subset of fields populated.
     Limiting your analysis to a subset of fields can make this much faster
-    after the initial run.
+    after the initial run. Fields can be nested, e.g.
+    ``items.locations.accessConditions`` (see query.py).
+
+    If pyarrow is installed, the first run converts the snapshot to a
+    columnar file that can be read for any set of fields (see columnar.py);
+    otherwise it makes a trimmed copy for each set of fields.
+
+    If you're only interested in some works, pass predicates from query.py
+    as the ``where`` argument, e.g.:
+
+        from query import Exists
+
+        for work in get_works(where=[Exists("holdings.note")]):
+            pprint(work)
+            break
+
+    Works that can't match are skipped before they're parsed.
 
     """
     if snapshot_filename is None:
         snapshot_filename = get_latest_snapshot_filename()
 
-    if fields is not None:
-        snapshot_filename = trim_snapshot(
-            snapshot_filename=snapshot_filename, fields=fields
+    where = list(where)
+
+    if fields is None:
+        yield from _read_snapshot(snapshot_filename, where=where)
+        return
+
+    projection = make_projection(["id", "identifiers", *fields])
+
+    # The top-level fields to read: the ones we're returning, and the ones
+    # we need to check the predicates
+    top_level = list(dict.fromkeys([*projection, *(p.field for p in where)]))
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        works = _read_snapshot(
+            trim_snapshot(snapshot_filename=snapshot_filename, fields=top_level),
+            where=where,
+        )
+    else:
+        from columnar import convert_snapshot, read_works
+
+        works = read_works(
+            convert_snapshot(snapshot_filename=snapshot_filename),
+            fields=top_level,
+            where=where,
         )
 
+    for work in works:
+        yield project(work, projection)
+
+
+def _read_snapshot(snapshot_filename, *, where):
+    required = [needle.encode("utf8") for needle in needles(where)]
+
     for line in gzip.open(snapshot_filename):
-        yield json.loads(line)
+        if not all(needle in line for needle in required):
+            continue
+
+        work = loads(line)
+        if matches(work, where):
+            yield work
 
 
 def get_items(snapshot_filename=None):